@@ -4,12 +4,26 @@ Built with Streamlit
 """
 
 import streamlit as st
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-import io
-import zipfile
+import math
+import os
+import tempfile
 import time
+import uuid
+
+import artifact_store
+import http_cache
+import http_client
+import jobs
+import link_parser
+import net_metrics
+import pdf_metadata
+import prefetch
+import profiling
+import size_probe
+import text_index
+import throttle
+import zip_builder
+from http_client import parse_cookie_string
 
 st.set_page_config(
     page_title="DocuMine",
@@ -31,103 +45,353 @@ st.markdown(
 
 # --- Helper Functions ---
 
-DEFAULT_COOKIES = {
-    "justiceGovAgeVerified": "true"
+# On-disk HTTP cache shared by all sessions; override with DOCUMINE_CACHE_DIR / DOCUMINE_CACHE_MB
+CACHE_DIR = os.environ.get("DOCUMINE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "documine_http_cache"))
+CACHE_MAX_MB = int(os.environ.get("DOCUMINE_CACHE_MB", "1024"))
+
+@st.cache_resource
+def get_http_cache():
+    """Returns the HTTP cache shared by all sessions of this server."""
+    return http_cache.HttpCache(CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024)
+
+def get_http_session(cookies=None):
+    """Returns this browser session's keep-alive HTTP session, rebuilt when the cookies change."""
+    cookie_key = tuple(sorted((cookies or {}).items()))
+    if st.session_state.get('http_session_key') != cookie_key or 'http_session' not in st.session_state:
+        st.session_state['http_session'] = http_client.create_session(cookies)
+        st.session_state['http_session_key'] = cookie_key
+    return st.session_state['http_session']
+
+# Background job pool shared by all sessions; override with DOCUMINE_JOB_WORKERS / DOCUMINE_SESSION_JOBS
+JOB_WORKERS = int(os.environ.get("DOCUMINE_JOB_WORKERS", "4"))
+SESSION_JOBS = int(os.environ.get("DOCUMINE_SESSION_JOBS", "2"))
+
+@st.cache_resource
+def get_job_manager():
+    """Returns the background job pool shared by all sessions of this server."""
+    return jobs.JobManager(workers=JOB_WORKERS, per_owner=SESSION_JOBS)
+
+def get_session_id():
+    """Returns an id for this browser session, used as the owner of its jobs."""
+    if 'session_id' not in st.session_state:
+        st.session_state['session_id'] = uuid.uuid4().hex
+    return st.session_state['session_id']
+
+# Scan results and archives live in a server-side store shared by all sessions; sessions keep only keys.
+# Override with DOCUMINE_ARTIFACT_DIR / DOCUMINE_ARTIFACT_MB / DOCUMINE_ARTIFACT_TTL (idle seconds)
+ARTIFACT_DIR = os.environ.get("DOCUMINE_ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "documine_artifacts"))
+ARTIFACT_MAX_MB = int(os.environ.get("DOCUMINE_ARTIFACT_MB", "2048"))
+ARTIFACT_TTL = int(os.environ.get("DOCUMINE_ARTIFACT_TTL", "3600"))
+# A scan of the same page within this many seconds is answered from the store (DOCUMINE_SCAN_TTL)
+SCAN_TTL = int(os.environ.get("DOCUMINE_SCAN_TTL", "600"))
+
+@st.cache_resource
+def get_artifact_store():
+    """Returns the artifact store shared by all sessions of this server."""
+    return artifact_store.ArtifactStore(ARTIFACT_DIR, max_bytes=ARTIFACT_MAX_MB * 1024 * 1024, idle_ttl=ARTIFACT_TTL)
+
+# ZIP builds probe file sizes first for byte progress with an ETA (DOCUMINE_PROBE_SIZES=0 turns this off);
+# DOCUMINE_MAX_ZIP_MB refuses builds whose files total more than that many MB (0 = no limit)
+PROBE_SIZES = os.environ.get("DOCUMINE_PROBE_SIZES", "1") != "0"
+MAX_ZIP_MB = float(os.environ.get("DOCUMINE_MAX_ZIP_MB", "0"))
+
+# Full-text search over an index built by `pdf_extractor.py --index PATH --mine` (DOCUMINE_INDEX; unset = no search)
+INDEX_PATH = os.environ.get("DOCUMINE_INDEX", "")
+SEARCH_LIMIT = int(os.environ.get("DOCUMINE_SEARCH_LIMIT", str(text_index.DEFAULT_LIMIT)))
+
+@st.cache_resource
+def get_text_index():
+    """Returns the full-text search index shared by all sessions of this server."""
+    return text_index.TextIndex(INDEX_PATH)
+
+# Opt-in metadata reading during scans (sidebar; DOCUMINE_READ_METADATA=1 turns it on by default): each PDF's page
+# count, title, author, producer and creation date, read with small Range requests and shown in the file list
+READ_METADATA_DEFAULT = os.environ.get("DOCUMINE_READ_METADATA", "0") == "1"
+# Requests the app's probes send at once to any single host, across all sessions (DOCUMINE_HOST_LIMIT)
+HOST_LIMIT = int(os.environ.get("DOCUMINE_HOST_LIMIT", "4"))
+
+@st.cache_resource
+def get_host_limits():
+    """Returns the per-host concurrency limits shared by all sessions of this server."""
+    return throttle.HostLimits(HOST_LIMIT)
+
+# Opt-in speculative prefetch after a scan (sidebar; DOCUMINE_PREFETCH=1 turns it on by default), capped at
+# DOCUMINE_PREFETCH_MB and DOCUMINE_PREFETCH_SECONDS; files land in the artifact store for ZIP builds to reuse
+PREFETCH_DEFAULT = os.environ.get("DOCUMINE_PREFETCH", "0") == "1"
+PREFETCH_MAX_MB = float(os.environ.get("DOCUMINE_PREFETCH_MB", str(prefetch.DEFAULT_MAX_BYTES // (1024 * 1024))))
+PREFETCH_SECONDS = float(os.environ.get("DOCUMINE_PREFETCH_SECONDS", str(prefetch.DEFAULT_MAX_SECONDS)))
+# Prefetches run on their own pool so they never hold up scans and ZIP builds (DOCUMINE_PREFETCH_WORKERS)
+PREFETCH_WORKERS = int(os.environ.get("DOCUMINE_PREFETCH_WORKERS", "2"))
+
+@st.cache_resource
+def get_prefetch_manager():
+    """Returns the prefetch job pool shared by all sessions of this server; one prefetch per session."""
+    return jobs.JobManager(workers=PREFETCH_WORKERS, per_owner=1)
+
+# The file list renders one page of rows at a time, so large scans stay responsive
+FILE_PAGE_SIZES = (50, 100, 250, 500)
+SEARCH_FIELDS = {
+    "All fields": ('filename', 'text', 'url'),
+    "File name": ('filename',),
+    "Link text": ('text',),
+    "URL": ('url',),
 }
 
-def parse_cookie_string(cookie_string):
-    """Parses a cookie string (key=value; key2=value2) into a dictionary."""
-    cookies = {}
-    if cookie_string:
-        for item in cookie_string.split(';'):
-            if '=' in item:
-                name, value = item.strip().split('=', 1)
-                cookies[name] = value
-    return cookies
-
-def get_pdf_links(url, cookies=None):
+# Per-phase CPU and memory profiles of every job (DOCUMINE_PROFILE=directory; unset = off), rewritten whenever
+# no job is in a profiled phase; DOCUMINE_PROFILE_TOP sets the functions and allocation sites listed per phase
+PROFILE_DIR = os.environ.get("DOCUMINE_PROFILE", "")
+PROFILE_TOP = int(os.environ.get("DOCUMINE_PROFILE_TOP", str(profiling.DEFAULT_TOP)))
+
+@st.cache_resource
+def start_profiling():
+    """Starts profiling the phases of this server's jobs."""
+    return profiling.enable(PROFILE_DIR, top=PROFILE_TOP, autosave=True)
+
+if PROFILE_DIR:
+    start_profiling()
+
+def get_pdf_links(url, session, cache):
     """Extracts PDF links from the URL."""
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        # Merge default cookies with user provided ones
-        session_cookies = DEFAULT_COOKIES.copy()
-        if cookies:
-            session_cookies.update(cookies)
-            
-        response = requests.get(url, headers=headers, cookies=session_cookies, timeout=10)
+    def fetch():
+        response = cache.get(session, url, timeout=http_client.PAGE_TIMEOUT)
         response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        links = []
-        for a in soup.find_all('a', href=True):
-            href = a['href']
-            # Basic check, can be improved
-            if href.lower().endswith('.pdf'):
-                absolute_url = urljoin(url, href)
-                filename = href.split('/')[-1]
-                text = a.get_text(strip=True) or filename
-                links.append({
-                    "filename": filename,
-                    "url": absolute_url,
-                    "text": text
-                })
-        return links, None
-    except Exception as e:
-        return [], str(e)
-
-def create_zip_of_pdfs(pdf_list, cookies=None):
-    """Downloads PDFs and returns a byte stream of the ZIP file."""
-
-    zip_buffer = io.BytesIO()
-    
-    # Progress bar in the main UI
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    
-    total = len(pdf_list)
-    success_count = 0
-    
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-
-    # Merge default cookies with user provided ones
-    session_cookies = DEFAULT_COOKIES.copy()
-    if cookies:
-        session_cookies.update(cookies)
-
-    with zipfile.ZipFile(zip_buffer, "a", zipfile.ZIP_DEFLATED, False) as zip_file:
-        for i, pdf in enumerate(pdf_list):
+        return response.content
+
+    with profiling.phase('fetch'):
+        content = throttle.call_with_retries(url, fetch)
+    with profiling.phase('parse'):
+        return link_parser.parse_pdf_links(content, url)
+
+def scan_job(job, url, session, cache, store, links_key, limits, read_metadata=False):
+    """Background job: scans the page for PDF links, stores them as a link table and returns how many were found."""
+    job.update(message="Scanning page for PDFs...")
+    links = get_pdf_links(url, session, cache)
+    if read_metadata and links:
+        def on_progress(done, total):
+            job.update(done, total, f"Reading PDF metadata ({done}/{total})...")
+
+        pdf_metadata.probe_metadata(links, session, limits=limits, on_progress=on_progress,
+                                    should_stop=lambda: job.cancelled)
+        job.check_cancelled()
+    store.put_value(links_key, link_parser.LinkTable.from_links(links).columns)
+    return len(links)
+
+def prefetch_job(job, links_key, cookies, store):
+    """Background job: pulls the scanned files into the artifact store ahead of a ZIP build; returns the totals."""
+    links = link_parser.LinkTable(store.get_value(links_key) or {}).records()
+    session = http_client.create_session(cookies)
+    scope = http_client.cookie_scope(http_client.merge_cookies(cookies))
+
+    def on_progress(done, total, totals):
+        job.update(done, total, f"{totals['fetched'] + totals['stored']} of {total} file(s) ready locally, "
+                                f"{size_probe.format_bytes(totals['transferred'])} fetched")
+
+    try:
+        totals = prefetch.prefetch(links, session, store, scope,
+                                   max_bytes=int(PREFETCH_MAX_MB * 1024 * 1024), max_seconds=PREFETCH_SECONDS,
+                                   should_stop=lambda: job.cancelled, on_progress=on_progress)
+    finally:
+        session.close()
+    job.check_cancelled()
+    return totals
+
+def create_zip_of_pdfs(job, pdf_list, cookies, cache, store, zip_key, limits):
+    """Background job: downloads PDFs into a ZIP file and stores it with its network metrics; returns the file count."""
+    progress = None
+    current = [""]
+
+    def show(done, total):
+        # Progress in bytes once sizes are known, otherwise in files
+        if progress and progress.total_bytes:
+            job.update(progress.done_bytes, progress.total_bytes, f"{current[0]} - {progress.describe()}")
+        else:
+            job.update(done, total, current[0])
+
+    def on_progress(done, total, pdf):
+        job.check_cancelled()
+        current[0] = f"Downloading {done+1}/{total}: {pdf['filename']}..." if pdf is not None else "Finishing archive..."
+        show(done, total)
+
+    # Time every request of this build; records go to a JSONL file offered for download
+    with tempfile.NamedTemporaryFile(prefix="documine_metrics_", suffix=".jsonl", delete=False) as metrics_file:
+        pass
+    metrics = net_metrics.MetricsRecorder(metrics_file.name)
+    session = http_client.create_session(cookies, metrics=metrics)
+    # Prefetched files are read from the artifact store instead of downloaded
+    scope = http_client.cookie_scope(http_client.merge_cookies(cookies))
+    local = {pdf['url']: prefetch.local_copy(store, pdf['url'], scope) for pdf in pdf_list}
+
+    try:
+        with tempfile.NamedTemporaryFile(prefix="documine_", suffix=".zip", delete=False) as archive:
             try:
-                status_text.text(f"Downloading {i+1}/{total}: {pdf['filename']}...")
-                # Pass cookies here!
-                resp = requests.get(pdf['url'], headers=headers, cookies=session_cookies, timeout=30)
-                if resp.status_code == 200:
-                    # Check if actually PDF (not age gate HTML)
-                    content_type = resp.headers.get('Content-Type', '').lower()
-                    if 'application/pdf' in content_type or resp.content.startswith(b'%PDF'):
-                         zip_file.writestr(pdf['filename'], resp.content)
-                         success_count += 1
-                    else:
-                        st.warning(f"Skipped {pdf['filename']}: Not a PDF (Type: {content_type}). Age verification issue?")
-                else:
-                    st.warning(f"Failed to download {pdf['filename']}: Status {resp.status_code}")
-
-
-            except Exception:
-                pass # Skip failed downloads
-            
-            # Update progress
-            progress_bar.progress((i + 1) / total)
-
-    status_text.empty()
-    progress_bar.empty()
-    
-    zip_buffer.seek(0)
-    return zip_buffer, success_count
+                if PROBE_SIZES or MAX_ZIP_MB:
+                    pdf_list = [pdf.copy() for pdf in pdf_list]
+                    for pdf in pdf_list:
+                        if local[pdf['url']]:
+                            pdf['size'] = os.path.getsize(local[pdf['url']])
+                    known_bytes, unknown = size_probe.probe_sizes(
+                        [pdf for pdf in pdf_list if not local[pdf['url']]], session, limits=limits,
+                        on_progress=lambda done, total: job.update(done, total, f"Checking file sizes ({done}/{total})...")
+                    )
+                    known_bytes += sum(pdf['size'] for pdf in pdf_list if local[pdf['url']])
+                    job.check_cancelled()
+                    size_probe.check_budget(known_bytes, int(MAX_ZIP_MB * 1024 * 1024))
+                    progress = size_probe.ByteProgress(known_bytes, unknown,
+                                                       listener=lambda p: show(job.done, job.total))
+                _, success_count = zip_builder.build_pdf_zip(
+                    pdf_list,
+                    session=session,
+                    archive=archive,
+                    on_progress=on_progress,
+                    on_warning=job.warn,
+                    cache=cache,
+                    progress=progress,
+                    local_file=lambda pdf: local[pdf['url']]
+                )
+            except BaseException:
+                archive.close()
+                os.remove(archive.name)
+                metrics.close()
+                os.remove(metrics.path)
+                raise
+    finally:
+        metrics.close()
+        session.close()
+
+    store.put_file(f"{zip_key}-metrics", metrics.path)
+    store.put_file(zip_key, archive.name, meta={
+        'count': success_count,
+        'warnings': job.warnings,
+        'metrics_summary': metrics.summary(),
+    })
+    return success_count
+
+def submit_job(state_key, kind, fn, *args, key=None):
+    """Submits a background job for this session and remembers it under state_key."""
+    try:
+        job = get_job_manager().submit(get_session_id(), kind, fn, *args, key=key)
+    except jobs.QuotaExceeded as e:
+        st.warning(f"Please wait: {e}.")
+        return
+    st.session_state[state_key] = job.id
+
+@st.fragment(run_every=1.0)
+def watch_job(state_key, label):
+    """Polls a background job, showing its progress, and reruns the page once it has finished."""
+    job = get_job_manager().get(st.session_state.get(state_key))
+    if job is None:
+        st.session_state.pop(state_key, None)
+        return
+    if job.active:
+        status = "Queued, waiting for a free worker..." if job.state == jobs.QUEUED else (job.message or label)
+        st.progress(job.progress or 0.0, text=status)
+        for warning in job.warnings[-3:]:
+            st.caption(f"⚠️ {warning}")
+        if st.button("Cancel", key=f"cancel_{state_key}"):
+            get_job_manager().cancel(job.id, get_session_id())
+            st.session_state.pop(state_key, None)
+            st.rerun()
+        return
+    # Hand the finished job to the full page run
+    st.session_state[f"{state_key}_finished"] = st.session_state.pop(state_key)
+    st.rerun()
+
+def pop_finished_job(state_key):
+    """Returns this session's job under state_key once it has finished, or None."""
+    return get_job_manager().get(st.session_state.pop(f"{state_key}_finished", None))
+
+def start_prefetch(url, links_key, cookies):
+    """Starts prefetching the scanned files of url in the background, if this session opted in."""
+    if not st.session_state.get('prefetch_enabled'):
+        return
+    try:
+        job = get_prefetch_manager().submit(get_session_id(), 'prefetch', prefetch_job, links_key, cookies,
+                                            get_artifact_store(), key=f"prefetch-{links_key}")
+    except jobs.QuotaExceeded:
+        # This session's previous prefetch is still winding down; speculative work is skipped, not queued
+        return
+    st.session_state['prefetch_job'] = job.id
+    st.session_state['prefetch_url'] = url
+
+def stop_prefetch():
+    """Stops this session's prefetch, e.g. because the URL changed or a ZIP build takes over."""
+    job_id = st.session_state.pop('prefetch_job', None)
+    if job_id:
+        get_prefetch_manager().cancel(job_id, get_session_id())
+
+@st.fragment(run_every=2.0)
+def watch_prefetch():
+    """Shows how far the background prefetch has got."""
+    job = get_prefetch_manager().get(st.session_state.get('prefetch_job'))
+    if job is None:
+        return
+    if job.active:
+        st.caption(f"⚡ Prefetching in the background: {job.message or 'starting...'}")
+    elif job.state == jobs.DONE:
+        totals = job.result
+        ended = "" if totals['reason'] == prefetch.DONE else f" (stopped at the {totals['reason']})"
+        st.caption(f"⚡ {totals['fetched'] + totals['stored']} file(s) ready locally{ended}.")
+
+def set_scan_result(url, links_key, links=None):
+    """Makes the scan stored under links_key this session's result for url, dropping the decoded previous one."""
+    st.session_state['links_key'] = links_key
+    st.session_state['source_url'] = url
+    st.session_state.pop('file_search', None)
+    if links is None:
+        st.session_state.pop('link_table', None)
+    else:
+        st.session_state['link_table'] = (links_key, links)
+
+def get_link_table(links_key):
+    """Returns the scanned links under links_key, decoded once per scan result; None once they have expired."""
+    decoded = st.session_state.get('link_table')
+    if decoded is not None and decoded[0] == links_key:
+        return decoded[1]
+    columns = get_artifact_store().get_value(links_key)
+    if columns is None:
+        return None
+    links = link_parser.LinkTable(columns)
+    st.session_state['link_table'] = (links_key, links)
+    return links
+
+def search_links(links, query, field):
+    """Returns the rows of links matching the search, searching again only when the search changes."""
+    search_key = (st.session_state['links_key'], query.strip().lower(), field)
+    found = st.session_state.get('file_search')
+    if found is None or found[0] != search_key:
+        found = (search_key, links.search(query, SEARCH_FIELDS[field]))
+        st.session_state['file_search'] = found
+    return found[1]
+
+def show_network_metrics(summary, metrics_path):
+    """Shows the timing summary of a ZIP build."""
+    with st.expander("📡 Network Timings"):
+        if not summary['requests']:
+            st.write("No requests recorded.")
+            return
+        throughput = summary['throughput']
+        st.write(
+            f"{summary['requests']} requests, {summary['new_connections']} new connections, "
+            f"{summary['errors']} errors - {summary['bytes'] / 1024 / 1024:.2f} MB in "
+            f"{summary['wall_seconds']:.1f}s" + (f" ({throughput / 1024 / 1024:.2f} MB/s)" if throughput else "")
+        )
+        rows = []
+        for phase, stats in summary['phases'].items():
+            if stats['count']:
+                row = {"Phase": phase, "Count": stats['count']}
+                for pct in net_metrics.PERCENTILES:
+                    row[f"p{pct} ms"] = round(stats[f'p{pct}'], 1)
+                row["Max ms"] = round(stats['max'], 1)
+                rows.append(row)
+        st.dataframe(rows, width="stretch")
+        if metrics_path and os.path.exists(metrics_path):
+            with open(metrics_path, 'rb') as f:
+                st.download_button(
+                    label="Download per-request records (.jsonl)",
+                    data=f,
+                    file_name="documine_metrics.jsonl",
+                    mime="application/x-ndjson"
+                )
 
 # --- UI Layout ---
 
@@ -146,6 +410,22 @@ with st.sidebar:
     if user_cookies:
         st.success(f"Loaded {len(user_cookies)} custom cookies.")
 
+    st.checkbox(
+        "Read PDF metadata when scanning",
+        value=READ_METADATA_DEFAULT,
+        key='read_metadata',
+        help="Adds page count, title, author, producer and creation date to the file list. Reads a few small "
+             "parts of every PDF, so scans of large pages take longer."
+    )
+
+    st.checkbox(
+        "Prefetch files after scanning",
+        value=PREFETCH_DEFAULT,
+        key='prefetch_enabled',
+        help=f"Start downloading in the background as soon as a scan finishes (up to {PREFETCH_MAX_MB:.0f} MB "
+             f"or {PREFETCH_SECONDS:.0f}s), so the ZIP is built from local copies."
+    )
+
 st.title("⛏️ DocuMine")
 st.markdown("""
 **The Intelligent PDF Harvester**
@@ -155,29 +435,63 @@ You can view the list and download them individually or as a bulk ZIP file.
 
 url_input = st.text_input("Website URL", placeholder="https://example.com/page-with-pdfs")
 
+# A prefetch only makes sense for the page it was started for
+if 'prefetch_job' in st.session_state and st.session_state.get('prefetch_url') != url_input:
+    stop_prefetch()
+
 if url_input:
     # Basic validation
     if not (url_input.startswith("http://") or url_input.startswith("https://")):
         st.warning("Please enter a valid URL starting with http:// or https://")
     else:
         if st.button("Find PDFs", type="primary"):
-            with st.spinner("Scanning page for PDFs..."):
-                links, error = get_pdf_links(url_input, cookies=user_cookies)
-                
-            if error:
-                st.error(f"Error fetching the page: {error}")
-            elif not links:
+            session = get_http_session(user_cookies)
+            read_metadata = st.session_state.get('read_metadata', False)
+            # Scans with and without metadata are stored apart
+            links_key = artifact_store.make_key('link-table-metadata' if read_metadata else 'link-table',
+                                                [url_input], session.cache_scope)
+            cached = get_artifact_store().get_value(links_key, max_age=SCAN_TTL)
+            if cached is not None:
+                # Scanned recently, by this or another session
+                cached = link_parser.LinkTable(cached)
+                st.success(f"Found {len(cached)} PDF files!" if cached else "No PDF links found on this page.")
+                set_scan_result(url_input, links_key, cached)
+                if cached:
+                    start_prefetch(url_input, links_key, user_cookies)
+            else:
+                # Scans run in the background; resubmitting the same page reuses the running scan
+                submit_job('scan_job', 'scan', scan_job, url_input, session, get_http_cache(),
+                           get_artifact_store(), links_key, get_host_limits(), read_metadata, key=links_key)
+                st.session_state['scan_target'] = (url_input, links_key)
+
+        if 'scan_job' in st.session_state:
+            watch_job('scan_job', "Scanning page for PDFs...")
+
+        job = pop_finished_job('scan_job')
+        if job is not None:
+            if job.state == jobs.FAILED:
+                st.error(f"Error fetching the page: {job.error}")
+            elif job.state == jobs.CANCELLED:
+                st.info("Scan cancelled.")
+            elif not job.result:
                 st.info("No PDF links found on this page.")
             else:
-                st.success(f"Found {len(links)} PDF files!")
+                st.success(f"Found {job.result} PDF files!")
                 
-                # Store in session state so we don't lose it on interactions
-                st.session_state['pdf_links'] = links
-                st.session_state['source_url'] = url_input
+                # Remember the key so we don't lose the results on interactions
+                set_scan_result(*st.session_state['scan_target'])
+                start_prefetch(url_input, st.session_state['links_key'], user_cookies)
+
+links = None
+if 'links_key' in st.session_state and st.session_state.get('source_url') == url_input:
+    # Decoded once per scan result, not on every rerun
+    links = get_link_table(st.session_state['links_key'])
+    if links is None:
+        st.info("These results have expired. Click **Find PDFs** to scan the page again.")
+        del st.session_state['links_key']
 
 # Display results if valid links exist source_url matches current input (simple consistency check)
-if 'pdf_links' in st.session_state and st.session_state.get('source_url') == url_input:
-    links = st.session_state['pdf_links']
+if links:
     
     # 1. Show summary metrics
     col1, col2 = st.columns(2)
@@ -193,37 +507,133 @@ if 'pdf_links' in st.session_state and st.session_state.get('source_url') == url
     # *before* clicking can be slow. 
     # Pattern: "Generate Zip" button -> Process -> Show "Download Zip" button.
     
-    if st.button("Prepare ZIP Download"):
-        with st.spinner("Downloading files and creating ZIP..."):
-            zip_data, count = create_zip_of_pdfs(links, cookies=user_cookies)
-            st.session_state['zip_data'] = zip_data
-            st.session_state['zip_count'] = count
-            st.session_state['zip_ready'] = True
-    
-    if st.session_state.get('zip_ready'):
-        count = st.session_state.get('zip_count', 0)
-        st.success(f"ZIP ready! Contains {count} valid files.")
-        st.download_button(
-            label="⬇️ Download All PDFs (.zip)",
-            data=st.session_state['zip_data'],
-            file_name="extracted_pdfs.zip",
-            mime="application/zip"
-        )
+    # Archives are shared: any session asking for the same files with the same cookies gets the same ZIP
+    cookie_scope = http_client.cookie_scope(http_client.merge_cookies(user_cookies))
+    # Canonicalizing every URL is the slowest step of a rerun on large scans; do it once per result set
+    zip_key_for = (st.session_state['links_key'], cookie_scope)
+    if st.session_state.get('zip_key_for') != zip_key_for:
+        st.session_state['zip_key'] = artifact_store.make_key('zip', links.column('url'), cookie_scope)
+        st.session_state['zip_key_for'] = zip_key_for
+    zip_key = st.session_state['zip_key']
+    stored_zip = get_artifact_store().get_file(zip_key)
+    
+    if 'prefetch_job' in st.session_state:
+        watch_prefetch()
+    
+    if st.button("Prepare ZIP Download") and stored_zip is None:
+        # The build reads what was prefetched and fetches the rest itself
+        stop_prefetch()
+        # Built in the background; clicking again while it runs reuses the running build
+        submit_job('zip_job', 'zip', create_zip_of_pdfs, links.records(), user_cookies, get_http_cache(),
+                   get_artifact_store(), zip_key, get_host_limits(), key=zip_key)
+    
+    if 'zip_job' in st.session_state:
+        watch_job('zip_job', "Downloading files and creating ZIP...")
+    
+    job = pop_finished_job('zip_job')
+    if job is not None:
+        if job.state == jobs.DONE:
+            stored_zip = get_artifact_store().get_file(zip_key)
+        elif job.state == jobs.FAILED:
+            st.error(f"Error building the ZIP: {job.error}")
+        else:
+            st.info("ZIP build cancelled.")
+    
+    if stored_zip is not None:
+        zip_path, zip_meta = stored_zip
+        st.success(f"ZIP ready! Contains {zip_meta['count']} valid files.")
+        warnings = zip_meta.get('warnings', [])
+        if warnings:
+            with st.expander(f"⚠️ {len(warnings)} file(s) skipped"):
+                for warning in warnings:
+                    st.write(warning)
+        try:
+            # Hand Streamlit a file handle rather than an in-memory buffer
+            with open(zip_path, 'rb') as zip_file:
+                st.download_button(
+                    label="⬇️ Download All PDFs (.zip)",
+                    data=zip_file,
+                    file_name="extracted_pdfs.zip",
+                    mime="application/zip"
+                )
+        except FileNotFoundError:
+            st.info("This archive was just evicted to free space. Click **Prepare ZIP Download** to build it again.")
+        stored_metrics = get_artifact_store().get_file(f"{zip_key}-metrics")
+        show_network_metrics(zip_meta['metrics_summary'], stored_metrics[0] if stored_metrics else None)
     
     st.divider()
 
     # 3. Individual List
     st.write("### 📝 File List")
     
-    # Convert to simple list of dicts for dataframe or display
-    # Let's do a dataframe for cleaner look
-    display_data = [{"File Name": l['filename'], "Link Text": l['text'], "URL": l['url']} for l in links]
-    st.dataframe(display_data, width="stretch")
+    # Search and page through the list; only the rows on the current page are built and rendered
+    col_query, col_field, col_size = st.columns([4, 1, 1])
+    with col_query:
+        query = st.text_input("Search files", placeholder="Part of a file name, link text or URL")
+    with col_field:
+        field = st.selectbox("Search in", list(SEARCH_FIELDS))
+    with col_size:
+        page_size = st.selectbox("Rows per page", FILE_PAGE_SIZES, index=1)
+    rows = search_links(links, query, field)
+    page_count = max(1, math.ceil(len(rows) / page_size))
+    # A new search or page size starts again from the first page
+    page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1,
+                           key=f"file_page-{hash((st.session_state['links_key'], query, field, page_size))}")
+    first = (page - 1) * page_size
+    page_links = links.records(rows[first:first + page_size])
+    if not rows:
+        st.info("No files match your search.")
+    else:
+        st.caption(f"Showing {first + 1}-{first + len(page_links)} of {len(rows)} file(s)"
+                   + (f" matching, {len(links)} in total" if len(rows) != len(links) else ""))
+    
+        display_data = [{"File Name": l['filename'], "Link Text": l['text'], "URL": l['url']} for l in page_links]
+        if links.has('metadata'):
+            for row, l in zip(display_data, page_links):
+                metadata = l.get('metadata') or {}
+                row.update({"Pages": metadata.get('pages'), "Title": metadata.get('title'),
+                            "Author": metadata.get('author'), "Producer": metadata.get('producer'),
+                            "Created": metadata.get('created')})
+        st.dataframe(display_data, width="stretch")
+        
+        # Detailed list with individual links
+        with st.expander("View Individual Links"):
+            st.markdown('\n'.join(f"- **[{l['filename']}]({l['url']})**: {l['text']}" for l in page_links))
+    
+    # Prefetched files on this page can also be saved one at a time, straight from local disk
+    if st.session_state.get('prefetch_url') == url_input:
+        ready = []
+        for l in page_links:
+            path = prefetch.local_copy(get_artifact_store(), l['url'], cookie_scope)
+            if path:
+                ready.append((l, path))
+        if ready:
+            choice = st.selectbox(f"⚡ {len(ready)} prefetched file(s) on this page ready to download",
+                                  range(len(ready)), format_func=lambda i: ready[i][0]['filename'])
+            try:
+                with open(ready[choice][1], 'rb') as pdf_file:
+                    st.download_button("⬇️ Download File", data=pdf_file, file_name=ready[choice][0]['filename'],
+                                       mime="application/pdf")
+            except FileNotFoundError:
+                st.info("This file was just evicted to free space.")
+
+# --- Full-Text Search ---
+if INDEX_PATH and os.path.exists(INDEX_PATH):
+    st.divider()
+    st.write("### 🔎 Search Documents")
+    index_stats = get_text_index().stats()
+    st.caption(f"Searches the text of {index_stats['documents']} harvested document(s), "
+               f"{index_stats['pages']} page(s).")
     
-    # Detailed list with individual links
-    with st.expander("View Individual Links"):
-        for l in links:
-            st.markdown(f"- **[{l['filename']}]({l['url']})**: {l['text']}")
+    query = st.text_input("Search text", placeholder='e.g. "flood control" budget* report')
+    if query:
+        results = get_text_index().search(query, limit=SEARCH_LIMIT)
+        if not results:
+            st.info("No documents match your search.")
+        for idx, result in enumerate(results, 1):
+            pages = ', '.join(str(page) for page in result['pages'])
+            st.markdown(f"**{idx}. {result['filename']}** ({'page' if len(result['pages']) == 1 else 'pages'} {pages})")
+            st.caption(result['snippet'])
 
 # --- Footer ---
 st.divider()
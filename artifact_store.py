@@ -0,0 +1,227 @@
+"""
+DocuMine - Artifact Store
+Server-side store for what the web app builds: scan results and ZIP
+archives. Sessions keep only a key, so identical work is shared between
+sessions and memory use no longer grows with every open browser tab.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import crawler
+
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+DEFAULT_MEMORY_BYTES = 64 * 1024 * 1024
+# Artifacts not used for this many seconds are dropped
+DEFAULT_IDLE_TTL = 3600
+
+ARTIFACT_SUFFIX = '.artifact'
+
+
+def make_key(kind, urls, scope=''):
+    """
+    Key for an artifact built from a set of URLs.
+
+    URLs are canonicalized and sorted, so the same collection gives the same
+    key whatever the link order or query parameter order.
+
+    Args:
+        kind (str): What is stored, e.g. 'links' or 'zip'
+        urls (iterable): The URLs the artifact was built from
+        scope (str): Cookie fingerprint (``http_client.cookie_scope``)
+
+    Returns:
+        str: Hex key
+    """
+    canonical = sorted({crawler.canonicalize_url(url) for url in urls})
+    material = '\n'.join([kind, scope] + canonical)
+    return f"{kind}-{hashlib.sha256(material.encode('utf-8')).hexdigest()[:32]}"
+
+
+class ArtifactStore:
+    """
+    Byte-budgeted artifact store with LRU and idle-TTL eviction.
+
+    Values (JSON-serializable objects such as link lists) are kept in memory
+    up to ``memory_bytes`` and spilled to disk beyond that; files such as
+    ZIP archives live on disk. Together they never exceed ``max_bytes``:
+    the least recently used artifacts are evicted first, and any artifact
+    idle for longer than ``idle_ttl`` seconds is dropped.
+
+    Anything left under ``root`` by an earlier process is removed on start.
+    """
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES, memory_bytes=DEFAULT_MEMORY_BYTES,
+                 idle_ttl=DEFAULT_IDLE_TTL):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.idle_ttl = idle_ttl
+        self._entries = OrderedDict()  # key -> entry dict, least recently used first
+        self._lock = threading.Lock()
+        self._memory = 0
+        self._total = 0
+        os.makedirs(root, exist_ok=True)
+        for name in os.listdir(root):
+            if name.endswith(ARTIFACT_SUFFIX):
+                self._remove_file(os.path.join(root, name))
+
+    def _new_path(self, key):
+        return os.path.join(self.root, f"{key}-{uuid.uuid4().hex[:8]}{ARTIFACT_SUFFIX}")
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def put_value(self, key, value):
+        """
+        Store a JSON-serializable value.
+
+        Args:
+            key (str): Artifact key
+            value: The value
+        """
+        data = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        entry = {'data': data, 'path': None, 'meta': None, 'size': len(data), 'created': time.time()}
+        with self._lock:
+            self._insert_locked(key, entry)
+            self._memory += entry['size']
+            self._evict_locked()
+
+    def get_value(self, key, max_age=None):
+        """
+        Fetch a stored value.
+
+        Args:
+            key (str): Artifact key
+            max_age (float): Ignore the value if it was stored longer ago
+                than this many seconds
+
+        Returns:
+            The value, or None if missing, expired or too old
+        """
+        with self._lock:
+            entry = self._touch_locked(key, max_age)
+            if entry is None or entry['meta'] is not None:
+                return None
+            data, path = entry['data'], entry['path']
+        if data is None:
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                return None
+        return json.loads(data)
+
+    def put_file(self, key, src_path, meta=None):
+        """
+        Move a finished file into the store.
+
+        Args:
+            key (str): Artifact key
+            src_path (str): The file; it is moved, not copied
+            meta (dict): JSON-serializable details returned with the file
+
+        Returns:
+            str: Path of the stored file
+        """
+        path = self._new_path(key)
+        shutil.move(src_path, path)
+        entry = {'data': None, 'path': path, 'meta': dict(meta or {}), 'size': os.path.getsize(path),
+                 'created': time.time()}
+        with self._lock:
+            self._insert_locked(key, entry)
+            self._evict_locked()
+        return path
+
+    def get_file(self, key):
+        """
+        Fetch a stored file.
+
+        Returns:
+            tuple: (path, meta), or None if missing or evicted
+        """
+        with self._lock:
+            entry = self._touch_locked(key)
+            if entry is None or entry['meta'] is None:
+                return None
+            path, meta = entry['path'], entry['meta']
+        if not os.path.exists(path):
+            return None
+        return path, meta
+
+    def discard(self, key):
+        """Removes an artifact if present."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry:
+                self._drop_locked(entry)
+
+    def total_bytes(self):
+        """Returns the bytes held, in memory and on disk."""
+        with self._lock:
+            return self._total
+
+    def _insert_locked(self, key, entry):
+        old = self._entries.pop(key, None)
+        if old:
+            self._drop_locked(old)
+        entry['accessed'] = time.time()
+        self._entries[key] = entry
+        self._total += entry['size']
+
+    def _touch_locked(self, key, max_age=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = time.time()
+        if now - entry['accessed'] > self.idle_ttl:
+            del self._entries[key]
+            self._drop_locked(entry)
+            return None
+        if max_age is not None and now - entry['created'] > max_age:
+            return None
+        entry['accessed'] = now
+        self._entries.move_to_end(key)
+        return entry
+
+    def _drop_locked(self, entry):
+        self._total -= entry['size']
+        if entry['data'] is not None:
+            self._memory -= entry['size']
+        if entry['path']:
+            self._remove_file(entry['path'])
+
+    def _evict_locked(self):
+        now = time.time()
+        for key in [key for key, entry in self._entries.items() if now - entry['accessed'] > self.idle_ttl]:
+            self._drop_locked(self._entries.pop(key))
+
+        # Over the global budget: drop least recently used artifacts, but
+        # never the one just stored
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._drop_locked(entry)
+
+        # Over the memory budget: spill least recently used values to disk
+        if self._memory > self.memory_bytes:
+            for key, entry in self._entries.items():
+                if self._memory <= self.memory_bytes:
+                    break
+                if entry['data'] is None:
+                    continue
+                path = self._new_path(key)
+                with open(path, 'wb') as f:
+                    f.write(entry['data'])
+                entry['path'] = path
+                entry['data'] = None
+                self._memory -= entry['size']
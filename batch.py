@@ -0,0 +1,164 @@
+"""
+DocuMine - Batch Harvesting
+Non-interactive harvesting of many seed URLs: seeds are read from a file or
+stdin, scanned in parallel, and their links written as JSON Lines or CSV for
+other tools to consume.
+"""
+
+import csv
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import crawler
+import pdf_metadata
+
+DEFAULT_SEED_WORKERS = 4
+
+FORMATS = ('jsonl', 'csv')
+# Columns of the CSV output, and the order of keys in each JSONL record
+FIELDS = ('seed', 'page', 'filename', 'url', 'text')
+# Added after FIELDS with --metadata
+METADATA_FIELDS = pdf_metadata.FIELDS + ('metadata_error',)
+
+# Exit codes
+EXIT_OK = 0
+EXIT_PARTIAL = 1    # some seeds or downloads failed
+EXIT_USAGE = 2      # bad arguments (argparse uses 2 as well)
+EXIT_FAILED = 3     # every seed failed
+EXIT_INTERRUPTED = 130
+
+
+def read_seeds(source):
+    """
+    Read seed URLs, one per line.
+
+    Blank lines and lines starting with ``#`` are skipped, and repeated seeds
+    are kept once.
+
+    Args:
+        source (str): Path of the file, or ``-`` for stdin
+
+    Returns:
+        list: The seed URLs in file order
+    """
+    if source == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    seeds = (line.strip() for line in lines)
+    return list(dict.fromkeys(seed for seed in seeds if seed and not seed.startswith('#')))
+
+
+def format_for(path, requested=None):
+    """Returns the output format: the requested one, else 'csv' for a .csv path, else 'jsonl'."""
+    if requested:
+        return requested
+    return 'csv' if path and path.lower().endswith('.csv') else 'jsonl'
+
+
+class RecordWriter:
+    """
+    Writes link records as JSON Lines or CSV.
+
+    Every record carries the seed it came from and, when crawling, the page
+    it was found on. Each record is flushed as it is written, so a consumer
+    reading the output through a pipe sees links while the batch runs.
+
+    Args:
+        stream (file): Text stream to write to
+        fmt (str): 'jsonl' or 'csv'
+        metadata (bool): Add the ``METADATA_FIELDS`` columns
+    """
+
+    def __init__(self, stream, fmt='jsonl', metadata=False):
+        self.stream = stream
+        self.fmt = fmt
+        self.metadata = metadata
+        self.count = 0
+        self._csv = None
+        if fmt == 'csv':
+            fields = FIELDS + METADATA_FIELDS if metadata else FIELDS
+            self._csv = csv.DictWriter(stream, fieldnames=fields, extrasaction='ignore')
+            self._csv.writeheader()
+
+    def write(self, seed, pdf):
+        """Writes one link found from ``seed``."""
+        record = {'seed': seed, 'page': pdf.get('page', seed), 'filename': pdf['filename'],
+                  'url': pdf['url'], 'text': pdf['text']}
+        if self.metadata:
+            metadata = pdf.get('metadata') or {}
+            record.update({field: metadata.get(field) for field in pdf_metadata.FIELDS},
+                          metadata_error=metadata.get('error'))
+        if self._csv:
+            self._csv.writerow(record)
+        else:
+            self.stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.stream.flush()
+        self.count += 1
+
+
+def harvest_seeds(seeds, harvest, workers=DEFAULT_SEED_WORKERS):
+    """
+    Run ``harvest(seed)`` for many seeds in parallel.
+
+    Args:
+        seeds (list): Seed URLs
+        harvest (callable): Returns the link list of one seed, raising on
+            failure
+        workers (int): Number of seeds processed at once
+
+    Yields:
+        tuple: (seed, links, error) in completion order; ``links`` is None
+            when ``error`` is set
+    """
+    valid = []
+    for seed in seeds:
+        parsed = urlparse(seed)
+        if parsed.scheme not in ('http', 'https') or not parsed.netloc:
+            yield seed, None, "Invalid URL format (include http:// or https://)"
+        else:
+            valid.append(seed)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(harvest, seed): seed for seed in valid}
+        try:
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as e:
+                    yield futures[future], None, str(e)
+        finally:
+            # Stopped early (e.g. interrupted): drop seeds that have not started
+            for future in futures:
+                future.cancel()
+
+
+def unique_links(links, seen):
+    """
+    Yield links whose canonical URL is not in ``seen``, adding them to it.
+
+    Used so a file linked from several seeds is downloaded once.
+    """
+    for pdf in links:
+        key = crawler.canonicalize_url(pdf['url'])
+        if key not in seen:
+            seen.add(key)
+            yield pdf
+
+
+def exit_code(seed_failures, seed_count, download_failures=0):
+    """
+    Exit code of a batch run.
+
+    Returns:
+        int: ``EXIT_OK`` if everything succeeded, ``EXIT_FAILED`` if every
+            seed failed, otherwise ``EXIT_PARTIAL``
+    """
+    if seed_count and seed_failures == seed_count:
+        return EXIT_FAILED
+    if seed_failures or download_failures:
+        return EXIT_PARTIAL
+    return EXIT_OK
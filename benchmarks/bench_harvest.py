@@ -0,0 +1,263 @@
+"""
+DocuMine - Offline Harvest Benchmark
+Starts a local stand-in server (benchmarks/local_server.py) and runs the
+extract, crawl, download and ZIP paths against it, reporting throughput,
+per-file latency percentiles and peak RSS.
+
+Each phase runs in a fresh process so its peak RSS is its own.
+
+Usage:
+    python benchmarks/bench_harvest.py --links 500 --size 50k-2m --latency 20 --workers 8
+    python benchmarks/bench_harvest.py --json results.json
+    python benchmarks/bench_harvest.py --compare results.json --tolerance 0.15
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import local_server
+
+PHASES = ('extract', 'crawl', 'download', 'zip')
+
+# Metrics where a higher value is better; used by --compare
+THROUGHPUT_METRICS = ('links_per_s', 'pages_per_s', 'files_per_s', 'mb_per_s')
+
+
+def peak_rss():
+    """Returns this process's peak resident set size in bytes, if known."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def _quiet():
+    """Silences the progress output of the code under test."""
+    return contextlib.redirect_stdout(open(os.devnull, 'w'))
+
+
+def _dir_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            if not name.startswith('.'):
+                total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def run_phase(phase, base_url, options):
+    """
+    Run one phase against the server and return its metrics.
+
+    Runs inside a child process; imports DocuMine modules lazily so the
+    parent's memory does not count towards the phase.
+    """
+    import http_client
+    import net_metrics
+    import pdf_extractor
+
+    session = http_client.create_session(pool_size=max(options['workers'], http_client.DEFAULT_POOL_SIZE))
+    result = {'phase': phase}
+
+    if phase == 'extract':
+        best = None
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            with _quiet():
+                links = pdf_extractor.extract_pdf_links(f"{base_url}/all", session=session)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        result.update(links=len(links), seconds=best, links_per_s=len(links) / best)
+
+    elif phase == 'crawl':
+        import crawler
+        import parse_pool
+        pool = parse_pool.ParsePool(options['parse_processes']) if options['parse_processes'] else None
+        start = time.perf_counter()
+        try:
+            with _quiet():
+                links = crawler.crawl(f"{base_url}/listing", session=session, max_depth=1,
+                                      max_pages=options['pages'] + 1, workers=options['crawl_workers'],
+                                      pool=pool)
+        finally:
+            if pool:
+                pool.close()
+        elapsed = time.perf_counter() - start
+        result.update(links=len(links), pages=options['pages'], seconds=elapsed,
+                      pages_per_s=options['pages'] / elapsed, links_per_s=len(links) / elapsed)
+
+    elif phase == 'download':
+        with _quiet():
+            links = pdf_extractor.extract_pdf_links(f"{base_url}/all", session=session)
+        metrics = net_metrics.MetricsRecorder()
+        http_client.set_metrics(session, metrics)
+        with tempfile.TemporaryDirectory(prefix='documine_bench_') as download_dir:
+            start = time.perf_counter()
+            with _quiet():
+                ok, failed = pdf_extractor.download_pdfs(links, download_dir, workers=options['workers'],
+                                                         session=session)
+            elapsed = time.perf_counter() - start
+            size = _dir_bytes(download_dir)
+        result.update(files=ok, failed=failed, bytes=size, seconds=elapsed,
+                      files_per_s=ok / elapsed, mb_per_s=size / elapsed / 1024 / 1024,
+                      **_latency(metrics))
+
+    elif phase == 'zip':
+        import zip_builder
+        with _quiet():
+            links = pdf_extractor.extract_pdf_links(f"{base_url}/all", session=session)
+        metrics = net_metrics.MetricsRecorder()
+        http_client.set_metrics(session, metrics)
+        with tempfile.TemporaryFile() as archive:
+            start = time.perf_counter()
+            _, count = zip_builder.build_pdf_zip(links, session=session, archive=archive)
+            elapsed = time.perf_counter() - start
+            archive.seek(0, os.SEEK_END)
+            size = archive.tell()
+        result.update(files=count, failed=len(links) - count, bytes=size, seconds=elapsed,
+                      files_per_s=count / elapsed, mb_per_s=size / elapsed / 1024 / 1024,
+                      **_latency(metrics))
+
+    result['peak_rss_mb'] = _mb(peak_rss())
+    return result
+
+
+def _latency(metrics):
+    """Per-file latency (request start to last body byte) percentiles."""
+    total = metrics.summary()['phases']['total']
+    return {'p50_ms': total['p50'], 'p95_ms': total['p95']}
+
+
+def _mb(size):
+    return None if size is None else round(size / 1024 / 1024, 1)
+
+
+def _phase_worker(phase, base_url, options, queue):
+    try:
+        queue.put(run_phase(phase, base_url, options))
+    except Exception as e:
+        queue.put({'phase': phase, 'error': f"{type(e).__name__}: {e}"})
+
+
+def run_isolated(phase, base_url, options):
+    """Runs a phase in a freshly spawned process and returns its metrics."""
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_phase_worker, args=(phase, base_url, options, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def print_results(results):
+    """Prints the metrics table."""
+    columns = [('phase', 'phase', '{}'), ('links_per_s', 'links/s', '{:,.0f}'), ('pages_per_s', 'pages/s', '{:,.1f}'),
+               ('files_per_s', 'files/s', '{:,.1f}'), ('mb_per_s', 'MB/s', '{:,.1f}'), ('p50_ms', 'p50 ms', '{:,.1f}'),
+               ('p95_ms', 'p95 ms', '{:,.1f}'), ('failed', 'failed', '{}'), ('peak_rss_mb', 'peak RSS MB', '{:,.1f}')]
+    print('  '.join(f"{title:>11}" for _, title, _ in columns))
+    for result in results:
+        if 'error' in result:
+            print(f"{result['phase']:>11}  ERROR: {result['error']}")
+            continue
+        cells = []
+        for key, _, fmt in columns:
+            value = result.get(key)
+            cells.append(f"{fmt.format(value) if value is not None else '-':>11}")
+        print('  '.join(cells))
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare throughput against a saved run.
+
+    Returns:
+        list: Messages describing metrics that dropped by more than ``tolerance``
+    """
+    previous = {r['phase']: r for r in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        old = previous.get(result['phase'])
+        if not old:
+            continue
+        for metric in THROUGHPUT_METRICS:
+            if result.get(metric) and old.get(metric):
+                change = result[metric] / old[metric] - 1
+                if change < -tolerance:
+                    regressions.append(f"{result['phase']}.{metric}: {old[metric]:,.1f} -> "
+                                       f"{result[metric]:,.1f} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark DocuMine against a local stand-in server.")
+    local_server.add_site_arguments(parser)
+    parser.add_argument('--phases', nargs='+', choices=PHASES, default=list(PHASES),
+                        help="Phases to run (default: all)")
+    parser.add_argument('--workers', type=int, default=8,
+                        help="Download workers (default: %(default)s)")
+    parser.add_argument('--crawl-workers', type=int, default=4,
+                        help="Crawl workers (default: %(default)s)")
+    parser.add_argument('--parse-processes', type=int, default=0,
+                        help="Crawl: parse pages in this many processes, 0 to parse in threads (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Extract runs, the best one is reported (default: %(default)s)")
+    parser.add_argument('--json', dest='json_path', help="Write results to this JSON file")
+    parser.add_argument('--compare', help="Compare throughput with a JSON file from an earlier run")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="Allowed throughput drop for --compare, as a fraction (default: %(default)s)")
+    args = parser.parse_args()
+
+    site = local_server.site_from_args(args)
+    options = {'workers': args.workers, 'crawl_workers': args.crawl_workers,
+               'parse_processes': args.parse_processes,
+               'repeat': args.repeat, 'pages': site.pages}
+
+    print(f"Synthetic site: {site.links} PDF(s), {site.total_bytes() / 1024 / 1024:,.1f} MB, "
+          f"{site.pages} listing page(s), latency {args.latency:g} ms, error rate {args.error_rate:g}")
+    print(f"Download workers: {args.workers}\n")
+
+    results = []
+    with local_server.LocalServer(site) as server:
+        for phase in args.phases:
+            results.append(run_isolated(phase, server.base_url, options))
+
+    print_results(results)
+
+    config = {key: getattr(args, key) for key in ('links', 'per_page', 'size', 'latency', 'error_rate',
+                                                  'gate_rate', 'seed', 'workers', 'crawl_workers',
+                                                  'parse_processes')}
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'config': config, 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json_path}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('config') != config:
+            print("\nWARNING: baseline was recorded with a different configuration")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for message in regressions:
+                print(f"  {message}")
+            sys.exit(1)
+        print("\nNo regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+DocuMine - Link Parser Benchmark
+Times every link_parser backend on the saved blocked_page.html and on
+synthetic listing pages, and checks each backend returns exactly the records
+the full BeautifulSoup parse returns. Only a mismatch from one of
+``link_parser.EXACT_BACKENDS`` fails the run; sloppy markup is expected to
+trip up the others.
+
+Usage:
+    python benchmarks/bench_link_parser.py
+    python benchmarks/bench_link_parser.py --anchors 1000 20000 --repeat 5
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import link_parser
+
+BASE_URL = 'https://www.justice.gov/epstein/court-records'
+BLOCKED_PAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'blocked_page.html')
+
+
+def synthetic_page(anchors, seed=0):
+    """
+    Build a listing page with the given number of anchors.
+
+    Roughly a third of the anchors point at PDFs. The markup mixes in the
+    things that trip up naive extractors: entities, nested inline tags,
+    whitespace-only text, comments, anchors without href, upper-case
+    extensions and navigation chrome.
+
+    Args:
+        anchors (int): Number of ``<a>`` tags
+        seed (int): Random seed, so pages are reproducible
+
+    Returns:
+        bytes: The page, UTF-8 encoded
+    """
+    rng = random.Random(seed)
+    parts = ['<!DOCTYPE html><html><head><meta charset="utf-8"><title>Court Records</title>',
+             '<style>a { color: blue; }</style></head><body><nav>']
+    for i in range(anchors):
+        kind = rng.random()
+        if kind < 0.33:
+            ext = '.PDF' if i % 17 == 0 else '.pdf'
+            text = rng.choice([
+                f'Exhibit {i}',
+                f'  <span>Doc</span> <b>{i}</b> &amp; attachments ',
+                '',
+                f'<!-- hidden -->Filing&nbsp;{i}',
+                f'<img src="icon.png"> Order {i} &ndash; signed',
+            ])
+            parts.append(f'<li><a href="/multimedia/Court%20Records/Case%20{i // 50}/{i:06d}{ext}">{text}</a></li>\n')
+        elif kind < 0.9:
+            parts.append(f'<a href="?page={i}" class="pager">{i}</a> ')
+        elif kind < 0.95:
+            parts.append(f'<a name="anchor{i}">Section {i}</a>')
+        else:
+            parts.append(f'<p>Plain paragraph {i} with <em>emphasis</em> and no links.</p>\n')
+    parts.append('</nav></body></html>')
+    return ''.join(parts).encode('utf-8')
+
+
+def sloppy_page(anchors, seed=0):
+    """
+    Build a listing page whose markup is broken the ways real pages are.
+
+    Anchors are left unclosed inside list items, paragraphs and table
+    cells, closed in the wrong order, nested, and mixed with void elements
+    that get end tags (``</br>``). Browsers and html.parser trees close an
+    unclosed anchor with its parent, which is what the exact backends must
+    reproduce.
+
+    Args:
+        anchors (int): Number of ``<a>`` tags
+        seed (int): Random seed, so pages are reproducible
+
+    Returns:
+        bytes: The page, UTF-8 encoded
+    """
+    rng = random.Random(seed)
+    parts = ['<html><body><ul>']
+    for i in range(anchors):
+        href = f'/files/{i:06d}.pdf' if rng.random() < 0.5 else f'?page={i}'
+        kind = rng.randrange(7)
+        if kind == 0:
+            parts.append(f'<li><a href="{href}">Doc {i}</li>')
+        elif kind == 1:
+            parts.append(f'<p><a href="{href}">Item {i}</p> tail {i} ')
+        elif kind == 2:
+            parts.append(f'<table><tr><td><a href="{href}"><b>Cell {i}</td></tr></table>')
+        elif kind == 3:
+            parts.append(f'<li><a href="{href}"><em>Bad {i}</a></em></li>')
+        elif kind == 4:
+            parts.append(f'<a href="{href}">Outer {i} <a href="/inner/{i}.pdf">inner</a> after</a>')
+        elif kind == 5:
+            parts.append(f'<li><a href="{href}">Line {i}<br>next</br> line<img src="x.png"></img></a></li>')
+        else:
+            parts.append(f'<li><a href="{href}">Fine {i}</a></li>\n')
+    # Left open to the end of the document
+    parts.append('<li><a href="/files/last.pdf">Last<p>Footer text</p>')
+    return ''.join(parts).encode('utf-8')
+
+
+def measure(func, repeat):
+    """Returns (best wall time in seconds, peak traced memory in bytes, result)."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def run_document(name, content, backends, repeat):
+    """
+    Benchmark all backends on one document and print a table row per backend.
+
+    Returns:
+        bool: True if every backend matched the ``soup`` baseline
+    """
+    expected_pdfs = link_parser.parse_pdf_links(content, BASE_URL, backend='soup')
+    expected_all = link_parser.parse_links(content, BASE_URL, backend='soup')
+
+    print(f"\n{name}: {len(content):,} bytes, {len(expected_pdfs):,} PDF link(s), "
+          f"{len(expected_all[0]) + len(expected_all[1]):,} link(s) in total")
+    print(f"  {'backend':<10} {'time (ms)':>10} {'speedup':>8} {'peak MB':>8}  matches soup")
+
+    ok = True
+    baseline = None
+    for backend in backends:
+        elapsed, peak, pdfs = measure(
+            lambda: link_parser.parse_pdf_links(content, BASE_URL, backend=backend), repeat)
+        baseline = baseline or elapsed
+        matches = pdfs == expected_pdfs and \
+            link_parser.parse_links(content, BASE_URL, backend=backend) == expected_all
+        ok = ok and (matches or backend not in link_parser.EXACT_BACKENDS)
+        print(f"  {backend:<10} {elapsed * 1000:>10.1f} {baseline / elapsed:>7.1f}x "
+              f"{peak / 1024 / 1024:>8.1f}  {'yes' if matches else 'NO'}")
+    return ok
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark link_parser backends.")
+    parser.add_argument('--anchors', type=int, nargs='+', default=[1000, 10000, 50000],
+                        help="Sizes of the synthetic pages (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Timed runs per backend, the best one is reported (default: %(default)s)")
+    args = parser.parse_args()
+
+    # soup first so the speedup column is relative to the original behaviour
+    backends = ['soup'] + [b for b in link_parser.available_backends() if b != 'soup']
+    print(f"Backends: {', '.join(backends)}")
+
+    ok = True
+    if os.path.exists(BLOCKED_PAGE):
+        with open(BLOCKED_PAGE, 'rb') as f:
+            ok = run_document('blocked_page.html', f.read(), backends, args.repeat) and ok
+    for count in args.anchors:
+        ok = run_document(f"synthetic ({count:,} anchors)", synthetic_page(count), backends, args.repeat) and ok
+    ok = run_document(f"sloppy ({args.anchors[0]:,} anchors)", sloppy_page(args.anchors[0]), backends, args.repeat) and ok
+
+    if not ok:
+        print("\nERROR: an exact backend returned different records than the soup baseline")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+DocuMine - Local Stand-In Server
+Serves synthetic listing pages and PDF blobs so DocuMine can be benchmarked
+without touching justice.gov.
+
+Routes:
+    /listing?page=N      Listing page N with links to its PDFs and to the
+                         other pages (page 1 when ``page`` is missing)
+    /all                 A single page linking every PDF
+    /files/NNNNNN.pdf    PDF blob; honours Range, If-None-Match and
+                         If-Modified-Since. With a gate rate, some files
+                         answer with an HTML age gate page instead
+
+Usage:
+    python benchmarks/local_server.py --links 1000 --size 200k --latency 20
+"""
+
+import argparse
+import email.utils
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+PDF_HEADER = b'%PDF-1.4\n'
+PDF_TRAILER = b'\n%%EOF\n'
+LAST_MODIFIED = email.utils.formatdate(0, usegmt=True)
+MIN_SIZE = 64
+# Served instead of the PDF for gated files; padded like a real page
+AGE_GATE_PAGE = (b'<!DOCTYPE html><html><head><title>Age Verification</title></head><body>'
+                 b'<form method="post"><p>You must be 18 or older to view this content.</p>'
+                 b'<button>I am 18 or older</button></form>' + b'<!-- padding -->' * 4096 + b'</body></html>')
+
+_SIZE_UNITS = {'': 1, 'k': 1024, 'm': 1024 * 1024, 'g': 1024 * 1024 * 1024}
+
+
+def parse_size(text):
+    """
+    Parse a size such as ``512``, ``200k`` or ``5m``.
+
+    Args:
+        text (str): The size
+
+    Returns:
+        int: Size in bytes
+    """
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([kmg]?)b?\s*', text.lower())
+    if not match:
+        raise ValueError(f"Invalid size: {text}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2)])
+
+
+def parse_size_range(text):
+    """
+    Parse ``SIZE`` or ``MIN-MAX`` into a (min, max) tuple of bytes.
+    """
+    if '-' in text:
+        low, high = text.split('-', 1)
+        return parse_size(low), parse_size(high)
+    size = parse_size(text)
+    return size, size
+
+
+class SyntheticSite:
+    """
+    Deterministic description of the synthetic collection.
+
+    File sizes are drawn once from a seeded generator, and file bodies are
+    slices of a shared random block, so serving costs no CPU beyond copying.
+    """
+
+    def __init__(self, links=1000, per_page=100, size=(200 * 1024, 200 * 1024), latency=0.0,
+                 error_rate=0.0, gate_rate=0.0, seed=0):
+        self.links = links
+        self.per_page = max(1, per_page)
+        self.latency = latency
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        # Every file needs room for its header and trailer
+        low, high = max(MIN_SIZE, size[0]), max(MIN_SIZE, size[1])
+        self.sizes = [self._rng.randint(low, high) for _ in range(links)]
+        self.gated = {i for i in range(links) if self._rng.random() < gate_rate}
+        self._block = random.Random(seed + 1).randbytes(1024 * 1024)
+
+    @property
+    def pages(self):
+        return max(1, -(-self.links // self.per_page))
+
+    def total_bytes(self):
+        """Returns the combined size of all PDFs."""
+        return sum(self.sizes)
+
+    def should_fail(self):
+        """Draws whether the next request gets an error response."""
+        if not self.error_rate:
+            return False
+        with self._rng_lock:
+            return self._rng.random() < self.error_rate
+
+    def listing(self, indexes, page=None):
+        """Renders a listing page linking the given file indexes."""
+        rows = [f'<li><a href="/files/{i:06d}.pdf">Document {i:06d}</a></li>' for i in indexes]
+        nav = ''
+        if page is not None:
+            nav = '<nav>' + ' '.join(f'<a href="/listing?page={p}">{p}</a>'
+                                     for p in range(1, self.pages + 1)) + '</nav>'
+        return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>Listing</title></head>'
+                f'<body>{nav}<ul>{"".join(rows)}</ul>{nav}</body></html>').encode('utf-8')
+
+    def body_chunks(self, index, start=0, end=None, chunk_size=64 * 1024):
+        """
+        Yield the bytes of file ``index`` between ``start`` and ``end``.
+
+        The body is ``%PDF-1.4`` plus the file index, filler from the random
+        block, and a ``%%EOF`` trailer.
+        """
+        size = self.sizes[index]
+        end = size if end is None else end
+        header = PDF_HEADER + f'% documine synthetic {index:06d}\n'.encode('ascii')
+        filler_end = size - len(PDF_TRAILER)
+        pos = start
+        while pos < end:
+            if pos < len(header):
+                piece = header[pos:min(end, len(header))]
+            elif pos >= filler_end:
+                piece = PDF_TRAILER[pos - filler_end:end - filler_end]
+            else:
+                offset = (pos + index * 7919) % len(self._block)
+                length = min(chunk_size, end - pos, filler_end - pos, len(self._block) - offset)
+                piece = self._block[offset:offset + length]
+            yield piece
+            pos += len(piece)
+
+
+class SyntheticHandler(BaseHTTPRequestHandler):
+    """Request handler for a ``SyntheticSite``."""
+
+    protocol_version = 'HTTP/1.1'
+    site = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b'', content_type='text/html; charset=utf-8', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        site = self.site
+        if site.latency:
+            time.sleep(site.latency)
+        parts = urlsplit(self.path)
+
+        if parts.path == '/all':
+            return self._send(200, site.listing(range(site.links)))
+
+        if parts.path == '/listing':
+            try:
+                page = int(parse_qs(parts.query).get('page', ['1'])[0])
+            except ValueError:
+                page = 1
+            first = (page - 1) * site.per_page
+            indexes = range(max(0, first), min(site.links, first + site.per_page))
+            return self._send(200, site.listing(indexes, page=page))
+
+        match = re.fullmatch(r'/files/(\d+)\.pdf', parts.path)
+        if not match or int(match.group(1)) >= site.links:
+            return self._send(404, b'Not found')
+        index = int(match.group(1))
+
+        if site.should_fail():
+            return self._send(503, b'Service unavailable', headers={'Retry-After': '1'})
+
+        if index in site.gated:
+            return self._send(200, AGE_GATE_PAGE)
+
+        self._send_pdf(index)
+
+    def _send_pdf(self, index):
+        site = self.site
+        size = site.sizes[index]
+        etag = f'"{index}-{size}"'
+        validators = {'ETag': etag, 'Last-Modified': LAST_MODIFIED, 'Accept-Ranges': 'bytes'}
+
+        if self.headers.get('If-None-Match') == etag or \
+                (not self.headers.get('If-None-Match') and self.headers.get('If-Modified-Since') == LAST_MODIFIED):
+            self.send_response(304)
+            for name, value in validators.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+
+        start, end, status = 0, size, 200
+        range_header = self.headers.get('Range')
+        if_range = self.headers.get('If-Range')
+        if range_header and (not if_range or if_range in (etag, LAST_MODIFIED)):
+            match = re.fullmatch(r'bytes=(\d+)-(\d*)', range_header.strip())
+            if match:
+                start = int(match.group(1))
+                end = min(size, int(match.group(2)) + 1) if match.group(2) else size
+                if start >= size:
+                    self.send_response(416)
+                    self.send_header('Content-Range', f'bytes */{size}')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                status = 206
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(end - start))
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end - 1}/{size}')
+        for name, value in validators.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command == 'HEAD':
+            return
+        try:
+            for chunk in site.body_chunks(index, start, end):
+                self.wfile.write(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class LocalServer:
+    """
+    Runs a ``SyntheticSite`` on a background thread.
+
+    Use as a context manager; ``base_url`` is set once the server is up.
+    """
+
+    def __init__(self, site, host='127.0.0.1', port=0):
+        handler = type('Handler', (SyntheticHandler,), {'site': site})
+        self.site = site
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def add_site_arguments(parser):
+    """Adds the options describing a ``SyntheticSite`` to an argument parser."""
+    parser.add_argument('--links', type=int, default=500,
+                        help="Number of PDFs in the collection (default: %(default)s)")
+    parser.add_argument('--per-page', type=int, default=100,
+                        help="PDF links per /listing page (default: %(default)s)")
+    parser.add_argument('--size', default='200k',
+                        help="PDF size or MIN-MAX range, e.g. 50k-5m (default: %(default)s)")
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="Delay before every response, in milliseconds (default: %(default)s)")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="Fraction of PDF requests answered with 503 (default: %(default)s)")
+    parser.add_argument('--gate-rate', type=float, default=0.0,
+                        help="Fraction of PDFs answered with an HTML age gate page (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="Random seed for sizes and errors (default: %(default)s)")
+
+
+def site_from_args(args):
+    """Builds a ``SyntheticSite`` from parsed ``add_site_arguments`` options."""
+    return SyntheticSite(links=args.links, per_page=args.per_page, size=parse_size_range(args.size),
+                         latency=args.latency / 1000.0, error_rate=args.error_rate, gate_rate=args.gate_rate,
+                         seed=args.seed)
+
+
+def main():
+    """Run the server in the foreground."""
+    parser = argparse.ArgumentParser(description="Serve a synthetic PDF collection for benchmarking.")
+    add_site_arguments(parser)
+    parser.add_argument('--port', type=int, default=8000, help="Port to listen on (default: %(default)s)")
+    args = parser.parse_args()
+
+    site = site_from_args(args)
+    server = LocalServer(site, port=args.port)
+    print(f"Serving {site.links} PDF(s), {site.total_bytes():,} bytes, on {server.base_url}")
+    print(f"  Listing: {server.base_url}/listing  (all links: {server.base_url}/all)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
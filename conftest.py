@@ -0,0 +1,9 @@
+"""
+pytest configuration.
+
+The tests are offline. test_googlebot.py and test_justice_cookie.py are
+manual probes that hit the live site when imported, so they are not
+collected.
+"""
+
+collect_ignore = ['test_googlebot.py', 'test_justice_cookie.py']
@@ -0,0 +1,147 @@
+"""
+DocuMine - Content-Addressed Store
+Keeps each unique PDF once, named by its SHA-256, and exposes it under its
+original filename through a hardlink plus a manifest entry.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+STORE_NAME = '.documine_store'
+MANIFEST_NAME = 'manifest.jsonl'
+
+
+class ContentStore:
+    """
+    Deduplicating file store.
+
+    Objects live under ``<root>/objects/<first two hex digits>/<sha256>.pdf``.
+    Every name a file is exposed under is appended to ``manifest.jsonl`` with
+    its URL, hash and size, so same-named but different files can be told
+    apart and identical files linked from many pages take disk space once.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.tmp_dir = os.path.join(root, 'tmp')
+        self.manifest_path = os.path.join(root, MANIFEST_NAME)
+        self.new_objects = 0
+        self.duplicates = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def object_path(self, digest):
+        """Returns the path of the object with the given SHA-256 hex digest."""
+        return os.path.join(self.objects_dir, digest[:2], digest + '.pdf')
+
+    def write_stream(self, chunks):
+        """
+        Store a stream of bytes, hashing it as it is written.
+
+        Args:
+            chunks (iterable): Byte chunks, e.g. ``response.iter_content()``
+
+        Returns:
+            tuple: (sha256 hex digest, size in bytes, object path)
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    if not chunk:
+                        continue
+                    hasher.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        digest = hasher.hexdigest()
+        return digest, size, self._commit(tmp_path, digest)
+
+    def adopt(self, file_path, digest):
+        """
+        Move an already written file into the store and link it back in place.
+
+        Args:
+            file_path (str): The downloaded file
+            digest (str): Its SHA-256 hex digest
+
+        Returns:
+            str: The object path
+        """
+        object_path = self._commit(file_path, digest)
+        self.link(object_path, file_path)
+        return object_path
+
+    def _commit(self, src_path, digest):
+        """Moves a file into the object tree, or drops it if already stored."""
+        object_path = self.object_path(digest)
+        with self._lock:
+            if os.path.exists(object_path):
+                os.remove(src_path)
+                self.duplicates += 1
+            else:
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                os.replace(src_path, object_path)
+                self.new_objects += 1
+        return object_path
+
+    @staticmethod
+    def link(object_path, dest_path):
+        """
+        Expose an object under ``dest_path``.
+
+        Uses a hardlink, falling back to a copy on file systems that do not
+        support them.
+        """
+        if os.path.exists(dest_path):
+            if os.path.samefile(object_path, dest_path):
+                return
+            os.remove(dest_path)
+        try:
+            os.link(object_path, dest_path)
+        except OSError:
+            shutil.copyfile(object_path, dest_path)
+
+    def record(self, path, url, digest, size):
+        """
+        Append a manifest entry mapping an exposed name to its content.
+
+        Args:
+            path (str): Path the file is exposed under
+            url (str): URL the file was downloaded from
+            digest (str): SHA-256 hex digest
+            size (int): Size in bytes
+        """
+        entry = {'path': path, 'url': url, 'sha256': digest, 'size': size}
+        with self._lock:
+            with open(self.manifest_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def load_manifest(self):
+        """
+        Read the manifest.
+
+        Returns:
+            dict: Latest entry for each exposed path
+        """
+        entries = {}
+        if not os.path.exists(self.manifest_path):
+            return entries
+        with open(self.manifest_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                entries[entry['path']] = entry
+        return entries
@@ -0,0 +1,214 @@
+"""
+DocuMine - Multi-Page Crawler
+Starts from a seed listing page, follows same-site listing links (pagination,
+sub-collections) up to a depth and page budget, and merges the PDF links
+found on every page.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import http_client
+import link_parser
+import profiling
+import throttle
+
+DEFAULT_MAX_DEPTH = 2
+DEFAULT_MAX_PAGES = 50
+DEFAULT_WORKERS = 4
+
+# Links to these are never listing pages
+SKIP_EXTENSIONS = (
+    '.pdf', '.zip', '.jpg', '.jpeg', '.png', '.gif', '.svg', '.css', '.js',
+    '.ico', '.mp3', '.mp4', '.doc', '.docx', '.xls', '.xlsx', '.txt', '.xml',
+)
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonicalize_url(url):
+    """
+    Normalize a URL so that equivalent links compare equal.
+
+    Lowercases the scheme and host, drops default ports and the fragment, and
+    sorts the query parameters.
+
+    Args:
+        url (str): Absolute URL
+
+    Returns:
+        str: The canonical URL
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{parts.port}"
+    path = parts.path or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+def default_scope(seed_url):
+    """
+    Return the path prefix a crawl from ``seed_url`` stays within.
+
+    This is the seed's directory, so ``/epstein/court-records`` allows
+    ``/epstein/court-records?page=2`` and ``/epstein/files/DataSet%2010/``.
+    """
+    path = urlsplit(seed_url).path or '/'
+    return path[:path.rfind('/') + 1]
+
+
+def is_listing_link(url, seed_url, scope):
+    """
+    Check whether a link should be crawled.
+
+    Args:
+        url (str): Canonical candidate URL
+        seed_url (str): Canonical seed URL
+        scope (str): Path prefix the crawl stays within
+
+    Returns:
+        bool: True if the link is an in-scope page on the seed's site
+    """
+    parts = urlsplit(url)
+    seed = urlsplit(seed_url)
+    if parts.scheme not in ('http', 'https') or parts.netloc != seed.netloc:
+        return False
+    if not parts.path.startswith(scope):
+        return False
+    return not parts.path.lower().endswith(SKIP_EXTENSIONS)
+
+
+def fetch_page(url, session, cache=None, parser=None, pool=None):
+    """
+    Fetch and parse one listing page, retrying transient failures.
+
+    Args:
+        url (str): Page URL
+        session (requests.Session): Session to fetch with
+        cache (HttpCache): Optional cache used to revalidate the page
+        parser (str): link_parser backend (default: link_parser.DEFAULT_BACKEND)
+        pool (ParsePool): Optional process pool to parse the page in
+
+    Returns:
+        tuple: (list of PDF link records, list of other absolute URLs)
+    """
+    def fetch():
+        if cache:
+            response = cache.get(session, url, timeout=http_client.PAGE_TIMEOUT)
+        else:
+            response = session.get(url, timeout=http_client.PAGE_TIMEOUT)
+        response.raise_for_status()
+        return response.content
+
+    with profiling.phase('fetch'):
+        content = throttle.call_with_retries(url, fetch)
+    with profiling.phase('parse'):
+        if pool:
+            return pool.parse_links(content, url, backend=parser)
+        return link_parser.parse_links(content, url, backend=parser)
+
+
+def iter_crawl(seed_url, session=None, cache=None, max_depth=DEFAULT_MAX_DEPTH,
+               max_pages=DEFAULT_MAX_PAGES, workers=DEFAULT_WORKERS, scope=None, parser=None, on_error=None,
+               pool=None):
+    """
+    Crawl listing pages breadth-first and yield their PDF links as pages finish.
+
+    Each depth level is fetched concurrently. The frontier holds canonical
+    URLs, so a page reachable through several links (or with its query
+    parameters in a different order) is fetched once. PDF links are
+    deduplicated by canonical URL, keeping the first one found, and come back
+    in page order, then in order on the page.
+
+    Args:
+        seed_url (str): The page to start from
+        session (requests.Session): Session to fetch with (default: shared session)
+        cache (HttpCache): Optional cache used to revalidate pages
+        max_depth (int): How many links away from the seed to follow
+        max_pages (int): Maximum number of pages to fetch
+        workers (int): Number of pages fetched concurrently
+        scope (str): Path prefix to stay within (default: the seed's directory)
+        parser (str): link_parser backend (default: link_parser.DEFAULT_BACKEND)
+        on_error (callable): Called as ``on_error(url, error)`` for each page
+            that could not be fetched; the crawl carries on without it
+        pool (ParsePool): Optional process pool to parse pages in, so
+            pages fetched concurrently are also parsed in parallel
+
+    Yields:
+        dict: PDF information (filename, url, text and the page it was
+            found on)
+    """
+    session = session or http_client.get_session()
+    seed = canonicalize_url(seed_url)
+    scope = scope if scope is not None else default_scope(seed)
+
+    seen_pages = {seed}
+    seen_pdfs = set()
+    found = 0
+    frontier = [seed]
+    fetched = 0
+
+    print(f"Crawling from: {seed_url} (depth {max_depth}, max {max_pages} pages, scope '{scope}')")
+
+    def fetch(url):
+        try:
+            return fetch_page(url, session, cache, parser, pool), None
+        except Exception as e:
+            return ([], []), e
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for depth in range(max_depth + 1):
+            frontier = frontier[:max_pages - fetched]
+            if not frontier:
+                break
+
+            next_frontier = []
+            # map() keeps results in frontier order regardless of completion order
+            for url, ((page_pdfs, page_links), error) in zip(frontier, executor.map(fetch, frontier)):
+                fetched += 1
+                if error:
+                    print(f"[page {fetched}] {url} - Error: {error}")
+                    if on_error:
+                        on_error(url, error)
+                    continue
+
+                if depth < max_depth:
+                    for link in page_links:
+                        link = canonicalize_url(link)
+                        if link not in seen_pages and is_listing_link(link, seed, scope):
+                            seen_pages.add(link)
+                            next_frontier.append(link)
+
+                new_pdfs = []
+                for pdf in page_pdfs:
+                    key = canonicalize_url(pdf['url'])
+                    if key not in seen_pdfs:
+                        seen_pdfs.add(key)
+                        pdf['page'] = url
+                        new_pdfs.append(pdf)
+                found += len(new_pdfs)
+                print(f"[page {fetched}] {url} - {len(new_pdfs)} new PDF(s)")
+                yield from new_pdfs
+
+            frontier = next_frontier
+
+    print(f"Crawled {fetched} page(s), found {found} unique PDF link(s)")
+
+
+def crawl(seed_url, session=None, cache=None, max_depth=DEFAULT_MAX_DEPTH,
+          max_pages=DEFAULT_MAX_PAGES, workers=DEFAULT_WORKERS, scope=None, parser=None, on_error=None,
+          pool=None):
+    """
+    Crawl listing pages breadth-first and merge their PDF links.
+
+    Takes the same arguments as ``iter_crawl``.
+
+    Returns:
+        list: A list of dictionaries containing PDF information
+    """
+    return list(iter_crawl(seed_url, session=session, cache=cache, max_depth=max_depth,
+                           max_pages=max_pages, workers=workers, scope=scope, parser=parser,
+                           on_error=on_error, pool=pool))
@@ -0,0 +1,93 @@
+"""
+DocuMine - Download Journal
+Crash-safe record of which files a download run has completed, left partial
+or failed, so an interrupted run can be resumed.
+"""
+
+import json
+import os
+import threading
+
+JOURNAL_NAME = '.documine_journal.jsonl'
+
+COMPLETE = 'complete'
+PARTIAL = 'partial'
+FAILED = 'failed'
+
+
+class DownloadJournal:
+    """
+    Append-only JSON Lines journal kept inside the download directory.
+
+    Every state change is appended as one line and flushed to disk straight
+    away, so a crash loses at most the line being written. When the journal is
+    loaded the last line for each URL wins.
+    """
+
+    def __init__(self, download_dir):
+        self.path = os.path.join(download_dir, JOURNAL_NAME)
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._load()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _load(self):
+        """Reads existing entries, ignoring a torn last line from a crash."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and 'url' in entry:
+                    self.entries[entry['url']] = entry
+
+    def get(self, url):
+        """Returns the latest entry for a URL, or None."""
+        with self._lock:
+            return self.entries.get(url)
+
+    def paths(self):
+        """Returns every file path recorded in the journal."""
+        with self._lock:
+            return {entry['path'] for entry in self.entries.values() if entry.get('path')}
+
+    def record(self, url, status, path=None, **fields):
+        """
+        Append a new state for a URL.
+
+        Args:
+            url (str): The PDF URL
+            status (str): One of COMPLETE, PARTIAL or FAILED
+            path (str): Final path of the file on disk
+            **fields: Extra values to keep, e.g. size, etag, last_modified, error
+        """
+        entry = {'url': url, 'status': status, 'path': path}
+        entry.update(fields)
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            self.entries[url] = entry
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def is_complete(self, url):
+        """
+        Check whether a URL was fully downloaded and the file is still intact.
+
+        The file must exist at the journaled path with the journaled size.
+        """
+        entry = self.get(url)
+        if not entry or entry.get('status') != COMPLETE or not entry.get('path'):
+            return False
+        try:
+            return os.path.getsize(entry['path']) == entry.get('size')
+        except OSError:
+            return False
+
+    def close(self):
+        """Closes the journal file."""
+        with self._lock:
+            self._file.close()
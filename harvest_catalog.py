@@ -0,0 +1,279 @@
+"""
+DocuMine - Harvest Catalog
+Persistent SQLite record of every harvest: the source pages visited, the PDF
+links found on them and what became of each download (status, size, hash and
+HTTP validators). Re-runs of the same seeds diff against it and download
+only what is new or changed.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+import crawler
+
+# Links are written in batches of this many rows per transaction
+BATCH_SIZE = 500
+
+COMPLETE = 'complete'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    seed TEXT NOT NULL,
+    started REAL NOT NULL,
+    finished REAL,
+    found INTEGER,
+    new INTEGER,
+    downloaded INTEGER,
+    failed INTEGER
+);
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    seed TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    last_run INTEGER
+);
+CREATE TABLE IF NOT EXISTS links (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    href TEXT NOT NULL,
+    filename TEXT,
+    text TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    first_run INTEGER,
+    last_run INTEGER,
+    status TEXT,
+    path TEXT,
+    size INTEGER,
+    sha256 TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL,
+    fetched_run INTEGER,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS page_links (
+    page_id INTEGER NOT NULL REFERENCES pages(id),
+    link_id INTEGER NOT NULL REFERENCES links(id),
+    PRIMARY KEY (page_id, link_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS pages_seed ON pages(seed);
+CREATE INDEX IF NOT EXISTS links_status ON links(status);
+CREATE INDEX IF NOT EXISTS links_first_run ON links(first_run);
+CREATE INDEX IF NOT EXISTS links_last_run ON links(last_run);
+CREATE INDEX IF NOT EXISTS links_fetched_run ON links(fetched_run);
+CREATE INDEX IF NOT EXISTS links_sha256 ON links(sha256);
+CREATE INDEX IF NOT EXISTS page_links_link ON page_links(link_id);
+"""
+
+
+class HarvestCatalog:
+    """
+    SQLite catalog of source pages, links and downloads.
+
+    Links are keyed by canonical URL (``crawler.canonicalize_url``), so the
+    same file linked with its query parameters in another order is one row.
+    Every table lookup used while harvesting is backed by an index, which
+    keeps re-runs over catalogs of 100k+ links cheap.
+
+    Thread-safe; one catalog can be shared by every worker of a run. The
+    database runs in WAL mode, so it can be queried while a run writes to it.
+
+    Args:
+        path (str): The SQLite database file, created if missing
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(SCHEMA)
+            self._db.commit()
+        self.run_id = None
+
+    def start_run(self, seed):
+        """
+        Begin a run; links recorded from now on are attributed to it.
+
+        Returns:
+            int: The run id
+        """
+        with self._lock, self._db:
+            cursor = self._db.execute("INSERT INTO runs (seed, started) VALUES (?, ?)", (seed, time.time()))
+        self.run_id = cursor.lastrowid
+        return self.run_id
+
+    def finish_run(self):
+        """
+        Store the totals of the current run.
+
+        Returns:
+            dict: Links found, new, downloaded and failed in the run
+        """
+        if self.run_id is None:
+            return {}
+        run = (self.run_id,)
+        with self._lock, self._db:
+            totals = {
+                'found': self._db.execute("SELECT COUNT(*) FROM links WHERE last_run = ?", run).fetchone()[0],
+                'new': self._db.execute("SELECT COUNT(*) FROM links WHERE first_run = ?", run).fetchone()[0],
+                'downloaded': self._db.execute("SELECT COUNT(*) FROM links WHERE fetched_run = ?",
+                                               run).fetchone()[0],
+                'failed': self._db.execute("SELECT COUNT(*) FROM links WHERE last_run = ? AND error IS NOT NULL",
+                                           run).fetchone()[0],
+            }
+            self._db.execute("UPDATE runs SET finished = ?, found = ?, new = ?, downloaded = ?, failed = ? "
+                             "WHERE id = ?",
+                             (time.time(), totals['found'], totals['new'], totals['downloaded'],
+                              totals['failed'], self.run_id))
+        return totals
+
+    def _upsert_locked(self, pdf, seed, now, page_ids):
+        """Upserts one link and its page; returns True if the link is new."""
+        page = crawler.canonicalize_url(pdf.get('page') or seed)
+        if page not in page_ids:
+            self._db.execute(
+                "INSERT INTO pages (url, seed, first_seen, last_seen, last_run) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET last_seen = excluded.last_seen, last_run = excluded.last_run",
+                (page, seed, now, now, self.run_id))
+            page_ids[page] = self._db.execute("SELECT id FROM pages WHERE url = ?", (page,)).fetchone()[0]
+
+        url = crawler.canonicalize_url(pdf['url'])
+        row = self._db.execute("SELECT id FROM links WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            link_id = self._db.execute(
+                "INSERT INTO links (url, href, filename, text, first_seen, last_seen, first_run, last_run) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, pdf['url'], pdf.get('filename'), pdf.get('text'), now, now,
+                 self.run_id, self.run_id)).lastrowid
+        else:
+            link_id = row[0]
+            self._db.execute(
+                "UPDATE links SET href = ?, filename = ?, text = ?, last_seen = ?, last_run = ? WHERE id = ?",
+                (pdf['url'], pdf.get('filename'), pdf.get('text'), now, self.run_id, link_id))
+        self._db.execute("INSERT OR IGNORE INTO page_links (page_id, link_id) VALUES (?, ?)",
+                         (page_ids[page], link_id))
+        return row is None
+
+    def record_links(self, pdf_links, seed):
+        """
+        Upsert links and the pages they were found on, in one transaction.
+
+        Args:
+            pdf_links (list): Link dicts; a ``page`` key (set by the crawler)
+                names the page a link was found on, otherwise it is ``seed``
+            seed (str): The URL the run started from
+
+        Returns:
+            int: How many of the links were not in the catalog before
+        """
+        now = time.time()
+        page_ids = {}
+        with self._lock, self._db:
+            return sum(self._upsert_locked(pdf, seed, now, page_ids) for pdf in pdf_links)
+
+    def observe(self, pdf_links, seed):
+        """
+        Record links from an iterable as they pass through.
+
+        Each link is written before it is yielded, so its download can be
+        recorded against it, but commits are batched every ``BATCH_SIZE``
+        links. A generator is never held in memory.
+
+        Yields:
+            dict: The links, unchanged
+        """
+        page_ids = {}
+        pending = 0
+        try:
+            for pdf in pdf_links:
+                with self._lock:
+                    self._upsert_locked(pdf, seed, time.time(), page_ids)
+                    pending += 1
+                    if pending >= BATCH_SIZE:
+                        self._db.commit()
+                        pending = 0
+                yield pdf
+        finally:
+            with self._lock:
+                self._db.commit()
+
+    def get(self, url):
+        """Returns the catalog row of a link as a dict, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM links WHERE url = ?", (crawler.canonicalize_url(url),)).fetchone()
+        return dict(row) if row else None
+
+    def is_downloaded(self, url):
+        """True if the link was downloaded completely by an earlier run."""
+        with self._lock:
+            row = self._db.execute("SELECT 1 FROM links WHERE url = ? AND status = ?",
+                                   (crawler.canonicalize_url(url), COMPLETE)).fetchone()
+        return row is not None
+
+    def record_download(self, url, status, path=None, size=None, sha256=None, etag=None, last_modified=None,
+                        error=None):
+        """
+        Store the outcome of a download.
+
+        A failure keeps the details of the last successful download, so a
+        file that could not be refreshed is still known.
+
+        Args:
+            url (str): The PDF URL
+            status (str): ``COMPLETE`` or ``FAILED``
+            path (str): Path of the file on disk
+            size (int): Size in bytes
+            sha256 (str): SHA-256 hex digest of the file
+            etag (str): ``ETag`` of the response
+            last_modified (str): ``Last-Modified`` of the response
+            error (str): Why the download failed
+        """
+        url = crawler.canonicalize_url(url)
+        with self._lock, self._db:
+            if status == COMPLETE:
+                self._db.execute(
+                    "UPDATE links SET status = ?, path = ?, size = ?, sha256 = ?, etag = ?, last_modified = ?, "
+                    "fetched_at = ?, fetched_run = ?, error = NULL WHERE url = ?",
+                    (status, path, size, sha256, etag, last_modified, time.time(), self.run_id, url))
+            else:
+                self._db.execute(
+                    "UPDATE links SET status = CASE WHEN status = ? THEN status ELSE ? END, error = ? WHERE url = ?",
+                    (COMPLETE, status, error, url))
+
+    def stats(self):
+        """
+        Summarize the catalog.
+
+        Returns:
+            dict: Numbers of pages, links, downloaded links and failed links,
+                plus the links first seen in the current run
+        """
+        with self._lock:
+            pages = self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            links = self._db.execute("SELECT COUNT(*) FROM links").fetchone()[0]
+            by_status = dict(self._db.execute(
+                "SELECT status, COUNT(*) FROM links WHERE status IS NOT NULL GROUP BY status").fetchall())
+            new = 0
+            if self.run_id is not None:
+                new = self._db.execute("SELECT COUNT(*) FROM links WHERE first_run = ?",
+                                       (self.run_id,)).fetchone()[0]
+        return {'pages': pages, 'links': links, 'downloaded': by_status.get(COMPLETE, 0),
+                'failed': by_status.get(FAILED, 0), 'new': new}
+
+    def close(self):
+        """Closes the database."""
+        with self._lock:
+            self._db.close()
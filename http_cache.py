@@ -0,0 +1,311 @@
+"""
+DocuMine - HTTP Cache
+On-disk cache for listing pages and PDFs that revalidates with ETag and
+Last-Modified, so unchanged content comes back as a cheap 304.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# Response headers worth keeping with a cached body
+STORED_HEADERS = ('Content-Type', 'Content-Length', 'ETag', 'Last-Modified', 'Content-Disposition')
+
+
+class CachedResponse:
+    """
+    Response-like wrapper returned by ``HttpCache.get``.
+
+    Provides the parts of ``requests.Response`` DocuMine uses: ``status_code``,
+    ``headers``, ``content``, ``iter_content``, ``raise_for_status`` and use as
+    a context manager. ``from_cache`` is True when the body is served from disk
+    after a 304.
+    """
+
+    def __init__(self, cache, key, url, response=None, meta=None):
+        self._cache = cache
+        self._key = key
+        self.url = url
+        self._response = response
+        self.from_cache = meta is not None
+        if self.from_cache:
+            self.status_code = 200
+            self.headers = dict(meta.get('headers', {}))
+            if response is not None:
+                # A 304 may carry refreshed validators
+                for name in STORED_HEADERS:
+                    if name in response.headers and name != 'Content-Length':
+                        self.headers[name] = response.headers[name]
+        else:
+            self.status_code = response.status_code
+            self.headers = response.headers
+        self._content = None
+
+    def raise_for_status(self):
+        """Raises ``requests.HTTPError`` for error responses."""
+        if not self.from_cache:
+            self._response.raise_for_status()
+
+    def iter_content(self, chunk_size=CHUNK_SIZE):
+        """
+        Yield the body in chunks.
+
+        Cached bodies are read from disk. Fresh 200 responses are copied into
+        the cache as they stream through and committed once fully read.
+        """
+        if self.from_cache:
+            with self._cache.open_body(self._key) as f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+            return
+
+        writer = self._cache.writer(self._key, self.url, self._response)
+        if writer is None:
+            yield from self._response.iter_content(chunk_size=chunk_size)
+            return
+        try:
+            for chunk in self._response.iter_content(chunk_size=chunk_size):
+                writer.write(chunk)
+                yield chunk
+        except BaseException:
+            writer.discard()
+            raise
+        else:
+            writer.commit()
+
+    @property
+    def content(self):
+        """The whole body as bytes."""
+        if self._content is None:
+            self._content = b''.join(self.iter_content())
+        return self._content
+
+    def close(self):
+        """Releases the underlying connection."""
+        if self._response is not None:
+            self._response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _CacheWriter:
+    """Collects a response body in a temp file and commits it to the cache."""
+
+    def __init__(self, cache, key, url, headers):
+        self._cache = cache
+        self._key = key
+        self._url = url
+        self._headers = headers
+        fd, self._tmp_path = tempfile.mkstemp(dir=cache.cache_dir, suffix='.tmp')
+        self._file = os.fdopen(fd, 'wb')
+        self._size = 0
+
+    def write(self, chunk):
+        self._file.write(chunk)
+        self._size += len(chunk)
+
+    def commit(self):
+        self._file.close()
+        self._cache._commit(self._key, self._url, self._headers, self._tmp_path, self._size)
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+class HttpCache:
+    """
+    Size-capped, least-recently-used on-disk HTTP cache.
+
+    Each entry is a body file plus a small JSON metadata file holding the URL,
+    the stored headers and the validators. Entries are keyed by URL and an
+    optional scope (e.g. the cookies in use), so content fetched with
+    different credentials is never mixed up. Only 200 responses that carry an
+    ETag or Last-Modified header are stored, since nothing else can be
+    revalidated.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # key -> [size, last_used]
+        self._entries = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """Builds the in-memory index from the metadata files on disk."""
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.tmp'):
+                # Left behind by an interrupted write
+                os.remove(os.path.join(self.cache_dir, name))
+                continue
+            if not name.endswith('.json'):
+                continue
+            key = name[:-len('.json')]
+            body_path = self._body_path(key)
+            try:
+                stat = os.stat(body_path)
+            except OSError:
+                os.remove(os.path.join(self.cache_dir, name))
+                continue
+            self._entries[key] = [stat.st_size, stat.st_mtime]
+
+    @staticmethod
+    def make_key(url, scope=''):
+        """Returns the cache key for a URL within a scope."""
+        return hashlib.sha256(f"{scope}\n{url}".encode('utf-8')).hexdigest()
+
+    def _body_path(self, key):
+        return os.path.join(self.cache_dir, key + '.body')
+
+    def _meta_path(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def _read_meta(self, key):
+        try:
+            with open(self._meta_path(key), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def total_bytes(self):
+        """Returns the size of all cached bodies."""
+        with self._lock:
+            return sum(size for size, _ in self._entries.values())
+
+    def open_body(self, key):
+        """Opens a cached body for reading and marks it as recently used."""
+        now = time.time()
+        with self._lock:
+            if key in self._entries:
+                self._entries[key][1] = now
+        try:
+            os.utime(self._body_path(key), (now, now))
+        except OSError:
+            pass
+        return open(self._body_path(key), 'rb')
+
+    def get(self, session, url, scope=None, headers=None, **kwargs):
+        """
+        Fetch a URL through the cache.
+
+        A stored entry is revalidated with ``If-None-Match`` /
+        ``If-Modified-Since``; on 304 the body is served from disk. Requests
+        carrying a ``Range`` header bypass the cache.
+
+        Args:
+            session (requests.Session): Session to fetch with
+            url (str): URL to fetch
+            scope (str): Extra cache key component (default: the session's
+                ``cache_scope``, a fingerprint of its configured cookies)
+            headers (dict): Extra request headers
+            **kwargs: Passed on to ``session.get`` (timeout, stream, ...)
+
+        Returns:
+            CachedResponse: The response
+        """
+        headers = dict(headers or {})
+        if 'Range' in headers:
+            return CachedResponse(self, None, url, response=session.get(url, headers=headers, **kwargs))
+
+        if scope is None:
+            scope = getattr(session, 'cache_scope', '')
+        key = self.make_key(url, scope)
+        meta = None
+        with self._lock:
+            cached = key in self._entries
+        if cached:
+            meta = self._read_meta(key)
+        if meta:
+            stored = meta.get('headers', {})
+            if stored.get('ETag'):
+                headers['If-None-Match'] = stored['ETag']
+            if stored.get('Last-Modified'):
+                headers['If-Modified-Since'] = stored['Last-Modified']
+
+        response = session.get(url, headers=headers, **kwargs)
+        if meta and response.status_code == 304:
+            # Reading the empty body hands the connection back to the pool;
+            # closing an unread response would drop it
+            response.content
+            with self._lock:
+                self.hits += 1
+            return CachedResponse(self, key, url, response=response, meta=meta)
+
+        with self._lock:
+            self.misses += 1
+        return CachedResponse(self, key, url, response=response)
+
+    def writer(self, key, url, response):
+        """
+        Returns a writer for storing a response body, or None if the response
+        should not be cached.
+        """
+        if key is None or response.status_code != 200:
+            return None
+        if 'no-store' in response.headers.get('Cache-Control', '').lower():
+            return None
+        if not (response.headers.get('ETag') or response.headers.get('Last-Modified')):
+            return None
+        length = response.headers.get('Content-Length')
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            return None
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        return _CacheWriter(self, key, url, headers)
+
+    def _commit(self, key, url, headers, tmp_path, size):
+        """Moves a completed body into place, writes its metadata and evicts."""
+        if size > self.max_bytes:
+            os.remove(tmp_path)
+            return
+        meta_tmp = f"{self._meta_path(key)}.{uuid.uuid4().hex}.tmp"
+        with open(meta_tmp, 'w', encoding='utf-8') as f:
+            json.dump({'url': url, 'headers': headers, 'size': size}, f)
+        with self._lock:
+            os.replace(tmp_path, self._body_path(key))
+            os.replace(meta_tmp, self._meta_path(key))
+            self._entries[key] = [size, time.time()]
+            self._evict_locked()
+
+    def _evict_locked(self):
+        """Drops least recently used entries until the cache fits its budget."""
+        total = sum(size for size, _ in self._entries.values())
+        if total <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            for path in (self._meta_path(key), self._body_path(key)):
+                if os.path.exists(path):
+                    os.remove(path)
+            del self._entries[key]
+            total -= size
+
+    def clear(self):
+        """Removes every cached entry."""
+        with self._lock:
+            for key in list(self._entries):
+                for path in (self._meta_path(key), self._body_path(key)):
+                    if os.path.exists(path):
+                        os.remove(path)
+            self._entries.clear()
+
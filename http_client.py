@@ -0,0 +1,132 @@
+"""
+DocuMine - Shared HTTP Client
+Keep-alive session, default headers, cookies and timeouts used by both the
+command line tool (pdf_extractor.py) and the web app (app.py).
+"""
+
+import hashlib
+import threading
+
+import requests
+
+import net_metrics
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+DEFAULT_HEADERS = {
+    'User-Agent': USER_AGENT
+}
+
+DEFAULT_COOKIES = {
+    "justiceGovAgeVerified": "true"
+}
+
+# (connect, read) timeouts in seconds
+PAGE_TIMEOUT = (10, 30)
+DOWNLOAD_TIMEOUT = (10, 60)
+
+# Number of keep-alive connections kept open per host. Should be at least the
+# number of concurrent download workers, otherwise connections get discarded
+# and re-established.
+DEFAULT_POOL_SIZE = 16
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+
+def parse_cookie_string(cookie_string):
+    """Parses a cookie string (key=value; key2=value2) into a dictionary."""
+    cookies = {}
+    if cookie_string:
+        for item in cookie_string.split(';'):
+            if '=' in item:
+                name, value = item.strip().split('=', 1)
+                cookies[name] = value
+    return cookies
+
+
+def merge_cookies(cookies=None):
+    """
+    Merge user provided cookies over the default ones.
+
+    Args:
+        cookies (dict): Extra cookies, these win over the defaults
+
+    Returns:
+        dict: The merged cookies
+    """
+    session_cookies = DEFAULT_COOKIES.copy()
+    if cookies:
+        session_cookies.update(cookies)
+    return session_cookies
+
+
+def cookie_scope(cookies):
+    """
+    Return a short fingerprint of a cookie set.
+
+    Used to keep cached responses fetched with different cookies apart, since
+    the same URL can return a PDF or an age gate page depending on them.
+
+    Args:
+        cookies (dict): The cookies
+
+    Returns:
+        str: Hex fingerprint
+    """
+    material = ';'.join(f"{name}={value}" for name, value in sorted(cookies.items()))
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()[:16]
+
+
+def create_session(cookies=None, pool_size=DEFAULT_POOL_SIZE, metrics=None):
+    """
+    Create a keep-alive session with default headers and cookies.
+
+    Connections are reused across requests to the same host, so only the first
+    request to a host pays for the TCP and TLS handshakes.
+
+    Args:
+        cookies (dict): Extra cookies merged over ``DEFAULT_COOKIES``
+        pool_size (int): Keep-alive connections kept open per host
+        metrics (MetricsRecorder): Optional recorder timing every request
+
+    Returns:
+        requests.Session: The configured session
+    """
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session_cookies = merge_cookies(cookies)
+    session.cookies.update(session_cookies)
+    session.cache_scope = cookie_scope(session_cookies)
+
+    adapter = net_metrics.TimingAdapter(metrics=metrics, pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def set_metrics(session, metrics):
+    """
+    Start or stop timing the requests of a session made by ``create_session``.
+
+    Args:
+        session (requests.Session): The session
+        metrics (MetricsRecorder): Recorder to report to, or None to stop
+    """
+    for adapter in session.adapters.values():
+        if isinstance(adapter, net_metrics.TimingAdapter):
+            adapter.metrics = metrics
+
+
+def get_session():
+    """
+    Return the process-wide default session, creating it on first use.
+
+    Returns:
+        requests.Session: The shared session
+    """
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = create_session()
+        return _default_session
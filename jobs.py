@@ -0,0 +1,223 @@
+"""
+DocuMine - Background Jobs
+A worker pool shared by every session of the web app. Long-running scans and
+ZIP builds run here instead of in the Streamlit script thread, and the UI
+polls their progress.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 4
+DEFAULT_PER_OWNER = 2
+# Finished jobs are forgotten after this many seconds
+DEFAULT_KEEP_SECONDS = 3600
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function when its job was cancelled."""
+
+
+class QuotaExceeded(Exception):
+    """Raised when an owner already has its maximum number of active jobs."""
+
+
+class Job:
+    """
+    One unit of background work and its progress.
+
+    The job function receives the job as its first argument and reports
+    through ``update`` and ``warn``; it should call ``check_cancelled``
+    between steps so ``cancel`` takes effect.
+    """
+
+    def __init__(self, kind, owner, key=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.owner = owner
+        self.key = key
+        # Owners waiting for this job's result
+        self.watchers = {owner}
+        self.state = QUEUED
+        self.done = 0
+        self.total = None
+        self.message = ''
+        self.warnings = []
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self._cancel = threading.Event()
+        self._future = None
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        """True while the job is queued or running."""
+        return self.state in (QUEUED, RUNNING)
+
+    @property
+    def progress(self):
+        """Fraction done between 0 and 1, or None while the total is unknown."""
+        with self._lock:
+            if not self.total:
+                return None
+            return min(1.0, self.done / self.total)
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def update(self, done=None, total=None, message=None):
+        """Records progress; arguments left as None keep their value."""
+        with self._lock:
+            if done is not None:
+                self.done = done
+            if total is not None:
+                self.total = total
+            if message is not None:
+                self.message = message
+
+    def warn(self, message):
+        """Adds a warning to show alongside the job's result."""
+        with self._lock:
+            self.warnings.append(message)
+
+    def check_cancelled(self):
+        """Raises ``JobCancelled`` if the job was cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def cancel(self):
+        """Asks the job to stop; a job that has not started yet never runs."""
+        self._cancel.set()
+        if self._future is not None and self._future.cancel():
+            self._finish(CANCELLED)
+
+    def _finish(self, state, result=None, error=None):
+        with self._lock:
+            self.state = state
+            self.result = result
+            self.error = error
+            self.finished = time.time()
+
+
+class JobManager:
+    """
+    Runs jobs on a shared thread pool with a cap on active jobs per owner.
+
+    An owner is typically one browser session. Submitting a job with the
+    same ``key`` as an active job returns that job instead of starting a
+    duplicate, whoever submitted it, so script reruns and sessions asking for
+    the same thing share one run. A shared job is only cancelled once every
+    owner watching it has called ``cancel``.
+
+    Args:
+        workers (int): Jobs running at once across all owners
+        per_owner (int): Active (queued or running) jobs allowed per owner
+        keep_seconds (float): How long finished jobs stay retrievable
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, per_owner=DEFAULT_PER_OWNER, keep_seconds=DEFAULT_KEEP_SECONDS):
+        self.per_owner = max(1, per_owner)
+        self.keep_seconds = keep_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='documine-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, owner, kind, fn, *args, key=None, **kwargs):
+        """
+        Queue ``fn(job, *args, **kwargs)``.
+
+        Args:
+            owner (str): Who the job belongs to
+            kind (str): Short label such as 'scan' or 'zip'
+            fn (callable): The work; its return value becomes ``job.result``
+            key (hashable): Identifies duplicate submissions
+
+        Returns:
+            Job: The new job, or the active job with the same key
+
+        Raises:
+            QuotaExceeded: The owner already has ``per_owner`` active jobs
+        """
+        with self._lock:
+            self._prune_locked()
+            if key is not None:
+                for job in self._jobs.values():
+                    if job.key == key and job.active and not job.cancelled:
+                        job.watchers.add(owner)
+                        return job
+            owned = [job for job in self._jobs.values() if owner in job.watchers and job.active]
+            if len(owned) >= self.per_owner:
+                raise QuotaExceeded(f"{len(owned)} job(s) already running; wait for one to finish")
+            job = Job(kind, owner, key)
+            self._jobs[job.id] = job
+            job._future = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    @staticmethod
+    def _run(job, fn, args, kwargs):
+        if job.cancelled:
+            job._finish(CANCELLED)
+            return
+        job.state = RUNNING
+        try:
+            result = fn(job, *args, **kwargs)
+        except JobCancelled:
+            job._finish(CANCELLED)
+        except Exception as e:
+            job._finish(FAILED, error=str(e))
+        else:
+            job._finish(DONE, result=result)
+
+    def cancel(self, job_id, owner):
+        """
+        Stop waiting for a job, cancelling it if no other owner waits for it.
+
+        Args:
+            job_id (str): The job
+            owner (str): The owner giving up on it
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.watchers.discard(owner)
+            if job.watchers:
+                return
+        job.cancel()
+
+    def get(self, job_id):
+        """Returns the job with this id, or None if unknown or expired."""
+        if not job_id:
+            return None
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active_jobs(self, owner=None):
+        """Returns active jobs, optionally only those of one owner."""
+        with self._lock:
+            return [job for job in self._jobs.values() if job.active and (owner is None or owner in job.watchers)]
+
+    def _prune_locked(self):
+        cutoff = time.time() - self.keep_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished is not None and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def shutdown(self):
+        """Cancels queued jobs and waits for running ones."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,530 @@
+"""
+DocuMine - Link Parser
+Turns fetched HTML into PDF link records and, for crawling, the other links
+on the page.
+
+Several backends are available. ``soup`` and ``stream`` return exactly the
+same records on any markup; the others can differ on broken pages:
+
+- ``soup``: builds the full BeautifulSoup tree (the original behaviour)
+- ``stream``: a ``html.parser.HTMLParser`` subclass that only collects anchors
+  and never builds a tree, following the same tree-building rules (default)
+- ``strainer``: BeautifulSoup restricted to ``<a href>`` tags via SoupStrainer.
+  The elements around anchors are not built, so an anchor left unclosed
+  (``<li><a href="a.pdf">A</li>``) is not closed by its parent and its text
+  runs on to the next ``</a>`` or the end of the page.
+- ``lxml``: lxml's C parser, when lxml is installed. Fastest, but lxml repairs
+  malformed markup (e.g. nested anchors) differently from html.parser.
+"""
+
+import codecs
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.builder import HTMLParserTreeBuilder
+from bs4.dammit import UnicodeDammit
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+BACKENDS = ('stream', 'strainer', 'soup', 'lxml')
+DEFAULT_BACKEND = 'stream'
+# Backends that return the soup records on any markup
+EXACT_BACKENDS = ('stream', 'soup')
+
+_PDF_HREF = re.compile(r'\.pdf$', re.IGNORECASE)
+
+# Source of html.parser's tree-building rules for the stream backend
+_TREE_BUILDER = HTMLParserTreeBuilder()
+
+# When parsing a stream, the encoding is detected from this much of the start
+STREAM_SNIFF_BYTES = 64 * 1024
+
+
+def is_pdf_href(href):
+    """Check if a link ends with .pdf (case-insensitive)."""
+    return href.lower().endswith('.pdf')
+
+
+class PdfLink:
+    """
+    The record DocuMine keeps for one PDF link.
+
+    Always has ``filename``, ``url`` and ``text``. Later stages may add the
+    ``page`` it was found on (crawler), its ``size`` (size probes) and its
+    ``metadata`` (metadata probes).
+
+    Fields live in ``__slots__`` rather than a per-record dict, which makes
+    a record less than half the size. It reads and writes like a dict
+    (``pdf['url']``, ``pdf.get('size')``, ``'metadata' in pdf``,
+    ``dict(pdf)``); optional fields that were never set are missing, as they
+    would be from a dict.
+    """
+
+    __slots__ = ('filename', 'url', 'text', 'page', 'size', 'metadata')
+
+    def __init__(self, filename, url, text, **optional):
+        self.filename = filename
+        self.url = url
+        self.text = text
+        for key, value in optional.items():
+            self[key] = value
+
+    def __getitem__(self, key):
+        if key in self.__slots__:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(f"PdfLink has no field {key!r}")
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.__slots__ and hasattr(self, key)
+
+    def get(self, key, default=None):
+        """Returns a field, or ``default`` if it is not set."""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        """Returns the names of the fields that are set."""
+        return [key for key in self.__slots__ if hasattr(self, key)]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self):
+        """Returns (name, value) pairs of the fields that are set."""
+        return [(key, getattr(self, key)) for key in self.keys()]
+
+    def copy(self):
+        """Returns a shallow copy."""
+        return PdfLink(**dict(self.items()))
+
+    def __eq__(self, other):
+        if isinstance(other, (PdfLink, dict)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"PdfLink({dict(self.items())!r})"
+
+
+class LinkTable:
+    """
+    Many links stored column by column: one list per field instead of one
+    record per link.
+
+    Much smaller than a list of records and cheap to store as JSON
+    (``columns``); records are only built for the rows asked for, so a view
+    over a large result set costs what it shows. Unset fields are None.
+
+    Args:
+        columns (dict): Field name to list of values, as from ``columns``
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    @classmethod
+    def from_links(cls, pdf_links):
+        """Builds a table from link records (``PdfLink`` or dicts)."""
+        pdf_links = list(pdf_links)
+        fields = [key for key in PdfLink.__slots__ if any(key in pdf for pdf in pdf_links)]
+        return cls({key: [pdf.get(key) for pdf in pdf_links] for key in fields})
+
+    def __len__(self):
+        return len(self.columns.get('url', ()))
+
+    def column(self, name):
+        """Returns the values of one field for every row (None where unset)."""
+        return self.columns.get(name) or [None] * len(self)
+
+    def has(self, name):
+        """True if any row has the field set."""
+        return name in self.columns
+
+    def record(self, row):
+        """Returns the link in a row as a ``PdfLink``."""
+        return PdfLink(**{key: values[row] for key, values in self.columns.items() if values[row] is not None})
+
+    def records(self, rows=None):
+        """Returns the links in ``rows`` (default: every row) as ``PdfLink`` records."""
+        return [self.record(row) for row in (range(len(self)) if rows is None else rows)]
+
+    def search(self, query, fields=('filename', 'text', 'url')):
+        """
+        Find the rows whose fields contain a text, ignoring case.
+
+        Args:
+            query (str): Text to look for; every row matches an empty one
+            fields (tuple): Fields to look in
+
+        Returns:
+            list: Matching row numbers, in order
+        """
+        query = query.strip().lower()
+        if not query:
+            return list(range(len(self)))
+        columns = [self.column(name) for name in fields]
+        return [row for row, values in enumerate(zip(*columns))
+                if any(value and query in value.lower() for value in values)]
+
+
+def make_pdf_record(href, base_url, link_text):
+    """
+    Build the record DocuMine keeps for one PDF link.
+
+    Args:
+        href (str): The raw href attribute
+        base_url (str): URL of the page the link was found on
+        link_text (str): Stripped text of the anchor
+
+    Returns:
+        PdfLink: PDF information (filename, url and text)
+    """
+    # Extract filename from URL
+    filename = href.split('/')[-1]
+    # Convert relative URLs to absolute URLs
+    return PdfLink(filename, urljoin(base_url, href), link_text if link_text else filename)
+
+
+def available_backends():
+    """Returns the backends usable in this environment."""
+    return [name for name in BACKENDS if name != 'lxml' or lxml is not None]
+
+
+def decode_html(content):
+    """
+    Decode an HTML document the way BeautifulSoup does.
+
+    Args:
+        content (bytes or str): The document
+
+    Returns:
+        str: The decoded markup
+    """
+    if isinstance(content, str):
+        return content
+    return UnicodeDammit(content, is_html=True).unicode_markup
+
+
+class AnchorCollector(HTMLParser):
+    """
+    Collects ``(href, text)`` pairs for ``<a href>`` tags without building a tree.
+
+    Text is gathered the way BeautifulSoup's ``get_text(strip=True)`` does it:
+    every text node inside the anchor is stripped and the non-empty ones are
+    joined. Elements are opened and closed by the rules BeautifulSoup's
+    html.parser tree builder uses, so sloppy markup gives the same records:
+    an end tag closes every element opened after its own start tag (``</li>``
+    closes an ``<a>`` left open inside the item), end tags with no open
+    element are ignored, void elements never hold content, nested anchors
+    each get the text inside them, and anchors left open at the end of the
+    document run to the end.
+
+    Markup can be fed in pieces with ``feed``; ``pop_ready`` hands out anchors
+    whose element has been closed, in document order.
+    """
+
+    # Tags that never hold content, and tags whose text is not part of
+    # get_text(), as BeautifulSoup's html.parser tree builder has them
+    _VOID = frozenset(_TREE_BUILDER.empty_element_tags)
+    _SKIP_TEXT = frozenset(_TREE_BUILDER.string_containers)
+
+    def __init__(self, pdf_only=False):
+        super().__init__(convert_charrefs=True)
+        self.pdf_only = pdf_only
+        self._stack = []      # (tag, anchor or None) per open element
+        self._counts = {}     # tag -> how many are open
+        self._closed_voids = {}  # void tag -> end tags still to ignore
+        self._anchors = []    # [sequence, href, text parts] per open collected <a>
+        self._done = {}       # sequence -> (href, text) for closed anchors
+        self._next_seq = 0    # sequence number for the next collected anchor
+        self._next_out = 0    # next sequence number to hand out
+        self._skip_depth = 0  # open elements whose text is skipped
+        self._text = []       # pieces of the current text node
+
+    def _flush_text(self):
+        """
+        Add the text node that just ended to every open anchor.
+
+        HTMLParser may split one text node over several ``handle_data``
+        calls when markup is fed in pieces, so pieces are joined before
+        stripping, as BeautifulSoup does.
+        """
+        if not self._text:
+            return
+        text = ''.join(self._text).strip()
+        self._text = []
+        if text:
+            for anchor in self._anchors:
+                anchor[2].append(text)
+
+    def handle_starttag(self, tag, attrs, close_void=True):
+        self._flush_text()
+        anchor = None
+        if tag == 'a':
+            # Only anchors with a (PDF) href get a sequence number and text
+            href = dict(attrs).get('href', False)
+            if href is not False:
+                href = href or ''
+                if not self.pdf_only or is_pdf_href(href):
+                    anchor = [self._next_seq, href, []]
+                    self._next_seq += 1
+                    self._anchors.append(anchor)
+        elif tag in self._SKIP_TEXT:
+            self._skip_depth += 1
+        self._stack.append((tag, anchor))
+        self._counts[tag] = self._counts.get(tag, 0) + 1
+        if close_void and tag in self._VOID:
+            self._pop()
+            # BeautifulSoup then ignores one later end tag for it, e.g. </br>
+            self._closed_voids[tag] = self._closed_voids.get(tag, 0) + 1
+
+    def handle_startendtag(self, tag, attrs):
+        # <a href="..."/> is an empty anchor, as html.parser trees treat it
+        self.handle_starttag(tag, attrs, close_void=False)
+        self.handle_endtag(tag)
+
+    def _pop(self):
+        """Close the innermost open element."""
+        tag, anchor = self._stack.pop()
+        self._counts[tag] -= 1
+        if anchor is not None:
+            self._anchors.pop()
+            self._done[anchor[0]] = (anchor[1], ''.join(anchor[2]))
+        elif tag in self._SKIP_TEXT:
+            self._skip_depth -= 1
+
+    def handle_endtag(self, tag):
+        if self._closed_voids.get(tag):
+            # Not even the end of a text node to BeautifulSoup
+            self._closed_voids[tag] -= 1
+            return
+        self._flush_text()
+        if not self._counts.get(tag):
+            return
+        while self._stack[-1][0] != tag:
+            self._pop()
+        self._pop()
+
+    def handle_data(self, data):
+        if self._anchors and not self._skip_depth:
+            self._text.append(data)
+
+    def handle_comment(self, data):
+        # Comments end the current text node and are not text themselves
+        self._flush_text()
+
+    def handle_decl(self, decl):
+        self._flush_text()
+
+    def handle_pi(self, data):
+        self._flush_text()
+
+    def unknown_decl(self, data):
+        # BeautifulSoup keeps <![CDATA[...]]> sections as their own text
+        # node, and get_text() includes them even inside skipped elements
+        self._flush_text()
+        if data.upper().startswith('CDATA[') and self._anchors:
+            self._text.append(data[len('CDATA['):])
+            self._flush_text()
+
+    def close(self):
+        super().close()
+        self._flush_text()
+        while self._stack:
+            self._pop()
+
+    def pop_ready(self):
+        """
+        Return anchors that are complete, in document order.
+
+        An anchor is only handed out once every anchor that starts before it
+        is complete too.
+
+        Returns:
+            list: ``(href, text)`` pairs
+        """
+        ready = []
+        while self._next_out in self._done:
+            ready.append(self._done.pop(self._next_out))
+            self._next_out += 1
+        return ready
+
+
+def _anchors_stream(content, pdf_only):
+    collector = AnchorCollector(pdf_only=pdf_only)
+    collector.feed(decode_html(content))
+    collector.close()
+    return collector.pop_ready()
+
+
+def _anchors_soup(content, pdf_only):
+    soup = BeautifulSoup(content, 'html.parser')
+    return [(a['href'], a.get_text(strip=True)) for a in soup.find_all('a', href=True)]
+
+
+def _anchors_strainer(content, pdf_only):
+    strainer = SoupStrainer('a', href=_PDF_HREF if pdf_only else True)
+    soup = BeautifulSoup(content, 'html.parser', parse_only=strainer)
+    return [(a['href'], a.get_text(strip=True)) for a in soup.find_all('a', href=True)]
+
+
+def _anchors_lxml(content, pdf_only):
+    if lxml is None:
+        raise ValueError("The lxml backend needs lxml installed (pip install lxml)")
+    if not content.strip():
+        return []
+    root = lxml.html.document_fromstring(content)
+    anchors = []
+    for a in root.iter('a'):
+        href = a.get('href')
+        if href is None or (pdf_only and not is_pdf_href(href)):
+            continue
+        text = ''.join(part.strip() for part in a.itertext())
+        anchors.append((href, text))
+    return anchors
+
+
+_BACKEND_FUNCS = {
+    'stream': _anchors_stream,
+    'strainer': _anchors_strainer,
+    'soup': _anchors_soup,
+    'lxml': _anchors_lxml,
+}
+
+
+def _anchors(content, backend, pdf_only):
+    backend = backend or DEFAULT_BACKEND
+    if backend not in _BACKEND_FUNCS:
+        raise ValueError(f"Unknown parser backend '{backend}' (choose from {', '.join(BACKENDS)})")
+    return _BACKEND_FUNCS[backend](content, pdf_only)
+
+
+def parse_pdf_links(content, base_url, backend=None):
+    """
+    Extract PDF link records from an HTML document.
+
+    Args:
+        content (bytes): The HTML document
+        base_url (str): URL of the page, used to resolve relative links
+        backend (str): One of ``BACKENDS`` (default: ``DEFAULT_BACKEND``)
+
+    Returns:
+        list: A list of ``PdfLink`` records
+    """
+    return [make_pdf_record(href, base_url, text)
+            for href, text in _anchors(content, backend, pdf_only=True)
+            if is_pdf_href(href)]
+
+
+def parse_links(content, base_url, backend=None):
+    """
+    Extract PDF link records and all other links from an HTML document.
+
+    Args:
+        content (bytes): The HTML document
+        base_url (str): URL of the page, used to resolve relative links
+        backend (str): One of ``BACKENDS`` (default: ``DEFAULT_BACKEND``)
+
+    Returns:
+        tuple: (list of PDF link records, list of other absolute URLs)
+    """
+    pdf_links = []
+    page_links = []
+    for href, text in _anchors(content, backend, pdf_only=False):
+        if is_pdf_href(href):
+            pdf_links.append(make_pdf_record(href, base_url, text))
+        else:
+            page_links.append(urljoin(base_url, href))
+    return pdf_links, page_links
+
+
+def _stream_decoder(head):
+    """
+    Pick an incremental decoder from the start of a document.
+
+    Detection runs on the head cut at the last ``<`` so that a multi-byte
+    character split across chunks cannot make UTF-8 look invalid.
+    """
+    cut = head.rfind(b'<')
+    sample = head[:cut] if cut > 0 else head
+    encoding = UnicodeDammit(sample, is_html=True).original_encoding or 'utf-8'
+    if codecs.lookup(encoding).name == 'utf-8':
+        # Drops a byte order mark, as UnicodeDammit does
+        encoding = 'utf-8-sig'
+    return codecs.getincrementaldecoder(encoding)(errors='replace')
+
+
+def iter_anchors(chunks, pdf_only=False):
+    """
+    Yield ``(href, text)`` pairs while an HTML document is still arriving.
+
+    The encoding is chosen from the first ``STREAM_SNIFF_BYTES`` (declared
+    charset, byte order mark, or UTF-8). A page that only turns out not to be
+    UTF-8 further down is decoded with replacement characters rather than
+    re-detected as a whole, which is the one way this can differ from
+    ``parse_links``.
+
+    Args:
+        chunks (iterable): Byte chunks of the document
+        pdf_only (bool): Only collect anchors whose href ends with .pdf
+
+    Yields:
+        tuple: ``(href, text)`` in document order
+    """
+    collector = AnchorCollector(pdf_only=pdf_only)
+    decoder = None
+    head = b''
+    for chunk in chunks:
+        if decoder is None:
+            head += chunk
+            if len(head) < STREAM_SNIFF_BYTES:
+                continue
+            decoder = _stream_decoder(head)
+            chunk, head = head, b''
+        collector.feed(decoder.decode(chunk))
+        yield from collector.pop_ready()
+    if decoder is None:
+        decoder = _stream_decoder(head)
+    collector.feed(decoder.decode(head, final=True))
+    collector.close()
+    yield from collector.pop_ready()
+
+
+def iter_pdf_links(chunks, base_url, backend=None):
+    """
+    Yield PDF link records as soon as they are parsed from a streamed document.
+
+    Only the ``stream`` backend parses incrementally; the others collect the
+    whole document first and then yield its records.
+
+    Args:
+        chunks (iterable): Byte chunks of the document
+        base_url (str): URL of the page, used to resolve relative links
+        backend (str): One of ``BACKENDS`` (default: ``DEFAULT_BACKEND``)
+
+    Yields:
+        PdfLink: PDF information (filename, url and text)
+    """
+    if (backend or DEFAULT_BACKEND) != 'stream':
+        yield from parse_pdf_links(b''.join(chunks), base_url, backend=backend)
+        return
+    for href, text in iter_anchors(chunks, pdf_only=True):
+        if is_pdf_href(href):
+            yield make_pdf_record(href, base_url, text)
@@ -0,0 +1,382 @@
+"""
+DocuMine - Network Metrics
+Per-request timing instrumentation for sessions created by http_client.
+
+Every request sent while a ``MetricsRecorder`` is attached records:
+
+- ``dns_ms``, ``connect_ms``, ``tls_ms``: connection setup, only when the
+  request opened a new connection (``reused`` is False)
+- ``ttfb_ms``: request start until the response headers arrived, including
+  any connection setup (as curl's ``time_starttransfer``)
+- ``transfer_ms``: headers until the last body byte was read
+- ``total_ms``: request start until the body was fully read or closed
+- ``status``, ``content_type``, ``bytes`` (decoded body bytes read),
+  ``retries`` (earlier attempts, see ``retrying``, plus urllib3 retries)
+  and ``error``
+
+Records can be appended to a JSONL file, and are aggregated into an
+end-of-run summary with percentiles and throughput.
+"""
+
+import collections
+import contextlib
+import json
+import math
+import socket
+import threading
+import time
+import weakref
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+try:
+    from urllib3.exceptions import NameResolutionError
+except ImportError:
+    # urllib3 1.x reports DNS failures as NewConnectionError
+    NameResolutionError = None
+
+PHASES = ('dns', 'connect', 'tls', 'ttfb', 'transfer', 'total')
+PERCENTILES = (50, 90, 95, 99)
+
+# The record of the request being sent on this thread, if it is measured
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def retrying(retries):
+    """
+    Mark requests sent on this thread inside the block as retries.
+
+    Args:
+        retries (int): Earlier attempts of the same request
+    """
+    _local.retries = retries
+    try:
+        yield
+    finally:
+        _local.retries = 0
+
+
+def _current_record():
+    return getattr(_local, 'record', None)
+
+
+def _elapsed_ms(start, end=None):
+    return round(((end if end is not None else time.perf_counter()) - start) * 1000, 3)
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile.
+
+    Args:
+        values (list): Numbers
+        pct (float): Percentile between 0 and 100
+
+    Returns:
+        float: The percentile, or None for an empty list
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    # The smallest value with at least pct% of the values at or below it
+    rank = max(1, math.ceil(pct * len(ordered) / 100.0))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class _TimedConnectionMixin:
+    """
+    Splits connection setup of urllib3 connections into DNS, TCP connect and
+    TLS handshake, writing them to the current thread's record.
+    """
+
+    def _new_conn(self):
+        record = _current_record()
+        if record is None:
+            return super()._new_conn()
+
+        host = self._dns_host
+        start = time.perf_counter()
+        try:
+            infos = socket.getaddrinfo(host.strip('[]'), self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            if NameResolutionError is None:
+                raise NewConnectionError(self, f"Failed to resolve '{self.host}' ({e})") from e
+            raise NameResolutionError(self.host, self, e) from e
+        resolved = time.perf_counter()
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+
+        # Connect to the resolved addresses in order, as urllib3 would
+        try:
+            for i, address in enumerate(addresses):
+                self._dns_host = address
+                try:
+                    sock = super()._new_conn()
+                    break
+                except (ConnectTimeoutError, NewConnectionError):
+                    if i == len(addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = host
+
+        record['dns_ms'] = _elapsed_ms(start, resolved)
+        record['connect_ms'] = _elapsed_ms(resolved)
+        return sock
+
+    def connect(self):
+        record = _current_record()
+        start = time.perf_counter()
+        super().connect()
+        if record is not None and isinstance(self, HTTPSConnection) and record['connect_ms'] is not None:
+            setup = record['dns_ms'] + record['connect_ms']
+            record['tls_ms'] = round(max(0.0, _elapsed_ms(start) - setup), 3)
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimingAdapter(HTTPAdapter):
+    """
+    ``HTTPAdapter`` that reports every request to ``metrics`` when set.
+
+    With ``metrics`` left as None it behaves like a plain ``HTTPAdapter``.
+    Requests sent through a proxy are timed as a whole, without the
+    connection setup breakdown.
+    """
+
+    def __init__(self, metrics=None, **kwargs):
+        self.metrics = metrics
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        metrics = self.metrics
+        if metrics is None:
+            return super().send(request, **kwargs)
+
+        record = metrics.begin(request)
+        _local.record = record
+        try:
+            response = super().send(request, **kwargs)
+        except Exception as e:
+            metrics.finish(record, error=e)
+            raise
+        finally:
+            _local.record = None
+        metrics.track(record, response)
+        return response
+
+
+class MetricsRecorder:
+    """
+    Collects request records, optionally appending them to a JSONL file.
+
+    Thread-safe; one recorder can be shared by every worker of a run. Records
+    are not kept in memory once finished, only counters and the timings
+    needed for percentiles.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8') if path else None
+        self._lock = threading.Lock()
+        self._open = {}
+        self.requests = 0
+        self.errors = 0
+        self.new_connections = 0
+        self.bytes = 0
+        self.statuses = collections.Counter()
+        self._samples = {phase: [] for phase in PHASES}
+        self._first_start = None
+        self._last_end = None
+
+    def begin(self, request):
+        """Starts the record for a request about to be sent."""
+        start = time.perf_counter()
+        record = {
+            'ts': round(time.time(), 3), 'method': request.method, 'url': request.url,
+            'status': None, 'content_type': None, 'bytes': 0, 'reused': None,
+            'dns_ms': None, 'connect_ms': None, 'tls_ms': None,
+            'ttfb_ms': None, 'transfer_ms': None, 'total_ms': None,
+            'retries': getattr(_local, 'retries', 0), 'error': None,
+            '_start': start, '_headers': None, '_done': False,
+        }
+        with self._lock:
+            if self._first_start is None:
+                self._first_start = start
+            self._open[id(record)] = record
+        return record
+
+    def track(self, record, response):
+        """
+        Notes the response headers and follows the body until it is read.
+
+        The record is finished when ``iter_content`` (which ``content`` also
+        uses) is exhausted or abandoned, when the response is closed, or when
+        it is garbage collected, whichever comes first.
+        """
+        record['_headers'] = time.perf_counter()
+        record['ttfb_ms'] = _elapsed_ms(record['_start'], record['_headers'])
+        record['status'] = response.status_code
+        record['content_type'] = response.headers.get('Content-Type')
+        retries = getattr(response.raw, 'retries', None)
+        if retries is not None:
+            record['retries'] += len(retries.history)
+
+        if response.request.method == 'HEAD' or response.status_code in (204, 304) or \
+                response.status_code < 200 or response.headers.get('Content-Length') == '0':
+            self.finish(record)
+            return
+
+        iter_content = response.iter_content
+        close = response.close
+
+        def counted_iter_content(*args, **kwargs):
+            try:
+                for chunk in iter_content(*args, **kwargs):
+                    record['bytes'] += len(chunk)
+                    yield chunk
+            except GeneratorExit:
+                self.finish(record, error='aborted')
+                raise
+            except Exception as e:
+                self.finish(record, error=e)
+                raise
+            self.finish(record)
+
+        def counted_close():
+            self.finish(record, error=None if response._content_consumed else 'closed')
+            close()
+
+        response.iter_content = counted_iter_content
+        response.close = counted_close
+        weakref.finalize(response, self.finish, record, 'unread')
+
+    def finish(self, record, error=None):
+        """Completes a record once; later calls are ignored."""
+        end = time.perf_counter()
+        with self._lock:
+            if record['_done']:
+                return
+            record['_done'] = True
+            self._open.pop(id(record), None)
+
+            record['total_ms'] = _elapsed_ms(record['_start'], end)
+            if record['_headers'] is not None:
+                record['transfer_ms'] = _elapsed_ms(record['_headers'], end)
+            if record['_headers'] is not None:
+                record['reused'] = record['connect_ms'] is None
+            if error is not None:
+                record['error'] = error if isinstance(error, str) else f"{type(error).__name__}: {error}"
+
+            self.requests += 1
+            self.bytes += record['bytes']
+            self._last_end = end
+            if record['error'] and record['error'] not in ('closed', 'unread'):
+                self.errors += 1
+            if record['status'] is not None:
+                self.statuses[record['status']] += 1
+            if record['reused'] is False:
+                self.new_connections += 1
+            for phase in PHASES:
+                value = record[f'{phase}_ms']
+                if value is not None:
+                    self._samples[phase].append(value)
+
+            if self._file:
+                entry = {key: value for key, value in record.items() if not key.startswith('_')}
+                self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                self._file.flush()
+
+    def summary(self):
+        """
+        Aggregate the records so far.
+
+        Returns:
+            dict: Request, error, connection and status counts, bytes, wall
+            time, throughput (bytes/s) and per-phase percentiles in ms
+        """
+        with self._lock:
+            wall = (self._last_end - self._first_start) if self._last_end is not None else 0.0
+            phases = {}
+            for phase in PHASES:
+                values = self._samples[phase]
+                phases[phase] = {'count': len(values), 'max': max(values) if values else None}
+                for pct in PERCENTILES:
+                    phases[phase][f'p{pct}'] = percentile(values, pct)
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'new_connections': self.new_connections,
+                'statuses': dict(self.statuses),
+                'bytes': self.bytes,
+                'wall_seconds': wall,
+                'throughput': self.bytes / wall if wall > 0 else None,
+                'phases': phases,
+            }
+
+    def close(self):
+        """Finishes any records still open and closes the JSONL file."""
+        for record in list(self._open.values()):
+            self.finish(record, error='unread')
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+def print_summary(metrics):
+    """
+    Print the end-of-run network summary.
+
+    Args:
+        metrics (MetricsRecorder): The run's recorder
+    """
+    summary = metrics.summary()
+    print(f"\n{'='*80}")
+    print("NETWORK TIMINGS")
+    print(f"{'='*80}")
+    if not summary['requests']:
+        print("No requests recorded.")
+        return
+    statuses = ', '.join(f"{status} x{count}" for status, count in sorted(summary['statuses'].items()))
+    print(f"Requests: {summary['requests']} ({summary['new_connections']} new connection(s), "
+          f"{summary['errors']} error(s))")
+    if statuses:
+        print(f"Status: {statuses}")
+    throughput = summary['throughput']
+    rate = f" ({throughput / 1024 / 1024:.2f} MB/s)" if throughput else ""
+    print(f"Transferred: {summary['bytes'] / 1024 / 1024:.2f} MB in {summary['wall_seconds']:.1f}s{rate}")
+    print()
+    print(f"{'phase':<10}{'count':>8}" + ''.join(f"{'p' + str(pct) + ' ms':>12}" for pct in PERCENTILES) +
+          f"{'max ms':>12}")
+    for phase, stats in summary['phases'].items():
+        if not stats['count']:
+            continue
+        cells = ''.join(f"{stats['p' + str(pct)]:>12.1f}" for pct in PERCENTILES)
+        print(f"{phase:<10}{stats['count']:>8}{cells}{stats['max']:>12.1f}")
+    if metrics.path:
+        print(f"\nPer-request records: {metrics.path}")
@@ -0,0 +1,125 @@
+"""
+DocuMine - Parse Pool
+Parses fetched pages in worker processes, so scans of many listing pages
+use every core instead of queueing on the GIL behind one parser.
+
+Fetching stays in threads; a fetch thread hands the page bytes to the pool
+and waits for the links. Large pages travel through shared memory rather
+than being pickled down a pipe, and links come back as plain tuples, which
+are much cheaper to pickle than records.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import link_parser
+
+# Pages at least this big are handed over in shared memory
+SHARED_MEMORY_MIN_BYTES = 256 * 1024
+
+
+def default_processes():
+    """Returns one parse process per CPU."""
+    return os.cpu_count() or 1
+
+
+def _page_bytes(content, shm_name, size):
+    """Returns the page, copying it out of shared memory when it was sent that way."""
+    if shm_name is None:
+        return content
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        return bytes(shm.buf[:size])
+    finally:
+        shm.close()
+
+
+def _parse_in_worker(content, shm_name, size, base_url, backend, pdf_only):
+    """
+    Parse one page inside a worker process.
+
+    Returns:
+        tuple: (list of ``(filename, url, text)`` PDF tuples, list of other
+            absolute URLs, or None when ``pdf_only``)
+    """
+    content = _page_bytes(content, shm_name, size)
+    if pdf_only:
+        records = link_parser.parse_pdf_links(content, base_url, backend=backend)
+        page_links = None
+    else:
+        records, page_links = link_parser.parse_links(content, base_url, backend=backend)
+    return [(pdf['filename'], pdf['url'], pdf['text']) for pdf in records], page_links
+
+
+class ParsePool:
+    """
+    Process pool with the ``link_parser`` parsing functions.
+
+    ``parse_pdf_links`` and ``parse_links`` take the same arguments and
+    return the same records as their ``link_parser`` counterparts, and may be
+    called from many threads at once. Worker processes are started with
+    ``spawn`` on first use, so a pool that is never needed costs nothing and
+    worker start-up is safe in a threaded program.
+
+    Args:
+        processes (int): Number of parse processes (default: one per CPU)
+        backend (str): Default ``link_parser`` backend
+    """
+
+    def __init__(self, processes=None, backend=None):
+        self.processes = max(1, processes or default_processes())
+        self.backend = backend
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.processes,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def _parse(self, content, base_url, backend, pdf_only):
+        executor = self._get_executor()
+        backend = backend or self.backend
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        shm = None
+        try:
+            if len(content) >= SHARED_MEMORY_MIN_BYTES:
+                shm = shared_memory.SharedMemory(create=True, size=len(content))
+                shm.buf[:len(content)] = content
+                future = executor.submit(_parse_in_worker, None, shm.name, len(content), base_url, backend, pdf_only)
+            else:
+                future = executor.submit(_parse_in_worker, content, None, len(content), base_url, backend, pdf_only)
+            pdf_tuples, page_links = future.result()
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+        pdf_links = [link_parser.PdfLink(filename, url, text) for filename, url, text in pdf_tuples]
+        return pdf_links, page_links
+
+    def parse_pdf_links(self, content, base_url, backend=None):
+        """Same as ``link_parser.parse_pdf_links``, parsed in a worker process."""
+        return self._parse(content, base_url, backend, pdf_only=True)[0]
+
+    def parse_links(self, content, base_url, backend=None):
+        """Same as ``link_parser.parse_links``, parsed in a worker process."""
+        return self._parse(content, base_url, backend, pdf_only=False)
+
+    def close(self):
+        """Stops the worker processes."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
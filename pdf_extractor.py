@@ -4,19 +4,81 @@ This script extracts all PDF file links from a given URL and optionally download
 """
 
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-import sys
+from urllib.parse import urlparse
 import os
+import argparse
+import contextlib
+import functools
+import hashlib
+import itertools
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import batch
+import content_store
+import crawler
+import download_journal
+import harvest_catalog
+import http_cache
+import http_client
+import link_parser
+import net_metrics
+import parse_pool
+import pdf_metadata
+import pdf_text
+import pdf_validation
+import profiling
+import size_probe
+import text_index
+import throttle
+import work_queue
+
 
-def extract_pdf_links(url):
+def fetch_pdf_links(url, session=None, cache=None, parser=None, pool=None):
+    """
+    Fetch a page and return its PDF links, raising on failure.
+    
+    Takes the same arguments as ``extract_pdf_links``.
+    
+    Returns:
+        list: A list of dictionaries containing PDF information (filename and URL)
+        
+    Raises:
+        requests.RequestException: The page could not be fetched
+    """
+    session = session or http_client.get_session()
+    
+    def fetch():
+        if cache:
+            response = cache.get(session, url, timeout=http_client.PAGE_TIMEOUT)
+        else:
+            response = session.get(url, timeout=http_client.PAGE_TIMEOUT)
+        response.raise_for_status()
+        return response.content
+    
+    # Parse the HTML content and keep the PDF links; transient failures are retried
+    with profiling.phase('fetch'):
+        content = throttle.call_with_retries(url, fetch)
+    with profiling.phase('parse'):
+        if pool:
+            return pool.parse_pdf_links(content, url, backend=parser)
+        return link_parser.parse_pdf_links(content, url, backend=parser)
+
+
+def extract_pdf_links(url, session=None, cache=None, parser=None, pool=None):
     """
     Extract all PDF links from a given URL.
     
     Args:
         url (str): The URL to scrape for PDF links
+        session (requests.Session): Session to fetch with (default: shared session)
+        cache (HttpCache): Optional cache used to revalidate the page
+        parser (str): link_parser backend (default: link_parser.DEFAULT_BACKEND)
+        pool (ParsePool): Optional process pool to parse the page in
         
     Returns:
         list: A list of dictionaries containing PDF information (filename and URL)
@@ -24,41 +86,7 @@ def extract_pdf_links(url):
     try:
         # Send GET request to the URL
         print(f"Fetching content from: {url}")
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        
-        # Parse the HTML content
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Find all anchor tags
-        all_links = soup.find_all('a', href=True)
-        
-        # Filter PDF links
-        pdf_links = []
-        for link in all_links:
-            href = link['href']
-            
-            # Check if the link ends with .pdf (case-insensitive)
-            if href.lower().endswith('.pdf'):
-                # Convert relative URLs to absolute URLs
-                absolute_url = urljoin(url, href)
-                
-                # Extract filename from URL
-                filename = href.split('/')[-1]
-                
-                # Get link text if available
-                link_text = link.get_text(strip=True)
-                
-                pdf_links.append({
-                    'filename': filename,
-                    'url': absolute_url,
-                    'text': link_text if link_text else filename
-                })
-        
-        return pdf_links
+        return fetch_pdf_links(url, session, cache, parser, pool)
         
     except requests.exceptions.RequestException as e:
         print(f"Error fetching URL: {e}")
@@ -68,6 +96,38 @@ def extract_pdf_links(url):
         return []
 
 
+def iter_pdf_links(url, session=None, cache=None, parser=None):
+    """
+    Yield PDF links from a given URL while the page is still downloading.
+    
+    Args:
+        url (str): The URL to scrape for PDF links
+        session (requests.Session): Session to fetch with (default: shared session)
+        cache (HttpCache): Optional cache used to revalidate the page
+        parser (str): link_parser backend (default: link_parser.DEFAULT_BACKEND)
+        
+    Yields:
+        dict: PDF information (filename, url and text)
+    """
+    try:
+        print(f"Fetching content from: {url}")
+        session = session or http_client.get_session()
+        with profiling.phase('fetch'):
+            if cache:
+                response = cache.get(session, url, timeout=http_client.PAGE_TIMEOUT, stream=True)
+            else:
+                response = session.get(url, timeout=http_client.PAGE_TIMEOUT, stream=True)
+        with response:
+            response.raise_for_status()
+            chunks = profiling.iterate('fetch', response.iter_content(chunk_size=65536))
+            yield from link_parser.iter_pdf_links(chunks, url, backend=parser)
+        
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching URL: {e}")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+
 def display_pdf_links(pdf_links):
     """
     Display the extracted PDF links in a formatted way.
@@ -87,6 +147,8 @@ def display_pdf_links(pdf_links):
         print(f"{idx}. {pdf['text']}")
         print(f"   Filename: {pdf['filename']}")
         print(f"   URL: {pdf['url']}")
+        if pdf.get('metadata'):
+            print(f"   Metadata: {pdf_metadata.describe(pdf['metadata'])}")
         print()
 
 
@@ -106,7 +168,10 @@ def save_to_file(pdf_links, output_file='pdf_links.txt'):
             for idx, pdf in enumerate(pdf_links, 1):
                 f.write(f"{idx}. {pdf['text']}\n")
                 f.write(f"   Filename: {pdf['filename']}\n")
-                f.write(f"   URL: {pdf['url']}\n\n")
+                f.write(f"   URL: {pdf['url']}\n")
+                if pdf.get('metadata'):
+                    f.write(f"   Metadata: {pdf_metadata.describe(pdf['metadata'])}\n")
+                f.write("\n")
         
         print(f"\nPDF links saved to: {output_file}")
         
@@ -114,80 +179,837 @@ def save_to_file(pdf_links, output_file='pdf_links.txt'):
         print(f"Error saving to file: {e}")
 
 
-def download_pdfs(pdf_links, download_dir='downloaded_pdfs'):
+class _DownloadContext:
+    """
+    State shared by all workers of one ``download_pdfs`` run.
+    
+    Holds the session, the retry policy, the per-host concurrency limits and
+    the set of file paths handed out so far, plus the optional resume journal,
+    HTTP cache, content-addressed store, byte progress, harvest catalog and
+    result callback.
+    """
+    
+    def __init__(self, download_dir, session, limits, retry, journal=None, cache=None, store=None,
+                 progress=None, catalog=None, revalidate=False, on_result=None):
+        self.download_dir = download_dir
+        self.session = session
+        self.limits = limits
+        self.retry = retry
+        self.journal = journal
+        self.cache = cache
+        self.store = store
+        self.progress = progress
+        self.catalog = catalog
+        self.revalidate = revalidate
+        self.on_result = on_result
+        self.lock = threading.Lock()
+        self.retries = 0
+        # Paths owned by journaled entries are never handed to other URLs
+        self.reserved = journal.paths() if journal else set()
+    
+    def get(self, url, **kwargs):
+        """Issues a GET through the HTTP cache when one is configured."""
+        if self.cache:
+            return self.cache.get(self.session, url, **kwargs)
+        return self.session.get(url, **kwargs)
+    
+    def report(self, pdf, status, **details):
+        """Passes the outcome of one link to the result callback, if any."""
+        if self.on_result:
+            self.on_result(pdf, status, details)
+    
+    def body(self, url, response, offset=0):
+        """Returns the validated body chunks of a response, counted by the byte progress."""
+        chunks = pdf_validation.validated_chunks(response, 8192, offset=offset)
+        if self.progress:
+            chunks = self.progress.counted(url, chunks, offset)
+        return chunks
+    
+    def reserve_path(self, filename, same_as=None):
+        """
+        Pick a free file path for a download, appending a counter on collisions.
+        
+        The chosen path is remembered so that concurrent workers never write
+        to the same file before either of them has created it.
+        
+        Args:
+            filename (str): Desired filename
+            same_as (str): Optional store object; an existing path that is
+                already a link to it is reused instead of adding a counter
+            
+        Returns:
+            str: A path that is not in use
+        """
+        original_path = os.path.join(self.download_dir, filename)
+        with self.lock:
+            file_path = original_path
+            counter = 1
+            while file_path in self.reserved or os.path.exists(file_path):
+                if same_as and os.path.exists(file_path) and os.path.samefile(file_path, same_as):
+                    break
+                name, ext = os.path.splitext(original_path)
+                file_path = f"{name}_{counter}{ext}"
+                counter += 1
+            self.reserved.add(file_path)
+        return file_path
+
+
+def _range_start(response):
+    """Returns the first byte offset of a 206 response's Content-Range, or None."""
+    content_range = response.headers.get('Content-Range', '')
+    try:
+        unit, spec = content_range.split(' ', 1)
+        if unit.lower() != 'bytes':
+            return None
+        return int(spec.split('-', 1)[0])
+    except ValueError:
+        return None
+
+
+def _fetch_resumable(ctx, url, file_path, entry):
+    """
+    Download a URL into ``file_path``, continuing a ``.part`` file if present.
+    
+    A partial file is continued with a ``Range`` request (guarded by
+    ``If-Range`` when the journal has a validator). If the server ignores the
+    range, the file is downloaded again from the start. The body is validated
+    as it streams (see ``pdf_validation``), and the file is only moved to its
+    final name once its size matches the advertised length.
+    
+    Args:
+        ctx (_DownloadContext): State shared by the run, including the journal
+        url (str): The PDF URL
+        file_path (str): Final path of the file
+        entry (dict): Previous journal entry for the URL, or None
+        
+    Returns:
+        tuple: (size of the completed file in bytes, response, SHA-256 hex
+            digest or None when neither a store nor a catalog needs it)
+    """
+    journal = ctx.journal
+    part_path = file_path + '.part'
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    
+    headers = {}
+    if offset:
+        headers['Range'] = f"bytes={offset}-"
+        validator = entry and (entry.get('etag') or entry.get('last_modified'))
+        if validator:
+            headers['If-Range'] = validator
+    
+    with ctx.get(url, headers=headers, timeout=http_client.DOWNLOAD_TIMEOUT, stream=True) as response:
+        if response.status_code == 416 and offset:
+            # The stored part is unusable for this server; start over
+            os.remove(part_path)
+            return _fetch_resumable(ctx, url, file_path, None)
+        response.raise_for_status()
+        
+        if offset and response.status_code == 206 and _range_start(response) == offset:
+            mode = 'ab'
+        else:
+            offset = 0
+            mode = 'wb'
+        
+        content_length = response.headers.get('Content-Length')
+        expected = offset + int(content_length) if content_length and content_length.isdigit() else None
+        validators = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+        journal.record(url, download_journal.PARTIAL, path=file_path, size=expected, **validators)
+        
+        # With a content store or catalog the file is hashed as it is written;
+        # only a resumed prefix has to be read back once.
+        hasher = hashlib.sha256() if ctx.store or ctx.catalog else None
+        if hasher and mode == 'ab':
+            with open(part_path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    hasher.update(block)
+        
+        try:
+            with open(part_path, mode) as f:
+                for chunk in ctx.body(url, response, offset):
+                    f.write(chunk)
+                    if hasher:
+                        hasher.update(chunk)
+        except pdf_validation.NotPdfError:
+            # Nothing of the page was written; don't leave an empty part to resume
+            if mode == 'wb':
+                os.remove(part_path)
+            raise
+    
+    file_size = os.path.getsize(part_path)
+    if expected is not None and file_size != expected:
+        raise throttle.TruncatedError(f"Incomplete download ({file_size:,} of {expected:,} bytes)")
+    
+    os.replace(part_path, file_path)
+    digest = hasher.hexdigest() if hasher else None
+    if ctx.store:
+        ctx.store.adopt(file_path, digest)
+        ctx.store.record(file_path, url, digest, file_size)
+    journal.record(url, download_journal.COMPLETE, path=file_path, size=file_size, **validators)
+    return file_size, response, digest
+
+
+def _fetch_plain(ctx, url, filename, file_path):
+    """
+    Download a URL in one go, into ``file_path`` or the content store.
+    
+    The body is validated as it streams: a response that is not a PDF is
+    abandoned after its first bytes, and a truncated one is discarded, so
+    neither reaches ``file_path``.
+    
+    Args:
+        ctx (_DownloadContext): State shared by the run
+        url (str): The PDF URL
+        filename (str): Desired filename, used with a content store
+        file_path (str): Path to write to when there is no content store
+        
+    Returns:
+        tuple: (size in bytes, response, path of the file, SHA-256 hex digest
+            or None when neither a store nor a catalog needs it)
+    """
+    with ctx.get(url, timeout=http_client.DOWNLOAD_TIMEOUT, stream=True) as response:
+        response.raise_for_status()
+        
+        chunks = ctx.body(url, response)
+        if ctx.store:
+            digest, file_size, object_path = ctx.store.write_stream(chunks)
+            file_path = ctx.reserve_path(filename, same_as=object_path)
+            ctx.store.link(object_path, file_path)
+            ctx.store.record(file_path, url, digest, file_size)
+        else:
+            hasher = hashlib.sha256() if ctx.catalog else None
+            part_path = file_path + '.part'
+            try:
+                with open(part_path, 'wb') as f:
+                    for chunk in chunks:
+                        f.write(chunk)
+                        if hasher:
+                            hasher.update(chunk)
+            except BaseException:
+                os.remove(part_path)
+                raise
+            os.replace(part_path, file_path)
+            file_size = os.path.getsize(file_path)
+            digest = hasher.hexdigest() if hasher else None
+    return file_size, response, file_path, digest
+
+
+def _is_unchanged(ctx, url, entry):
+    """
+    Ask the server whether a file downloaded by an earlier run has changed.
+    
+    Sends a conditional HEAD with the validators from the catalog. A 304, or
+    the same ``ETag`` (or ``Last-Modified`` when there is no ETag), means
+    unchanged; a file with neither validator is compared by size.
+    
+    Args:
+        ctx (_DownloadContext): State shared by the run
+        url (str): The PDF URL
+        entry (dict): The link's catalog row
+        
+    Returns:
+        bool: True if the file is unchanged
+    """
+    headers = {}
+    if entry['etag']:
+        headers['If-None-Match'] = entry['etag']
+    if entry['last_modified']:
+        headers['If-Modified-Since'] = entry['last_modified']
+    
+    with ctx.session.head(url, headers=headers, timeout=http_client.PAGE_TIMEOUT, allow_redirects=True) as response:
+        if response.status_code == 304:
+            return True
+        response.raise_for_status()
+        if entry['etag']:
+            return response.headers.get('ETag') == entry['etag']
+        if entry['last_modified']:
+            return response.headers.get('Last-Modified') == entry['last_modified']
+        length = response.headers.get('Content-Length', '')
+        return length.isdigit() and int(length) == entry['size']
+
+
+@profiling.profiled('download')
+def _download_one(pdf, ctx):
+    """
+    Download a single PDF within its host's concurrency limit, retrying
+    transient failures.
+    
+    Args:
+        pdf (dict): Dictionary containing PDF information
+        ctx (_DownloadContext): State shared by the run
+        
+    Returns:
+        tuple: (status, message) where status is 'success', 'skipped',
+            'unchanged' or 'failed' and message is the text to report
+    """
+    url = pdf['url']
+    journal = ctx.journal
+    file_path = None
+    retries = [0]
+    
+    def attempt():
+        if journal:
+            # A retry continues the .part file left by the failed attempt
+            file_size, response, digest = _fetch_resumable(ctx, url, file_path, journal.get(url))
+            return file_size, response, file_path, digest
+        return _fetch_plain(ctx, url, pdf['filename'], file_path)
+    
+    def on_retry(attempt_number, error, delay):
+        retries[0] += 1
+        with ctx.lock:
+            ctx.retries += 1
+    
+    def settle(size):
+        if ctx.progress:
+            ctx.progress.finish(url, size, pdf.get('size'))
+    
+    try:
+        if journal:
+            if journal.is_complete(url):
+                entry = journal.get(url)
+                settle(entry.get('size') or 0)
+                ctx.report(pdf, 'skipped', path=entry['path'], size=entry.get('size'))
+                return 'skipped', "↷ Skipped (already downloaded)"
+        
+        # A file from an earlier run is only fetched again if it changed,
+        # and then replaces the old copy instead of getting a new name
+        known = ctx.catalog.get(url) if ctx.catalog and ctx.revalidate else None
+        if known and known['status'] == harvest_catalog.COMPLETE and known['path'] and os.path.exists(known['path']):
+            if throttle.call_with_retries(url, lambda: _is_unchanged(ctx, url, known), ctx.retry, ctx.limits):
+                settle(known['size'] or 0)
+                ctx.report(pdf, 'unchanged', path=known['path'], size=known['size'], sha256=known['sha256'])
+                return 'unchanged', "↷ Unchanged since last run"
+            if not ctx.store:
+                file_path = known['path']
+                with ctx.lock:
+                    ctx.reserved.add(file_path)
+        
+        if journal:
+            entry = journal.get(url)
+            file_path = (entry.get('path') if entry else None) or file_path or ctx.reserve_path(pdf['filename'])
+        elif not ctx.store and not file_path:
+            file_path = ctx.reserve_path(pdf['filename'])
+        
+        file_size, response, file_path, digest = throttle.call_with_retries(url, attempt, ctx.retry, ctx.limits,
+                                                                            on_retry=on_retry)
+        
+        settle(file_size)
+        if ctx.catalog:
+            ctx.catalog.record_download(url, harvest_catalog.COMPLETE, path=file_path, size=file_size, sha256=digest,
+                                        etag=response.headers.get('ETag'),
+                                        last_modified=response.headers.get('Last-Modified'))
+        ctx.report(pdf, 'success', path=file_path, size=file_size, sha256=digest)
+        notes = []
+        if getattr(response, 'from_cache', False):
+            notes.append("not modified")
+        if retries[0]:
+            notes.append(f"after {retries[0]} retr{'y' if retries[0] == 1 else 'ies'}")
+        return 'success', f"✓ Success ({', '.join([f'{file_size:,} bytes'] + notes)})"
+        
+    except Exception as e:
+        settle(0)
+        if ctx.catalog:
+            ctx.catalog.record_download(url, harvest_catalog.FAILED, error=str(e))
+        if journal:
+            previous = journal.get(url) or {}
+            partial = file_path and os.path.exists(file_path + '.part')
+            status = download_journal.PARTIAL if partial else download_journal.FAILED
+            journal.record(url, status, path=file_path, size=previous.get('size'),
+                           etag=previous.get('etag'), last_modified=previous.get('last_modified'),
+                           error=str(e))
+        ctx.report(pdf, 'failed', error=str(e))
+        if retries[0]:
+            return 'failed', f"✗ Failed after {retries[0] + 1} attempts - {str(e)}"
+        return 'failed', f"✗ Failed - {str(e)}"
+
+
+@profiling.profiled('download')
+def download_pdfs(pdf_links, download_dir='downloaded_pdfs', workers=1, per_host_limit=None,
+                  session=None, resume=False, cache=None, dedupe=False, retries=throttle.DEFAULT_RETRIES,
+                  adaptive=True, probe=False, probe_workers=size_probe.DEFAULT_PROBE_WORKERS, max_total_bytes=None,
+                  catalog=None, incremental=False, revalidate=False, on_result=None, lookahead=None):
     """
     Download all PDF files to a specified directory.
     
+    With ``workers`` greater than 1 the files are fetched concurrently from a
+    thread pool. Progress lines are still printed in list order, so the output
+    reads the same as a sequential run.
+    
+    ``pdf_links`` may also be a generator such as ``iter_pdf_links``: links
+    are then downloaded while the page is still being parsed, with at most
+    ``lookahead`` of them taken and not yet reported.
+    
+    With ``resume`` enabled, progress is journaled in the download directory.
+    A later run with ``resume`` skips files that are complete and intact,
+    continues partial files with HTTP ``Range`` requests and retries failures,
+    reusing the same file names instead of creating ``_1`` copies.
+    
+    Timeouts, connection errors, truncated bodies and 408/429/5xx responses
+    are retried with exponential backoff and jitter, waiting out any
+    ``Retry-After``. With ``adaptive`` enabled the number of simultaneous
+    requests to each host starts low, ramps up while responses stay healthy
+    and halves when the host throttles, never exceeding ``per_host_limit``.
+    
+    With ``probe`` enabled the file sizes are collected first with HEAD (or
+    one-byte ranged GET) requests. Progress is then reported in bytes with an
+    ETA, concurrent runs start the largest files first so that no giant file
+    is left running alone at the end, and ``max_total_bytes`` is checked
+    before anything is downloaded. A generator is collected into a list
+    before probing.
+    
+    With a ``catalog`` every download is recorded with its size, SHA-256 and
+    validators. ``incremental`` then skips links an earlier run downloaded
+    without sending any request for them; ``revalidate`` instead asks the
+    server with a conditional HEAD and downloads them again only if they
+    changed.
+    
     Args:
-        pdf_links (list): List of dictionaries containing PDF information
+        pdf_links (iterable): List or generator of dictionaries containing
+            PDF information
         download_dir (str): Directory to save downloaded PDFs
+        workers (int): Number of concurrent download threads
+        per_host_limit (int): Maximum simultaneous requests to any single
+            host (default: same as ``workers``)
+        session (requests.Session): Session to fetch with (default: shared
+            session)
+        resume (bool): Journal progress and resume an earlier run
+        cache (HttpCache): Optional cache; unchanged files are revalidated
+            with a conditional request and copied from disk
+        dedupe (bool): Store each unique file once by SHA-256 in a
+            content-addressed store inside the download directory and expose
+            it under its original name with a hardlink
+        retries (int): How many times a failed download is retried
+        adaptive (bool): Adapt per-host concurrency (AIMD) instead of always
+            using ``per_host_limit``
+        probe (bool): Probe file sizes before downloading
+        probe_workers (int): Number of size probes sent at once
+        max_total_bytes (int): Refuse to download if the probed files add
+            up to more than this (implies ``probe``)
+        catalog (HarvestCatalog): Optional catalog to record downloads in;
+            the links should already be recorded (see ``record_links``)
+        incremental (bool): Skip links the catalog lists as downloaded
+        revalidate (bool): Re-download links the catalog lists as
+            downloaded only if the server reports a change
+        on_result (callable): Called from the worker threads as
+            ``on_result(pdf, status, details)`` once each link is settled,
+            where status is 'success', 'skipped', 'unchanged' or 'failed' and
+            details holds the ``path``, ``size`` and ``sha256`` of the file,
+            or the ``error``
+        lookahead (int): Most links taken from ``pdf_links`` whose results
+            have not been printed yet, in concurrent runs (default: four per
+            worker)
+        
+    Returns:
+        tuple: (successful_downloads, failed_downloads), where skipped and
+            unchanged files count as successful
     """
-    if not pdf_links:
-        print("No PDFs to download.")
-        return
+    workers = max(1, int(workers))
+    per_host_limit = max(1, int(per_host_limit or workers))
+    session = session or http_client.get_session()
+    limits = throttle.HostLimits(per_host_limit, adaptive=adaptive and workers > 1)
+    
+    # Links downloaded by earlier runs, left out without asking the server
+    unchanged = [0]
+    if catalog and incremental and not revalidate:
+        def is_new(pdf):
+            if catalog.is_downloaded(pdf['url']):
+                unchanged[0] += 1
+                if on_result:
+                    known = catalog.get(pdf['url'])
+                    on_result(pdf, 'unchanged', {'path': known['path'], 'size': known['size'],
+                                                 'sha256': known['sha256']})
+                return False
+            return True
+        if isinstance(pdf_links, list):
+            pdf_links = [pdf for pdf in pdf_links if is_new(pdf)]
+            print(f"\nIncremental: {unchanged[0]} link(s) already downloaded by an earlier run")
+        else:
+            pdf_links = (pdf for pdf in pdf_links if is_new(pdf))
+    
+    progress = None
+    if probe or max_total_bytes:
+        pdf_links = list(pdf_links)
+        if pdf_links:
+            print(f"\nProbing the size of {len(pdf_links)} PDF file(s)...")
+            known_bytes, unknown = size_probe.probe_sizes(pdf_links, session, probe_workers, limits)
+            print(f"Total size: {size_probe.format_bytes(known_bytes)}"
+                  + (f" (+ {unknown} file(s) of unknown size)" if unknown else ""))
+            try:
+                size_probe.check_budget(known_bytes, max_total_bytes)
+            except size_probe.BudgetExceeded as e:
+                print(f"Error: {e}. Nothing was downloaded.")
+                return 0, len(pdf_links)
+            if workers > 1:
+                pdf_links = size_probe.largest_first(pdf_links)
+            progress = size_probe.ByteProgress(known_bytes, unknown)
+    
+    # A list gives a known total; any other iterable is consumed as it yields
+    total = len(pdf_links) if hasattr(pdf_links, '__len__') else None
+    links = iter(pdf_links)
+    first = next(links, None)
+    if first is None:
+        print("No new PDFs to download." if unchanged[0] else "No PDFs to download.")
+        return unchanged[0], 0
+    links = itertools.chain([first], links)
     
     # Create download directory if it doesn't exist
     Path(download_dir).mkdir(parents=True, exist_ok=True)
     
     print(f"\n{'='*80}")
-    print(f"Downloading {len(pdf_links)} PDF file(s) to '{download_dir}'...")
+    if total is None:
+        print(f"Downloading PDF files to '{download_dir}' as they are found...")
+    else:
+        print(f"Downloading {total} PDF file(s) to '{download_dir}'...")
+    if workers > 1:
+        if adaptive:
+            print(f"Using {workers} workers (adaptive, up to {per_host_limit} per host)")
+        else:
+            print(f"Using {workers} workers (max {per_host_limit} per host)")
+    journal = None
+    if resume:
+        journal = download_journal.DownloadJournal(download_dir)
+        print(f"Resume journal: {journal.path}")
+    store = None
+    if dedupe:
+        store = content_store.ContentStore(os.path.join(download_dir, content_store.STORE_NAME))
+        print(f"Content store: {store.root}")
     print(f"{'='*80}\n")
     
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+    ctx = _DownloadContext(download_dir, session, limits, throttle.RetryPolicy(retries=retries),
+                           journal, cache, store, progress, catalog, revalidate, on_result)
     
-    successful_downloads = 0
-    failed_downloads = 0
+    counts = {'success': 0, 'skipped': 0, 'unchanged': 0, 'failed': 0}
+    cache_start = (cache.hits, cache.misses) if cache else None
+    label = total if total is not None else '?'
     
-    for idx, pdf in enumerate(pdf_links, 1):
-        try:
-            print(f"[{idx}/{len(pdf_links)}] Downloading: {pdf['filename']}...", end=' ')
-            
-            # Download the PDF
-            response = requests.get(pdf['url'], headers=headers, timeout=60, stream=True)
-            response.raise_for_status()
-            
-            # Save to file
-            file_path = os.path.join(download_dir, pdf['filename'])
-            
-            # Handle duplicate filenames
-            counter = 1
-            original_path = file_path
-            while os.path.exists(file_path):
-                name, ext = os.path.splitext(original_path)
-                file_path = f"{name}_{counter}{ext}"
-                counter += 1
-            
-            with open(file_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+    def with_progress(message):
+        return f"{message} [{progress.describe()}]" if progress else message
+    
+    try:
+        if workers == 1:
+            for idx, pdf in enumerate(links, 1):
+                print(f"[{idx}/{label}] Downloading: {pdf['filename']}...", end=' ', flush=True)
+                status, message = _download_one(pdf, ctx)
+                print(with_progress(message))
+                counts[status] += 1
+        else:
+            # Results arrive in completion order; hold them back until every
+            # earlier entry has been reported so progress stays in list order.
+            finished = {}
+            next_idx = [1]
+            report_lock = threading.Lock()
+            # Bounds how many links are taken from the iterable and not yet
+            # reported. A slot is freed when its result is reported, not when
+            # it completes, so a stalled download cannot let results pile up
+            # behind it and a generator is never drained into memory.
+            in_flight = threading.BoundedSemaphore(max(workers, lookahead or workers * 4))
+            interrupted = threading.Event()
             
-            file_size = os.path.getsize(file_path)
-            print(f"✓ Success ({file_size:,} bytes)")
-            successful_downloads += 1
+            def report(idx, pdf, future):
+                # Downloads still running after Ctrl-C finish unreported
+                if interrupted.is_set() or future.cancelled():
+                    return
+                with report_lock:
+                    finished[idx] = (pdf, future.result())
+                    while next_idx[0] in finished:
+                        done_pdf, (status, message) = finished.pop(next_idx[0])
+                        print(f"[{next_idx[0]}/{label}] Downloading: {done_pdf['filename']}... "
+                              f"{with_progress(message)}")
+                        counts[status] += 1
+                        next_idx[0] += 1
+                        in_flight.release()
             
-        except requests.exceptions.RequestException as e:
-            print(f"✗ Failed - {str(e)}")
-            failed_downloads += 1
-        except Exception as e:
-            print(f"✗ Failed - {str(e)}")
-            failed_downloads += 1
+            executor = ThreadPoolExecutor(max_workers=workers)
+            try:
+                for idx in itertools.count(1):
+                    # Wait for a slot before taking the next link, so that
+                    # none is taken from a generator only to wait here
+                    in_flight.acquire()
+                    pdf = next(links, None)
+                    if pdf is None:
+                        break
+                    future = executor.submit(_download_one, pdf, ctx)
+                    future.add_done_callback(functools.partial(report, idx, pdf))
+                executor.shutdown(wait=True)
+            except KeyboardInterrupt:
+                # Drop the queued downloads instead of waiting for them;
+                # only those already running are finished
+                interrupted.set()
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+            finally:
+                executor.shutdown(wait=not interrupted.is_set())
+    finally:
+        if journal:
+            journal.close()
+    
+    counts['unchanged'] += unchanged[0]
     
     print(f"\n{'='*80}")
     print(f"Download Summary:")
-    print(f"  Successful: {successful_downloads}")
-    print(f"  Failed: {failed_downloads}")
-    print(f"  Total: {len(pdf_links)}")
+    print(f"  Successful: {counts['success']}")
+    if resume:
+        print(f"  Skipped (already downloaded): {counts['skipped']}")
+    if catalog and (incremental or revalidate):
+        print(f"  Unchanged since last run: {counts['unchanged']}")
+    print(f"  Failed: {counts['failed']}")
+    print(f"  Total: {sum(counts.values())}")
+    if progress:
+        rate = progress.rate()
+        print(f"  Downloaded: {size_probe.format_bytes(progress.transferred)}"
+              + (f" at {size_probe.format_bytes(rate)}/s" if rate else ""))
+    if ctx.retries:
+        print(f"  Retries: {ctx.retries}")
+    if limits.adaptive:
+        for host, limiter in sorted(limits.hosts().items()):
+            print(f"  Concurrency {host}: {int(limiter.limit)} of {limiter.maximum}, throttled {limiter.throttles} time(s)")
+    if cache:
+        print(f"  Cache: {cache.hits - cache_start[0]} not modified, {cache.misses - cache_start[1]} fetched")
+    if store:
+        print(f"  Stored: {store.new_objects} unique, {store.duplicates} duplicate(s)")
+    print(f"{'='*80}\n")
+    
+    return counts['success'] + counts['skipped'] + counts['unchanged'], counts['failed']
+
+
+def mine_pdfs(directory, index, processes=None, backend=None):
+    """
+    Add the text of the PDFs in a directory to a full-text search index.
+    
+    Only files that are new or changed since the last run are extracted, so
+    re-mining a growing download directory is cheap. Documents whose file
+    was deleted are dropped from the index.
+    
+    Args:
+        directory (str): Directory to mine, including subdirectories
+        index (text_index.TextIndex): The index to update
+        processes (int): Number of extraction processes (default: one per CPU)
+        backend (str): ``pdf_text`` backend (default: pypdf if installed)
+        
+    Returns:
+        dict: Files indexed, skipped as unchanged, and failed
+    """
+    paths = text_index.find_pdfs(directory)
+    print(f"\nMining {len(paths)} PDF file(s) in {directory} into {index.path}...")
+    if (backend or pdf_text.default_backend()) == 'basic':
+        print("Note: using the basic text extractor, which gets little or no text from PDFs with custom "
+              "font encodings. Install pypdf (pip install pypdf) for full extraction.")
+    
+    def report(done, total, path, error):
+        status = f"Error: {error}" if error else "Indexed"
+        print(f"[{done}/{total}] {os.path.basename(path)}... {status}")
+    
+    totals = index.mine(paths, processes=processes, backend=backend, on_progress=report)
+    removed = index.remove_missing(directory, paths)
+    stats = index.stats()
+    
+    print(f"\n{'='*80}")
+    print("Mining Summary:")
+    print(f"  Indexed: {totals['indexed']}")
+    print(f"  Unchanged: {totals['unchanged']}")
+    print(f"  Failed: {totals['failed']}")
+    if removed:
+        print(f"  Removed (file deleted or skipped): {removed}")
+    print(f"  Index: {stats['documents']} document(s), {stats['pages']} page(s) with text")
+    print(f"{'='*80}\n")
+    return totals
+
+
+def display_search_results(results, query):
+    """
+    Display full-text search results in a formatted way.
+    
+    Args:
+        results (list): Results of ``text_index.TextIndex.search``
+        query (str): The query searched for
+    """
+    if not results:
+        print(f"\nNo documents match '{query}'.")
+        return
+    
+    print(f"\n{'='*80}")
+    print(f"Found {len(results)} document(s) matching '{query}':")
     print(f"{'='*80}\n")
+    
+    for idx, result in enumerate(results, 1):
+        print(f"{idx}. {result['filename']} (score {result['score']:.2f})")
+        print(f"   Pages: {', '.join(str(page) for page in result['pages'])}")
+        print(f"   {result['snippet']}")
+        print(f"   Path: {result['path']}")
+        print()
 
 
 def main():
     """Main function to run the PDF extractor."""
     
+    parser = argparse.ArgumentParser(description="Extract and download PDF links from a web page.")
+    parser.add_argument('url', nargs='?', help="URL to extract PDF links from")
+    parser.add_argument('--seeds', default=None, metavar='FILE',
+                        help="Batch mode: read seed URLs from FILE ('-' for stdin), one per line, and run without prompts")
+    parser.add_argument('--seed-workers', type=int, default=batch.DEFAULT_SEED_WORKERS,
+                        help="Batch: number of seeds scanned at once (default: %(default)s)")
+    parser.add_argument('--output', default='-', metavar='FILE',
+                        help="Batch: write link records to FILE instead of stdout")
+    parser.add_argument('--format', choices=batch.FORMATS, default=None,
+                        help="Batch: record format (default: csv for a .csv --output, else jsonl)")
+    parser.add_argument('--report', default=None, metavar='FILE',
+                        help="Batch: write one JSON line per seed with its status, link count and error")
+    parser.add_argument('--download', action='store_true',
+                        help="Batch: download the links of every seed (once per file) into --download-dir")
+    parser.add_argument('--crawl', action='store_true',
+                        help="Follow same-site listing links (pagination, sub-collections) from the URL")
+    parser.add_argument('--max-depth', type=int, default=crawler.DEFAULT_MAX_DEPTH,
+                        help="Crawl: how many links away from the URL to follow (default: %(default)s)")
+    parser.add_argument('--max-pages', type=int, default=crawler.DEFAULT_MAX_PAGES,
+                        help="Crawl: maximum number of pages to fetch (default: %(default)s)")
+    parser.add_argument('--crawl-workers', type=int, default=crawler.DEFAULT_WORKERS,
+                        help="Crawl: number of pages fetched concurrently (default: %(default)s)")
+    parser.add_argument('--parser', choices=link_parser.BACKENDS, default=link_parser.DEFAULT_BACKEND,
+                        help="HTML parsing backend (default: %(default)s)")
+    parser.add_argument('--parse-processes', type=int, default=0, metavar='N',
+                        help="Parse pages in N worker processes, independent of the fetch workers "
+                             "(default: 0, parse in the fetching threads)")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="Download without prompting, starting while pages are still being parsed or crawled")
+    parser.add_argument('--download-dir', default='downloaded_pdfs',
+                        help="Download directory for --pipeline, and the default when prompted (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of concurrent downloads (default: 1)")
+    parser.add_argument('--per-host-limit', type=int, default=None,
+                        help="Maximum concurrent downloads per host; adaptive concurrency ramps up to it (default: same as --workers)")
+    parser.add_argument('--retries', type=int, default=throttle.DEFAULT_RETRIES,
+                        help="Retries per file for timeouts, connection errors and 408/429/5xx (default: %(default)s)")
+    parser.add_argument('--no-adaptive', action='store_true',
+                        help="Always use --per-host-limit instead of adapting per-host concurrency to throttling")
+    parser.add_argument('--probe', action='store_true',
+                        help="Probe file sizes first: byte progress with ETA, and the largest files start first")
+    parser.add_argument('--probe-workers', type=int, default=size_probe.DEFAULT_PROBE_WORKERS,
+                        help="Number of size or metadata probes sent at once (default: %(default)s)")
+    parser.add_argument('--metadata', action='store_true',
+                        help="Read each PDF's page count, title, author, producer and dates with small Range "
+                             "requests and show them with the links; files already downloaded are read from disk")
+    parser.add_argument('--max-total-size', type=float, default=None, metavar='MB',
+                        help="Refuse to download if the probed files total more than this many MB (implies --probe)")
+    parser.add_argument('--resume', action='store_true',
+                        help="Journal progress in the download directory and resume an interrupted run")
+    parser.add_argument('--dedupe', action='store_true',
+                        help="Store identical PDFs once by SHA-256 and hardlink them under their original names")
+    parser.add_argument('--catalog', default=None, metavar='PATH',
+                        help="SQLite harvest catalog recording pages, links and downloads across runs")
+    parser.add_argument('--incremental', action='store_true',
+                        help="With --catalog: only download links that no earlier run downloaded")
+    parser.add_argument('--revalidate', action='store_true',
+                        help="With --catalog: also re-download earlier files the server reports as changed")
+    parser.add_argument('--queue', default=None, metavar='PATH',
+                        help="SQLite work queue shared by --worker processes: with a URL or --seeds, the links found "
+                             "are added to it instead of downloaded; on its own, print the queue's status")
+    parser.add_argument('--worker', action='store_true',
+                        help="With --queue: claim tasks from the queue and download them into --download-dir until "
+                             "the queue is empty; run several, on one host or more, to share a harvest")
+    parser.add_argument('--worker-id', default=None,
+                        help="Worker: name recorded with its results (default: host:pid)")
+    parser.add_argument('--lease', type=float, default=work_queue.DEFAULT_LEASE_SECONDS, metavar='SECONDS',
+                        help="Worker: how long a claimed task stays leased without a heartbeat before another "
+                             "worker may take it over (default: %(default)s)")
+    parser.add_argument('--manifest', default=None, metavar='FILE',
+                        help="With --queue: write one JSON line per finished task (URL, worker, path, size, SHA-256 "
+                             "or error)")
+    parser.add_argument('--index', default=None, metavar='PATH',
+                        help="SQLite full-text search index of the text of downloaded PDFs")
+    parser.add_argument('--mine', action='store_true',
+                        help="With --index: index the text of new and changed PDFs in --download-dir after "
+                             "downloading (on its own, without a URL: just index --download-dir)")
+    parser.add_argument('--mine-processes', type=int, default=0, metavar='N',
+                        help="Mine: number of text extraction processes (default: one per CPU)")
+    parser.add_argument('--text-backend', choices=pdf_text.BACKENDS, default=None,
+                        help="Mine: text extraction backend (default: pypdf if installed, else basic)")
+    parser.add_argument('--search', default=None, metavar='QUERY',
+                        help="With --index: search the index and print ranked documents with page numbers")
+    parser.add_argument('--search-limit', type=int, default=text_index.DEFAULT_LIMIT,
+                        help="Search: maximum number of documents shown (default: %(default)s)")
+    parser.add_argument('--cache-dir', default=None,
+                        help="Directory for an HTTP cache that revalidates pages and PDFs with ETag/Last-Modified")
+    parser.add_argument('--cache-size', type=int, default=http_cache.DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="Maximum HTTP cache size in MB (default: %(default)s)")
+    parser.add_argument('--cookies', default='',
+                        help="Extra cookies to send, e.g. 'name=value; name2=value2'")
+    parser.add_argument('--metrics', action='store_true',
+                        help="Time every request (DNS, connect, TLS, first byte, transfer) and print a summary at the end")
+    parser.add_argument('--profile', default=None, metavar='DIR',
+                        help="Profile CPU (cProfile) and memory (tracemalloc) per phase - fetch, parse, download - "
+                             "and write <phase>.prof, <phase>.tracemalloc and profile_report.txt to DIR")
+    parser.add_argument('--profile-top', type=int, default=profiling.DEFAULT_TOP, metavar='N',
+                        help="Profile: functions and allocation sites listed per phase in the report "
+                             "(default: %(default)s)")
+    parser.add_argument('--metrics-file', default=None,
+                        help="Append per-request timing records to this JSONL file (implies --metrics)")
+    args = parser.parse_args()
+    if (args.incremental or args.revalidate) and not args.catalog:
+        parser.error("--incremental and --revalidate need --catalog")
+    if (args.mine or args.search) and not args.index:
+        parser.error("--mine and --search need --index")
+    if args.metadata and args.pipeline:
+        parser.error("--metadata shows metadata before downloading; it can't be combined with --pipeline")
+    if (args.worker or args.manifest) and not args.queue:
+        parser.error("--worker and --manifest need --queue")
+    if args.worker and (args.url or args.seeds):
+        parser.error("a --worker takes its links from --queue; drop the URL or --seeds")
+    if args.worker and (args.probe or args.max_total_size):
+        parser.error("--probe and --max-total-size need every link up front; a --worker claims them one by one")
+    if args.queue and args.download:
+        parser.error("--queue leaves downloading to --worker processes; drop --download")
+    
+    if not args.profile:
+        _dispatch(args, parser)
+        return
+    profiling.enable(args.profile, top=args.profile_top)
+    try:
+        _dispatch(args, parser)
+    finally:
+        # stderr, as stdout may carry batch records
+        print(f"\nProfile report: {profiling.disable()}", file=sys.stderr)
+
+
+def _dispatch(args, parser):
+    """Runs the mode selected on the command line."""
+    if args.search:
+        index = text_index.TextIndex(args.index)
+        try:
+            display_search_results(index.search(args.search, limit=args.search_limit), args.search)
+        finally:
+            index.close()
+        return
+    
+    if args.queue and not (args.url or args.seeds):
+        if args.worker:
+            _with_session(args, lambda session: run_worker(args, session))
+        else:
+            show_queue(args)
+        return
+    
+    if args.mine and not (args.url or args.seeds):
+        _mine(args, args.download_dir)
+        return
+    
+    if args.seeds:
+        if args.url:
+            parser.error("give either a URL or --seeds, not both")
+        # Records go to stdout; everything printed for people goes to stderr
+        records = sys.stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            try:
+                code = _with_session(args, lambda session: run_batch(args, session, records))
+            except BrokenPipeError:
+                # Whoever read the records stopped early (e.g. `| head`)
+                os.dup2(os.open(os.devnull, os.O_WRONLY), records.fileno())
+                code = batch.EXIT_PARTIAL
+        sys.exit(code)
+    
     # Check if URL is provided as command line argument
-    if len(sys.argv) > 1:
-        url = sys.argv[1]
+    if args.url:
+        url = args.url
     else:
         # Prompt user for URL
         url = input("Enter the URL to extract PDF links from: ").strip()
@@ -202,14 +1024,281 @@ def main():
         print("Error: Invalid URL format. Please include http:// or https://")
         return
     
+    _with_session(args, lambda session: run(url, args, session))
+
+
+def _with_session(args, fn):
+    """Calls ``fn(session)`` with the run's session, printing the network summary afterwards if requested."""
+    metrics = None
+    if args.metrics or args.metrics_file:
+        metrics = net_metrics.MetricsRecorder(args.metrics_file)
+    
+    # One keep-alive session for the whole run, sized for the download workers
+    session = http_client.create_session(
+        cookies=http_client.parse_cookie_string(args.cookies),
+        pool_size=max(args.workers, args.seed_workers, http_client.DEFAULT_POOL_SIZE),
+        metrics=metrics
+    )
+    
+    try:
+        return fn(session)
+    finally:
+        if metrics:
+            metrics.close()
+            net_metrics.print_summary(metrics)
+
+
+def _open_stores(args, seed):
+    """Returns the run's HTTP cache and harvest catalog, each None unless requested."""
+    cache = None
+    if args.cache_dir:
+        cache = http_cache.HttpCache(args.cache_dir, max_bytes=args.cache_size * 1024 * 1024)
+    catalog = None
+    if args.catalog:
+        catalog = harvest_catalog.HarvestCatalog(args.catalog)
+        catalog.start_run(seed)
+    return cache, catalog
+
+
+def _close_catalog(catalog):
+    """Finishes the catalog's run, printing its totals."""
+    totals = catalog.finish_run()
+    stats = catalog.stats()
+    print(f"Catalog {catalog.path}: this run found {totals['found']} link(s), {totals['new']} new, "
+          f"downloaded {totals['downloaded']}, {totals['failed']} failed; "
+          f"{stats['links']} link(s) on {stats['pages']} page(s) in total")
+    catalog.close()
+
+
+def _mine(args, directory):
+    """Mines a download directory into ``--index``."""
+    if not os.path.isdir(directory):
+        print(f"Error: Download directory not found: {directory}")
+        return
+    index = text_index.TextIndex(args.index)
+    try:
+        mine_pdfs(directory, index, processes=args.mine_processes, backend=args.text_backend)
+    finally:
+        index.close()
+
+
+def _local_copy(args, catalog):
+    """Returns a function giving the path of a link's downloaded copy (per the catalog, else by filename), or None."""
+    def local_path(pdf):
+        if catalog:
+            entry = catalog.get(pdf['url'])
+            if entry and entry['status'] == harvest_catalog.COMPLETE and entry['path'] and os.path.isfile(entry['path']):
+                return entry['path']
+        path = os.path.join(args.download_dir, pdf['filename'])
+        return path if os.path.isfile(path) else None
+    return local_path
+
+
+def read_metadata(pdf_links, session, workers, local_path=None):
+    """
+    Read the metadata of every link, printing progress and a summary.
+    
+    Args:
+        pdf_links (list): List of dictionaries containing PDF information;
+            each gets a ``metadata`` key
+        session (requests.Session): Session to fetch with
+        workers (int): Number of files read at once
+        local_path (callable): Returns the path of a link's downloaded copy, or None
+    """
+    print(f"\nReading metadata of {len(pdf_links)} PDF file(s)...", end=' ', flush=True)
+    totals = pdf_metadata.probe_metadata(pdf_links, session, workers=workers, local_path=local_path)
+    print(f"{totals['remote']} over the network ({size_probe.format_bytes(totals['bytes'])} transferred), "
+          f"{totals['local']} from disk, {totals['failed']} failed")
+
+
+def _download_options(args, session, cache, catalog):
+    """Returns the ``download_pdfs`` keyword arguments selected on the command line."""
+    return dict(workers=args.workers, per_host_limit=args.per_host_limit, session=session,
+                resume=args.resume, cache=cache, dedupe=args.dedupe,
+                retries=args.retries, adaptive=not args.no_adaptive, probe=args.probe,
+                probe_workers=args.probe_workers,
+                max_total_bytes=int(args.max_total_size * 1024 * 1024) if args.max_total_size else None,
+                catalog=catalog, incremental=args.incremental, revalidate=args.revalidate)
+
+
+def enqueue_links(pdf_links, path):
+    """
+    Add links to a work queue for ``--worker`` processes to download.
+    
+    Links are added in small transactions as they arrive, so workers already
+    running start on the first ones while a generator is still producing.
+    
+    Args:
+        pdf_links (iterable): List or generator of dictionaries containing
+            PDF information
+        path (str): The queue's SQLite database file
+    """
+    queue = work_queue.WorkQueue(path)
+    links = iter(pdf_links)
+    found = added = 0
+    try:
+        while True:
+            chunk = list(itertools.islice(links, work_queue.BATCH_SIZE))
+            if not chunk:
+                break
+            found += len(chunk)
+            added += queue.enqueue(chunk)
+        print(f"\nQueue {path}: {added} of {found} link(s) added, {queue.unfinished()} task(s) waiting for workers")
+    finally:
+        queue.close()
+
+
+def _print_queue(queue, manifest=None):
+    """Prints a queue's totals and writes its manifest, if requested."""
+    stats = queue.stats()
+    print(f"Queue {queue.path}: {stats[work_queue.DONE]} done by {stats['workers']} worker(s) "
+          f"({size_probe.format_bytes(stats['bytes'])}), {stats[work_queue.FAILED]} failed, "
+          f"{stats[work_queue.PENDING]} pending, {stats[work_queue.LEASED]} leased")
+    if manifest:
+        with open(manifest, 'w', encoding='utf-8') as f:
+            count = queue.write_manifest(f)
+        print(f"Manifest: {count} record(s) written to {manifest}")
+
+
+def show_queue(args):
+    """Prints the status of ``--queue``."""
+    if not os.path.exists(args.queue):
+        print(f"Error: Queue not found: {args.queue}")
+        return
+    queue = work_queue.WorkQueue(args.queue)
+    try:
+        _print_queue(queue, args.manifest)
+    finally:
+        queue.close()
+
+
+def run_worker(args, session):
+    """
+    Work through ``--queue`` until it is empty.
+    
+    Tasks are claimed one at a time and leased for ``--lease`` seconds; a
+    heartbeat thread renews the leases while the files download. A worker
+    holds at most one lease per download thread: a new task is claimed once
+    the result of an earlier one is printed, which happens in claim order,
+    so a slow file holds back claiming while other workers take the rest. Each result is reported to the queue as soon as the file
+    is settled. While other workers still hold leases the worker waits, in
+    case one of them runs out. On an interrupt its leases are released at
+    once instead of being left to run out.
+    """
+    worker = args.worker_id or work_queue.default_worker_id()
+    queue = work_queue.WorkQueue(args.queue)
+    cache, catalog = _open_stores(args, f"queue:{args.queue}")
+    heartbeat = work_queue.Heartbeat(queue, worker, args.lease,
+                                     on_lost=lambda url: print(f"\nLease lost (another worker may take it): {url}"))
+    poll = min(args.lease / 4, work_queue.POLL_SECONDS)
+    
+    def claimed():
+        while True:
+            pdf = queue.claim(worker, args.lease)
+            if pdf:
+                heartbeat.add(pdf['url'])
+                yield pdf
+            elif queue.unfinished():
+                time.sleep(poll)
+            else:
+                return
+    
+    def on_result(pdf, status, details):
+        heartbeat.discard(pdf['url'])
+        if status == 'failed':
+            queue.fail(pdf['url'], worker, details['error'])
+        else:
+            queue.complete(pdf['url'], worker, status, **details)
+    
+    print(f"Worker {worker}: {queue.unfinished()} unfinished task(s) in {args.queue}")
+    try:
+        download_pdfs(claimed(), args.download_dir, **_download_options(args, session, cache, catalog),
+                      on_result=on_result, lookahead=args.workers)
+    except KeyboardInterrupt:
+        print("\nInterrupted.")
+    finally:
+        heartbeat.stop()
+        released = queue.release(worker)
+        if released:
+            print(f"Released {released} unfinished task(s) back to the queue")
+        _print_queue(queue, args.manifest)
+        queue.close()
+        if catalog:
+            _close_catalog(catalog)
+    if args.mine:
+        _mine(args, args.download_dir)
+
+
+def run(url, args, session):
+    """Extract (or crawl) and download, as selected on the command line."""
+    
+    cache, catalog = _open_stores(args, url)
+    pool = parse_pool.ParsePool(args.parse_processes) if args.parse_processes else None
+    try:
+        download_dir = _harvest(url, args, session, cache, catalog, pool)
+    finally:
+        if pool:
+            pool.close()
+        if catalog:
+            _close_catalog(catalog)
+    if download_dir and args.mine:
+        _mine(args, download_dir)
+
+
+def _harvest(url, args, session, cache, catalog, pool):
+    """
+    Extracts (or crawls) the links, records them in the catalog and downloads them.
+    
+    Returns:
+        str: The directory downloaded into, or None if nothing was downloaded
+    """
+    
+    download_options = _download_options(args, session, cache, catalog)
+    
+    # Pipeline mode: start downloading as soon as the first links are parsed.
+    # The links are produced from within the download loop, so their work is
+    # attributed to fetch and parse rather than download
+    if args.pipeline:
+        if args.crawl:
+            links = profiling.iterate('fetch', crawler.iter_crawl(
+                url, session=session, cache=cache, max_depth=args.max_depth, max_pages=args.max_pages,
+                workers=args.crawl_workers, parser=args.parser, pool=pool))
+        else:
+            # Parsed incrementally as the page streams in, so not in the parse pool
+            links = profiling.iterate('parse', iter_pdf_links(url, session=session, cache=cache,
+                                                              parser=args.parser))
+        if catalog:
+            links = catalog.observe(links, url)
+        if args.queue:
+            enqueue_links(links, args.queue)
+            return None
+        download_pdfs(links, args.download_dir, **download_options)
+        return args.download_dir
+    
     # Extract PDF links
-    pdf_links = extract_pdf_links(url)
+    if args.crawl:
+        pdf_links = crawler.crawl(url, session=session, cache=cache, max_depth=args.max_depth,
+                                  max_pages=args.max_pages, workers=args.crawl_workers, parser=args.parser,
+                                  pool=pool)
+    else:
+        pdf_links = extract_pdf_links(url, session=session, cache=cache, parser=args.parser, pool=pool)
+    
+    if args.metadata and pdf_links:
+        read_metadata(pdf_links, session, args.probe_workers, _local_copy(args, catalog))
     
     # Display results
     display_pdf_links(pdf_links)
     
+    if catalog and pdf_links:
+        new = catalog.record_links(pdf_links, url)
+        print(f"Catalog: {new} new link(s), {len(pdf_links) - new} seen by earlier runs")
+    
     if not pdf_links:
-        return
+        return None
+    
+    if args.queue:
+        enqueue_links(pdf_links, args.queue)
+        return None
     
     # Ask if user wants to save links to file
     save_choice = input("\nDo you want to save these links to a file? (y/n): ").strip().lower()
@@ -222,10 +1311,112 @@ def main():
     # Ask if user wants to download the PDFs
     download_choice = input("\nDo you want to download all PDF files? (y/n): ").strip().lower()
     if download_choice == 'y':
-        download_dir = input("Enter download directory (default: downloaded_pdfs): ").strip()
+        download_dir = input(f"Enter download directory (default: {args.download_dir}): ").strip()
         if not download_dir:
-            download_dir = 'downloaded_pdfs'
-        download_pdfs(pdf_links, download_dir)
+            download_dir = args.download_dir
+        download_pdfs(pdf_links, download_dir, **download_options)
+        return download_dir
+    return None
+
+
+
+def run_batch(args, session, records):
+    """
+    Harvest every seed of ``--seeds`` without prompting.
+    
+    Seeds are scanned (or crawled) in parallel and each seed's links are
+    written to ``records`` as soon as it finishes. With ``--download`` the
+    links of all seeds feed one download run as they arrive, each file
+    downloaded once however many seeds link to it.
+    
+    Args:
+        args (argparse.Namespace): Parsed command line
+        session (requests.Session): Session shared by all seeds
+        records (file): Stream for the records when ``--output`` is '-'
+        
+    Returns:
+        int: Exit code (see ``batch.exit_code``)
+    """
+    try:
+        seeds = batch.read_seeds(args.seeds)
+    except OSError as e:
+        print(f"Error reading seeds: {e}")
+        return batch.EXIT_USAGE
+    if not seeds:
+        print("Error: No seed URLs provided.")
+        return batch.EXIT_USAGE
+    
+    cache, catalog = _open_stores(args, f"batch:{args.seeds}")
+    pool = parse_pool.ParsePool(args.parse_processes) if args.parse_processes else None
+    out = records if args.output == '-' else open(args.output, 'w', encoding='utf-8', newline='')
+    report = open(args.report, 'w', encoding='utf-8') if args.report else None
+    writer = batch.RecordWriter(out, batch.format_for(args.output, args.format), metadata=args.metadata)
+    local_path = _local_copy(args, catalog)
+    failed_seeds = []
+    
+    def harvest(seed):
+        if not args.crawl:
+            links = fetch_pdf_links(seed, session, cache, args.parser, pool)
+        else:
+            errors = {}
+            links = crawler.crawl(seed, session=session, cache=cache, max_depth=args.max_depth,
+                                  max_pages=args.max_pages, workers=args.crawl_workers, parser=args.parser,
+                                  on_error=errors.setdefault, pool=pool)
+            # Pages further in may fail; the seed itself failing fails the seed
+            seed_error = errors.get(crawler.canonicalize_url(seed))
+            if seed_error:
+                raise seed_error
+        if args.metadata:
+            pdf_metadata.probe_metadata(links, session, workers=args.probe_workers, local_path=local_path)
+        return links
+    
+    def iter_links():
+        seen = set()
+        for done, (seed, links, error) in enumerate(batch.harvest_seeds(seeds, harvest, args.seed_workers), 1):
+            if error:
+                failed_seeds.append(seed)
+                print(f"[seed {done}/{len(seeds)}] {seed} - Error: {error}")
+            else:
+                print(f"[seed {done}/{len(seeds)}] {seed} - {len(links)} PDF link(s)")
+                if catalog:
+                    catalog.record_links(links, seed)
+                for pdf in links:
+                    writer.write(seed, pdf)
+            if report:
+                report.write(json.dumps({'seed': seed, 'status': 'failed' if error else 'ok',
+                                         'links': len(links) if links else 0, 'error': error}) + '\n')
+                report.flush()
+            if links:
+                yield from batch.unique_links(links, seen)
+    
+    download_failures = 0
+    try:
+        if args.download:
+            _, download_failures = download_pdfs(iter_links(), args.download_dir,
+                                                 **_download_options(args, session, cache, catalog))
+        elif args.queue:
+            enqueue_links(iter_links(), args.queue)
+        else:
+            for _ in iter_links():
+                pass
+    except KeyboardInterrupt:
+        print("\nInterrupted.")
+        return batch.EXIT_INTERRUPTED
+    finally:
+        if out is not records:
+            out.close()
+        if report:
+            report.close()
+        if pool:
+            pool.close()
+        if catalog:
+            _close_catalog(catalog)
+    
+    print(f"Batch: {len(seeds)} seed(s), {len(failed_seeds)} failed, {writer.count} link record(s) written"
+          + (f", {download_failures} download(s) failed" if args.download else ""))
+    if args.download and args.mine:
+        _mine(args, args.download_dir)
+    return batch.exit_code(len(failed_seeds), len(seeds), download_failures)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,665 @@
+"""
+DocuMine - PDF Metadata Probing
+Reads page count, title, author, producer and dates of a PDF without
+downloading it: only the trailer, the cross-reference entries and the few
+objects that hold the metadata are fetched, with small HTTP Range requests.
+A typical file costs two to four requests and a few KB, however large it is.
+
+Servers that ignore Range get a full download as a fallback. Files already
+on disk are read through a memory map, so only the pages of the file that
+are looked at are read from disk.
+"""
+
+import collections
+import mmap
+import re
+import tempfile
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import http_client
+import pdf_text
+import pdf_validation
+import throttle
+
+DEFAULT_WORKERS = 8
+# Probes are cheap; don't spend long retrying them
+RETRIES = 1
+# The trailer and startxref are read from this many bytes at the end of the file
+TAIL_BYTES = 4096
+# Ranged reads are rounded out to blocks of this size and cached
+BLOCK_SIZE = 4096
+# An object is given up on beyond this size (metadata objects are small)
+MAX_OBJECT_BYTES = 256 * 1024
+# Cross-reference sections followed through /Prev, at most
+MAX_SECTIONS = 32
+
+# Metadata fields, in the order they are shown
+FIELDS = ('pages', 'title', 'author', 'producer', 'created')
+_INFO_KEYS = {'title': 'Title', 'author': 'Author', 'subject': 'Subject', 'creator': 'Creator',
+              'producer': 'Producer', 'created': 'CreationDate', 'modified': 'ModDate'}
+_DATES = ('created', 'modified')
+
+Ref = collections.namedtuple('Ref', 'number generation')
+
+
+class Name(str):
+    """A PDF name such as /Type, without the slash."""
+
+
+class Truncated(ValueError):
+    """The bytes read end in the middle of an object."""
+
+
+# --- Object parser ---
+
+_WHITESPACE = b' \t\r\n\x0c\x00'
+_DELIMITERS = b'()<>[]{}/%'
+_REF_AT = re.compile(rb'(\d+)\s+(\d+)\s+R(?![A-Za-z])')
+_NUMBER_AT = re.compile(rb'[-+]?(\d+\.?\d*|\.\d+)')
+_OBJ_HEADER = re.compile(rb'\s*(\d+)\s+(\d+)\s+obj\b')
+_STARTXREF = re.compile(rb'startxref\s+(\d+)')
+
+
+def _skip(data, i):
+    """Skips whitespace and comments."""
+    while i < len(data):
+        if data[i] in _WHITESPACE:
+            i += 1
+        elif data[i] == 0x25:  # %
+            while i < len(data) and data[i] not in b'\r\n':
+                i += 1
+        else:
+            return i
+    raise Truncated("Unexpected end of data")
+
+
+def _token(data, i):
+    end = i
+    while end < len(data) and data[end] not in _WHITESPACE and data[end] not in _DELIMITERS:
+        end += 1
+    if end == len(data):
+        raise Truncated("Unexpected end of data")
+    return data[i:end], end
+
+
+def parse_object(data, i=0):
+    """
+    Parse one PDF object.
+
+    Dictionaries become dicts keyed by name, arrays lists, names ``Name``,
+    strings undecoded bytes and indirect references ``Ref``.
+
+    Args:
+        data (bytes): PDF bytes
+        i (int): Offset of the object
+
+    Returns:
+        tuple: (value, offset after it)
+
+    Raises:
+        Truncated: ``data`` ends inside the object
+        ValueError: The bytes are not a PDF object
+    """
+    i = _skip(data, i)
+    if data.startswith(b'<<', i):
+        value = {}
+        i += 2
+        while True:
+            i = _skip(data, i)
+            if data.startswith(b'>>', i):
+                return value, i + 2
+            key, i = parse_object(data, i)
+            if not isinstance(key, Name):
+                raise ValueError("Dictionary key is not a name")
+            value[key], i = parse_object(data, i)
+    c = data[i:i + 1]
+    if c == b'[':
+        value = []
+        i += 1
+        while True:
+            i = _skip(data, i)
+            if data[i:i + 1] == b']':
+                return value, i + 1
+            item, i = parse_object(data, i)
+            value.append(item)
+    if c == b'(':
+        raw, end = pdf_text.read_literal_string(data, i)
+        if end > len(data) or data[end - 1:end] != b')':
+            raise Truncated("Unexpected end of data")
+        return raw, end
+    if c == b'<':
+        end = data.find(b'>', i)
+        if end < 0:
+            raise Truncated("Unexpected end of data")
+        digits = re.sub(rb'[^0-9A-Fa-f]', b'', data[i + 1:end])
+        if len(digits) % 2:
+            digits += b'0'
+        return bytes.fromhex(digits.decode('ascii')), end + 1
+    if c == b'/':
+        token, end = _token(data, i + 1)
+        # #xx escapes stand for any byte in a name
+        name = re.sub(rb'#([0-9A-Fa-f]{2})', lambda m: bytes([int(m.group(1), 16)]), token)
+        return Name(name.decode('latin-1')), end
+    ref = _REF_AT.match(data, i)
+    if ref:
+        return Ref(int(ref.group(1)), int(ref.group(2))), ref.end()
+    number = _NUMBER_AT.match(data, i)
+    if number:
+        if number.end() == len(data):
+            raise Truncated("Unexpected end of data")
+        text = number.group(0)
+        return (float(text) if b'.' in text else int(text)), number.end()
+    token, end = _token(data, i)
+    keywords = {b'true': True, b'false': False, b'null': None}
+    if token in keywords:
+        return keywords[token], end
+    raise ValueError(f"Unexpected token {token[:20]!r}")
+
+
+# --- Sources ---
+
+class MmapSource:
+    """
+    A PDF on disk, read through a memory map.
+
+    Args:
+        path (str): The file
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError("Empty file")
+        self.size = len(self._map)
+        self.bytes_read = 0
+        self.requests = 0
+        self.full_fetch = False
+
+    def read(self, offset, length):
+        """Returns up to ``length`` bytes at ``offset``."""
+        return self._map[max(0, offset):max(0, offset) + length]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class RangeSource:
+    """
+    A remote PDF, read with HTTP Range requests.
+
+    Reads are rounded out to ``BLOCK_SIZE`` and every block fetched is kept,
+    so the parser can re-read freely. A server that answers a Range request
+    with the whole file is read once, spooled to a temporary file and
+    memory-mapped.
+
+    Args:
+        session (requests.Session): Session to fetch with
+        url (str): The PDF URL
+        timeout (tuple): Request timeout
+    """
+
+    def __init__(self, session, url, timeout=http_client.PAGE_TIMEOUT):
+        self.session = session
+        self.url = url
+        self.timeout = timeout
+        self.size = None
+        self.bytes_read = 0
+        self.requests = 0
+        self.full_fetch = False
+        self._blocks = {}
+        self._spool = None
+        self._local = None
+        tail = self._fetch(f"bytes=-{TAIL_BYTES}")
+        if self._local is None:
+            if self.size is None:
+                raise ValueError("Server did not report the file size")
+            self._tail = (self.size - len(tail), tail)
+
+    def _fetch(self, byte_range):
+        """Sends one Range request; returns the partial content, or None after a full fetch."""
+        self.requests += 1
+        with self.session.get(self.url, headers={'Range': byte_range}, timeout=self.timeout,
+                              stream=True) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                self._spool_full(response)
+                return None
+            total = response.headers.get('Content-Range', '').rpartition('/')[2]
+            if total.isdigit():
+                self.size = int(total)
+            content = response.content
+        self.bytes_read += len(content)
+        return content
+
+    def _spool_full(self, response):
+        """Falls back to the whole body when the server ignores Range."""
+        first = b''
+        self._spool = tempfile.TemporaryFile(prefix="documine_meta_")
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            if not first:
+                first = chunk
+                if not pdf_validation.is_pdf_response(response.headers.get('Content-Type', ''), first):
+                    raise pdf_validation.NotPdfError(response.headers.get('Content-Type', ''))
+            self._spool.write(chunk)
+            self.bytes_read += len(chunk)
+        self._spool.flush()
+        self.full_fetch = True
+        self._local = mmap.mmap(self._spool.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = len(self._local)
+
+    def read(self, offset, length):
+        """Returns up to ``length`` bytes at ``offset``, fetching missing blocks in one request."""
+        offset = max(0, offset)
+        end = min(offset + length, self.size)
+        if self._local is not None:
+            return self._local[offset:end]
+        if offset >= end:
+            return b''
+        tail_start, tail = self._tail
+        if offset >= tail_start:
+            # Already read with the trailer
+            return tail[offset - tail_start:end - tail_start]
+        first, last = offset // BLOCK_SIZE, (end - 1) // BLOCK_SIZE
+        missing = [block for block in range(first, last + 1) if block not in self._blocks]
+        if missing:
+            start = missing[0] * BLOCK_SIZE
+            content = self._fetch(f"bytes={start}-{min((missing[-1] + 1) * BLOCK_SIZE, self.size) - 1}")
+            if content is None:
+                return self._local[offset:end]
+            for k in range(0, len(content), BLOCK_SIZE):
+                self._blocks[(start + k) // BLOCK_SIZE] = content[k:k + BLOCK_SIZE]
+        data = b''.join(self._blocks.get(block, b'') for block in range(first, last + 1))
+        return data[offset - first * BLOCK_SIZE:end - first * BLOCK_SIZE]
+
+    def close(self):
+        if self._local is not None:
+            self._local.close()
+        if self._spool is not None:
+            self._spool.close()
+
+
+# --- Document structure ---
+
+def _png_unpredict(data, columns):
+    """Reverses the PNG row predictors used by cross-reference streams."""
+    rows = []
+    previous = bytearray(columns)
+    for k in range(0, len(data), columns + 1):
+        kind, row = data[k], bytearray(data[k + 1:k + 1 + columns])
+        for x in range(len(row)):
+            left = row[x - 1] if x else 0
+            up = previous[x]
+            if kind == 1:
+                row[x] = (row[x] + left) & 0xFF
+            elif kind == 2:
+                row[x] = (row[x] + up) & 0xFF
+            elif kind == 3:
+                row[x] = (row[x] + (left + up) // 2) & 0xFF
+            elif kind == 4:
+                upper_left = previous[x - 1] if x else 0
+                p = left + up - upper_left
+                pa, pb, pc = abs(p - left), abs(p - up), abs(p - upper_left)
+                row[x] = (row[x] + (left if pa <= pb and pa <= pc else up if pb <= pc else upper_left)) & 0xFF
+        rows.append(bytes(row))
+        previous = row
+    return b''.join(rows)
+
+
+def _decode(stream_dict, data):
+    """Decodes a Flate (or unfiltered) stream."""
+    filters = stream_dict.get('Filter')
+    filters = filters if isinstance(filters, list) else [filters] if filters else []
+    if any(name not in ('FlateDecode', 'Fl') for name in filters):
+        raise ValueError(f"Unsupported stream filter {filters}")
+    if filters:
+        try:
+            data = zlib.decompressobj().decompress(data)
+        except zlib.error as e:
+            raise ValueError(f"Corrupt stream: {e}")
+    params = stream_dict.get('DecodeParms') or {}
+    if isinstance(params, list):
+        params = params[0] or {}
+    if params.get('Predictor', 1) >= 10:
+        data = _png_unpredict(data, params.get('Columns', 1))
+    return data
+
+
+class _Document:
+    """Looks up objects through the cross-reference sections of a source."""
+
+    def __init__(self, source):
+        self.source = source
+        self.trailer = {}
+        # Object number -> (1, offset) or (2, object stream number, index), newest first
+        self._entries = {}
+        # Classic sections are read lazily: (first number, count, offset of first entry, entry length)
+        self._subsections = []
+        self._object_streams = {}
+        self._read_sections()
+
+    def _read_sections(self):
+        tail = self.source.read(self.source.size - TAIL_BYTES, TAIL_BYTES)
+        found = _STARTXREF.findall(tail)
+        if not found:
+            raise ValueError("No startxref (truncated or not a PDF)")
+        pending = [int(found[-1])]
+        seen = set()
+        while pending and len(seen) < MAX_SECTIONS:
+            offset = pending.pop(0)
+            if offset in seen or not 0 <= offset < self.source.size:
+                continue
+            seen.add(offset)
+            trailer = self._read_section(offset)
+            for key, value in trailer.items():
+                self.trailer.setdefault(key, value)
+            # A hybrid file lists its compressed objects in /XRefStm
+            for key in ('XRefStm', 'Prev'):
+                if isinstance(trailer.get(key), int):
+                    pending.append(trailer[key])
+
+    def _read_section(self, offset):
+        head = self.source.read(offset, BLOCK_SIZE)
+        if head.lstrip().startswith(b'xref'):
+            return self._read_table(offset + head.index(b'xref') + 4)
+        stream_dict, data = self._read_stream_at(offset)
+        if stream_dict.get('Type') != 'XRef':
+            raise ValueError("startxref does not point at a cross-reference section")
+        self._read_xref_stream(stream_dict, data)
+        return stream_dict
+
+    def _read_table(self, offset):
+        """Reads the subsection headers of a classic xref table; the entries are read on lookup."""
+        while True:
+            chunk = self.source.read(offset, 64)
+            start = _skip(chunk, 0)
+            if chunk.startswith(b'trailer', start):
+                trailer, _ = self._read_value(offset + start + len(b'trailer'))
+                return trailer
+            header = re.match(rb'(\d+)\s+(\d+)[ \t]*(\r\n|\r|\n)', chunk[start:])
+            if not header:
+                raise ValueError("Malformed xref table")
+            first, count = int(header.group(1)), int(header.group(2))
+            entries = offset + start + header.end()
+            # Entries should be 20 bytes, but some writers end them with a bare newline
+            sample = self.source.read(entries, 21)
+            length = 20 if re.match(rb'\d{10} \d{5} [fn](\r\n| \r| \n)', sample) else 19
+            self._subsections.append((first, count, entries, length))
+            offset = entries + count * length
+
+    def _read_xref_stream(self, stream_dict, data):
+        widths = stream_dict.get('W', [1, 2, 1])
+        index = stream_dict.get('Index', [0, stream_dict.get('Size', 0)])
+        row = sum(widths)
+        position = 0
+
+        def field(value, width, default):
+            return int.from_bytes(value, 'big') if width else default
+
+        for first, count in zip(index[0::2], index[1::2]):
+            for number in range(first, first + count):
+                entry = data[position:position + row]
+                position += row
+                if len(entry) < row:
+                    return
+                a = widths[0]
+                b = a + widths[1]
+                kind = field(entry[:a], widths[0], 1)
+                second, third = field(entry[a:b], widths[1], 0), field(entry[b:], widths[2], 0)
+                if number in self._entries:
+                    continue
+                if kind == 1:
+                    self._entries[number] = (1, second)
+                elif kind == 2:
+                    self._entries[number] = (2, second, third)
+                else:
+                    self._entries[number] = None
+
+    def _lookup(self, number):
+        if number in self._entries:
+            return self._entries[number]
+        for first, count, entries, length in self._subsections:
+            if first <= number < first + count:
+                entry = self.source.read(entries + (number - first) * length, length)
+                match = re.match(rb'(\d{10}) (\d{5}) ([fn])', entry)
+                if match:
+                    location = (1, int(match.group(1))) if match.group(3) == b'n' else None
+                    self._entries[number] = location
+                    return location
+        return None
+
+    def _read_value(self, offset):
+        """Parses the object at ``offset``, reading more of the file until it is complete."""
+        length = BLOCK_SIZE
+        while True:
+            data = self.source.read(offset, length)
+            try:
+                return parse_object(data)
+            except Truncated:
+                if length >= MAX_OBJECT_BYTES or offset + len(data) >= self.source.size:
+                    raise ValueError("Object too large or truncated")
+                length *= 4
+
+    def _read_stream_at(self, offset):
+        """Reads the indirect stream object at ``offset``; returns (dictionary, decoded data)."""
+        head = self.source.read(offset, BLOCK_SIZE)
+        header = _OBJ_HEADER.match(head)
+        if not header:
+            raise ValueError("No object at the cross-reference offset")
+        start = offset + header.end()
+        stream_dict, end = self._read_value(start)
+        keyword = self.source.read(start + end, 64)
+        match = re.match(rb'\s*stream(\r\n|\n|\r)', keyword)
+        if not isinstance(stream_dict, dict) or not match:
+            raise ValueError("Object is not a stream")
+        length = self.resolve(stream_dict.get('Length'))
+        if not isinstance(length, int):
+            raise ValueError("Stream has no usable /Length")
+        data = self.source.read(start + end + match.end(), length)
+        return stream_dict, _decode(stream_dict, data)
+
+    def _object_stream(self, number):
+        if number not in self._object_streams:
+            location = self._lookup(number)
+            if not location or location[0] != 1:
+                raise ValueError(f"Object stream {number} not found")
+            stream_dict, data = self._read_stream_at(location[1])
+            first = stream_dict.get('First', 0)
+            header = data[:first].split()
+            offsets = [int(value) for value in header[1::2]]
+            self._object_streams[number] = (data, first, offsets)
+        return self._object_streams[number]
+
+    def get(self, number):
+        """Returns the value of an indirect object, or None if it does not exist."""
+        location = self._lookup(number)
+        if location is None:
+            return None
+        if location[0] == 2:
+            data, first, offsets = self._object_stream(location[1])
+            if location[2] >= len(offsets):
+                return None
+            return parse_object(data + b' ', first + offsets[location[2]])[0]
+        head = self.source.read(location[1], 64)
+        header = _OBJ_HEADER.match(head)
+        if not header:
+            return None
+        return self._read_value(location[1] + header.end())[0]
+
+    def resolve(self, value, depth=0):
+        """Follows indirect references."""
+        while isinstance(value, Ref) and depth < 8:
+            value = self.get(value.number)
+            depth += 1
+        return value
+
+
+def format_date(raw):
+    """Turns a PDF date (D:20240131123000+01'00') into '2024-01-31 12:30:00', or returns it unchanged."""
+    match = re.match(r"(?:D:)?(\d{4})(\d{2})?(\d{2})?(\d{2})?(\d{2})?(\d{2})?", raw)
+    if not match:
+        return raw
+    year, month, day, hour, minute, second = match.groups()
+    date = f"{year}-{month or '01'}-{day or '01'}"
+    if hour:
+        date += f" {hour}:{minute or '00'}:{second or '00'}"
+    return date
+
+
+def read_metadata(source):
+    """
+    Read the metadata of a PDF from a source (``MmapSource`` or ``RangeSource``).
+
+    Returns:
+        dict: ``pages`` (int or None), ``title``, ``author``, ``subject``,
+            ``creator``, ``producer``, ``created``, ``modified`` (str or None)
+            and ``encrypted``; strings of an encrypted file are not readable
+            and left None
+
+    Raises:
+        ValueError: The file is not a PDF, or its structure can't be read
+    """
+    document = _Document(source)
+    metadata = dict.fromkeys(_INFO_KEYS)
+    metadata['pages'] = None
+    metadata['encrypted'] = 'Encrypt' in document.trailer
+
+    try:
+        root = document.resolve(document.trailer.get('Root'))
+        pages = document.resolve(root.get('Pages')) if isinstance(root, dict) else None
+        if isinstance(pages, dict):
+            count = document.resolve(pages.get('Count'))
+            metadata['pages'] = count if isinstance(count, int) else None
+    except ValueError:
+        # Object streams of an encrypted file are encrypted too
+        if not metadata['encrypted']:
+            raise
+
+    info = document.resolve(document.trailer.get('Info'))
+    if isinstance(info, dict) and not metadata['encrypted']:
+        for field, key in _INFO_KEYS.items():
+            value = document.resolve(info.get(key))
+            if isinstance(value, bytes):
+                text = pdf_text.normalize_text(pdf_text.decode_text_string(value))
+                metadata[field] = (format_date(text) if field in _DATES else text) or None
+    return metadata
+
+
+def file_metadata(path):
+    """
+    Read the metadata of a PDF on disk through a memory map.
+
+    Returns:
+        dict: See ``read_metadata``
+    """
+    source = MmapSource(path)
+    try:
+        return read_metadata(source)
+    finally:
+        source.close()
+
+
+def fetch_metadata(session, url, timeout=http_client.PAGE_TIMEOUT):
+    """
+    Read the metadata of a remote PDF with Range requests.
+
+    Args:
+        session (requests.Session): Session to fetch with
+        url (str): The PDF URL
+        timeout (tuple): Request timeout
+
+    Returns:
+        dict: See ``read_metadata``, plus ``size``, ``requests``,
+            ``bytes_read`` and ``full_fetch`` (True when the server ignored
+            Range and the whole file was downloaded)
+
+    Raises:
+        requests.RequestException: A request failed
+        ValueError: The file is not a PDF, or its structure can't be read
+    """
+    source = RangeSource(session, url, timeout)
+    try:
+        metadata = read_metadata(source)
+    finally:
+        source.close()
+    metadata.update(size=source.size, requests=source.requests, bytes_read=source.bytes_read,
+                    full_fetch=source.full_fetch)
+    return metadata
+
+
+def probe_metadata(pdf_links, session=None, workers=DEFAULT_WORKERS, limits=None, on_progress=None,
+                   local_path=None, should_stop=None):
+    """
+    Read the metadata of many PDFs concurrently.
+
+    Each link dict gets a ``metadata`` key: the dict described in
+    ``read_metadata``, or ``{'error': message}``.
+
+    Args:
+        pdf_links (list): List of dictionaries containing PDF information
+        session (requests.Session): Session to fetch with (default: shared session)
+        workers (int): Number of files read at once
+        limits (throttle.HostLimits): Optional per-host concurrency limits
+        on_progress (callable): Called as ``on_progress(done, total)`` after
+            each file
+        local_path (callable): Returns the path of a link's downloaded copy,
+            or None; downloaded copies are read from disk instead
+        should_stop (callable): Polled before each file; once it returns
+            True no more requests are sent and the remaining links get no
+            ``metadata`` key
+
+    Returns:
+        dict: Files read remotely, from disk and failed, plus the bytes
+            transferred
+    """
+    session = session or http_client.get_session()
+    retry = throttle.RetryPolicy(retries=RETRIES)
+    totals = {'remote': 0, 'local': 0, 'failed': 0, 'bytes': 0}
+    total = len(pdf_links)
+    done = [0]
+    lock = threading.Lock()
+
+    def probe(pdf):
+        if should_stop and should_stop():
+            return
+        path = local_path(pdf) if local_path else None
+        try:
+            if path:
+                pdf['metadata'] = file_metadata(path)
+            else:
+                pdf['metadata'] = throttle.call_with_retries(
+                    pdf['url'], lambda: fetch_metadata(session, pdf['url']), retry, limits)
+            kind = 'local' if path else 'remote'
+        except Exception as e:
+            pdf['metadata'] = {'error': str(e) or type(e).__name__}
+            kind = 'failed'
+        with lock:
+            totals[kind] += 1
+            totals['bytes'] += pdf['metadata'].get('bytes_read', 0)
+            done[0] += 1
+            if on_progress:
+                on_progress(done[0], total)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        list(executor.map(probe, pdf_links))
+    return totals
+
+
+def describe(metadata):
+    """Returns e.g. '12 pages | Annual Report | Acrobat Distiller 9.0 | 2024-01-31', or why it is unavailable."""
+    if not metadata:
+        return ''
+    if metadata.get('error'):
+        return f"unavailable ({metadata['error']})"
+    parts = []
+    if metadata.get('pages') is not None:
+        parts.append(f"{metadata['pages']} page{'s' if metadata['pages'] != 1 else ''}")
+    parts.extend(metadata[field] for field in ('title', 'author', 'producer', 'created') if metadata.get(field))
+    if metadata.get('encrypted'):
+        parts.append("encrypted")
+    return ' | '.join(parts)
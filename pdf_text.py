@@ -0,0 +1,281 @@
+"""
+DocuMine - PDF Text Extraction
+Extracts the text of each page of a PDF for the search index.
+
+Two backends:
+
+- ``pypdf``: pypdf's extractor, when pypdf is installed (pip install pypdf).
+  Handles font encodings and CID fonts; use it for real-world collections.
+- ``basic``: a small built-in extractor. It walks the page tree (including
+  compressed object streams), inflates Flate content streams and collects
+  the strings shown by the text operators. Fonts with custom encodings or
+  2-byte glyph ids come out as little or no text.
+"""
+
+import re
+import zlib
+
+import pdf_validation
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+BACKENDS = ('pypdf', 'basic')
+
+_OBJECT = re.compile(rb'(\d+)\s+\d+\s+obj\b(.*?)\bendobj', re.S)
+_STREAM = re.compile(rb'\bstream\r?\n(.*?)\r?\n?endstream', re.S)
+_REF = re.compile(rb'(\d+)\s+\d+\s+R')
+_WHITESPACE = b' \t\r\n\x0c\x00'
+_DELIMITERS = b'()<>[]{}/%'
+_NUMBER = re.compile(rb'[-+]?(\d+\.?\d*|\.\d+)')
+_ESCAPES = {ord('n'): b'\n', ord('r'): b'\r', ord('t'): b'\t', ord('b'): b'\b', ord('f'): b'\f'}
+
+# Operators that move to a new line of text
+_NEWLINE_OPS = {b'T*', b'Td', b'TD', b'Tm', b'ET', b"'", b'"'}
+# In a TJ array, a kerning adjustment beyond this (thousandths of an em)
+# is a gap between words
+_TJ_SPACE = 200
+
+
+def default_backend():
+    """Returns 'pypdf' when it is installed, otherwise 'basic'."""
+    return 'pypdf' if pypdf is not None else 'basic'
+
+
+def normalize_text(text):
+    """Collapses runs of spaces and blank lines."""
+    lines = (' '.join(line.split()) for line in text.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def _pages_pypdf(path):
+    if pypdf is None:
+        raise ValueError("The pypdf backend needs pypdf installed (pip install pypdf)")
+    reader = pypdf.PdfReader(path)
+    return [normalize_text(page.extract_text() or '') for page in reader.pages]
+
+
+# --- Built-in extractor ---
+
+def _dict_value(body, key):
+    """Returns the raw value after ``/key`` in a dictionary, up to the next key."""
+    match = re.search(rb'/' + key + rb'(?![A-Za-z0-9])\s*(\[[^\]]*\]|\d+\s+\d+\s+R|/[A-Za-z0-9]+|\d+)', body)
+    return match.group(1) if match else None
+
+
+def _decode_stream(body, data):
+    """Inflates a stream; returns None for filters other than FlateDecode."""
+    header = body.split(b'stream', 1)[0]
+    filters = re.findall(rb'/(\w+Decode|Fl)\b', header)
+    if not filters:
+        return data
+    if any(name not in (b'FlateDecode', b'Fl') for name in filters):
+        return None
+    try:
+        return zlib.decompressobj().decompress(data)
+    except zlib.error:
+        return None
+
+
+def _load_objects(content):
+    """
+    Map object numbers to ``(dictionary bytes, decoded stream or None)``.
+
+    Objects packed into object streams (PDF 1.5+) are unpacked too.
+    """
+    objects = {}
+    for match in _OBJECT.finditer(content):
+        number, body = int(match.group(1)), match.group(2)
+        stream = _STREAM.search(body)
+        data = _decode_stream(body, stream.group(1)) if stream else None
+        objects[number] = (body.split(b'stream', 1)[0] if stream else body, data)
+
+    for body, data in list(objects.values()):
+        if data is None or not re.search(rb'/Type\s*/ObjStm\b', body):
+            continue
+        count, first = _dict_value(body, b'N'), _dict_value(body, b'First')
+        if not (count and first and count.isdigit() and first.isdigit()):
+            continue
+        header = data[:int(first)].split()
+        offsets = [(int(header[i]), int(header[i + 1])) for i in range(0, min(len(header), 2 * int(count)) - 1, 2)]
+        for i, (number, offset) in enumerate(offsets):
+            end = offsets[i + 1][1] if i + 1 < len(offsets) else len(data) - int(first)
+            objects.setdefault(number, (data[int(first) + offset:int(first) + end], None))
+    return objects
+
+
+def _page_objects(objects):
+    """Returns the page dictionaries' object numbers in page order."""
+    def is_type(number, name):
+        body = objects.get(number, (b'', None))[0]
+        return re.search(rb'/Type\s*/' + name + rb'(?![A-Za-z])', body) is not None
+
+    roots = [number for number in objects if is_type(number, b'Catalog')]
+    pages = []
+    if roots:
+        root_pages = _dict_value(objects[roots[0]][0], b'Pages')
+        stack = [int(_REF.match(root_pages).group(1))] if root_pages and _REF.match(root_pages) else []
+        seen = set()
+        while stack:
+            number = stack.pop()
+            if number in seen or number not in objects:
+                continue
+            seen.add(number)
+            if is_type(number, b'Pages'):
+                kids = _dict_value(objects[number][0], b'Kids') or b''
+                stack.extend(reversed([int(ref) for ref in _REF.findall(kids)]))
+            elif is_type(number, b'Page'):
+                pages.append(number)
+    if not pages:
+        # No usable page tree: take page objects in file order
+        pages = sorted(number for number in objects if is_type(number, b'Page'))
+    return pages
+
+
+def read_literal_string(data, i):
+    """Reads a literal string starting at ``data[i] == '('``; returns (bytes, next index)."""
+    out = bytearray()
+    depth = 1
+    i += 1
+    while i < len(data) and depth:
+        c = data[i]
+        if c == 0x5C:  # backslash
+            i += 1
+            if i >= len(data):
+                break
+            c = data[i]
+            if c in _ESCAPES:
+                out += _ESCAPES[c]
+            elif 0x30 <= c <= 0x37:
+                digits = 0
+                while digits < 3 and i + digits < len(data) and 0x30 <= data[i + digits] <= 0x37:
+                    digits += 1
+                out.append(int(data[i:i + digits], 8) & 0xFF)
+                i += digits - 1
+            elif c in (0x0D, 0x0A):
+                # Line continuation
+                if c == 0x0D and data[i + 1:i + 2] == b'\n':
+                    i += 1
+            else:
+                out.append(c)
+        elif c == 0x28:
+            depth += 1
+            out.append(c)
+        elif c == 0x29:
+            depth -= 1
+            if depth:
+                out.append(c)
+        else:
+            out.append(c)
+        i += 1
+    return bytes(out), i
+
+
+def decode_text_string(raw):
+    """Decodes a PDF text string (UTF-16 or UTF-8 with a byte order mark, else Latin-1)."""
+    if raw.startswith(b'\xfe\xff'):
+        return raw[2:].decode('utf-16-be', errors='ignore')
+    if raw.startswith(b'\xef\xbb\xbf'):
+        return raw[3:].decode('utf-8', errors='ignore')
+    text = raw.decode('latin-1')
+    # Strings of 2-byte glyph ids decode to control characters; drop them
+    return ''.join(ch for ch in text if ch.isprintable() or ch in '\n\t')
+
+
+def _content_text(data):
+    """Collects the text shown by a page content stream."""
+    parts = []
+    # (kind, value) pairs, so a string such as (12) is not taken for a number
+    operands = []
+    i = 0
+    n = len(data)
+    while i < n:
+        c = data[i:i + 1]
+        if c in _WHITESPACE:
+            i += 1
+        elif c == b'%':
+            while i < n and data[i:i + 1] not in (b'\r', b'\n'):
+                i += 1
+        elif c == b'(':
+            raw, i = read_literal_string(data, i)
+            operands.append(('string', raw))
+        elif c == b'<' and data[i + 1:i + 2] != b'<':
+            end = data.find(b'>', i)
+            end = n if end < 0 else end
+            digits = re.sub(rb'[^0-9A-Fa-f]', b'', data[i + 1:end])
+            if len(digits) % 2:
+                digits += b'0'
+            operands.append(('string', bytes.fromhex(digits.decode('ascii'))))
+            i = end + 1
+        elif c in b'<>[]{}':
+            # Dictionary and array brackets carry no text
+            i += 2 if c in b'<>' and data[i + 1:i + 2] == c else 1
+        else:
+            start = i
+            i += 1
+            while i < n and data[i] not in _WHITESPACE and data[i] not in _DELIMITERS:
+                i += 1
+            token = data[start:i]
+            if c == b'/':
+                operands.append(('name', token))
+                continue
+            if _NUMBER.fullmatch(token):
+                operands.append(('number', float(token)))
+                continue
+            # An operator: act on the text ones, then clear the operands
+            if token in _NEWLINE_OPS:
+                parts.append('\n')
+            strings = [value for kind, value in operands if kind == 'string']
+            if token in (b'Tj', b"'", b'"') and strings:
+                parts.append(decode_text_string(strings[-1]))
+            elif token == b'TJ':
+                for kind, value in operands:
+                    if kind == 'string':
+                        parts.append(decode_text_string(value))
+                    elif kind == 'number' and value < -_TJ_SPACE:
+                        parts.append(' ')
+            operands = []
+    return ''.join(parts)
+
+
+def _pages_basic(path):
+    with open(path, 'rb') as f:
+        content = f.read()
+    if pdf_validation.PDF_MAGIC not in content[:pdf_validation.SNIFF_BYTES]:
+        raise ValueError("Not a PDF (no %PDF header)")
+    objects = _load_objects(content)
+    pages = []
+    for number in _page_objects(objects):
+        contents = _dict_value(objects[number][0], b'Contents') or b''
+        refs = [int(ref) for ref in _REF.findall(contents)]
+        # /Contents may point at an array object listing the streams
+        if len(refs) == 1 and objects.get(refs[0], (b'', None))[1] is None:
+            refs = [int(ref) for ref in _REF.findall(objects.get(refs[0], (b'', None))[0])] or refs
+        streams = [objects[ref][1] for ref in refs if ref in objects and objects[ref][1] is not None]
+        pages.append(normalize_text(_content_text(b'\n'.join(streams))))
+    return pages
+
+
+_BACKEND_FUNCS = {
+    'pypdf': _pages_pypdf,
+    'basic': _pages_basic,
+}
+
+
+def extract_pages(path, backend=None):
+    """
+    Extract the text of every page of a PDF.
+
+    Args:
+        path (str): The PDF file
+        backend (str): One of ``BACKENDS`` (default: ``default_backend()``)
+
+    Returns:
+        list: One string per page, in page order
+    """
+    backend = backend or default_backend()
+    if backend not in _BACKEND_FUNCS:
+        raise ValueError(f"Unknown text backend '{backend}' (choose from {', '.join(BACKENDS)})")
+    return _BACKEND_FUNCS[backend](path)
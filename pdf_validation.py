@@ -0,0 +1,106 @@
+"""
+DocuMine - Streaming PDF Validation
+Checks downloads while they stream: a response that is not a PDF (an age
+gate or error page) is rejected from its headers and first bytes before the
+rest is transferred, and a body that ends early is caught before the file is
+kept.
+"""
+
+import throttle
+
+# The %PDF header may be preceded by up to this many bytes of junk
+SNIFF_BYTES = 1024
+# %%EOF must appear within this many bytes of the end
+TAIL_BYTES = 1024
+
+PDF_MAGIC = b'%PDF'
+PDF_EOF = b'%%EOF'
+
+
+class NotPdfError(ValueError):
+    """The response is not a PDF."""
+
+    def __init__(self, content_type):
+        self.content_type = content_type
+        super().__init__(f"Not a PDF (Type: {content_type.lower() or 'unknown'}). Age verification issue?")
+
+
+def is_pdf_response(content_type, first_bytes):
+    """
+    Check whether a response looks like a PDF (and not an age gate HTML page).
+
+    Args:
+        content_type (str): The response Content-Type header
+        first_bytes (bytes): The first bytes of the response body
+
+    Returns:
+        bool: True if the response is a PDF
+    """
+    return 'application/pdf' in content_type.lower() or PDF_MAGIC in first_bytes[:SNIFF_BYTES]
+
+
+def _expected_length(response):
+    """Returns the decoded body length the headers promise, or None."""
+    if response.headers.get('Content-Encoding', 'identity').lower() != 'identity':
+        # iter_content decodes, so the length on the wire says nothing
+        return None
+    length = response.headers.get('Content-Length')
+    if not length or not length.isdigit():
+        return None
+    return int(length)
+
+
+def validated_chunks(response, chunk_size=64 * 1024, offset=0):
+    """
+    Yield a response body while checking that it is a complete PDF.
+
+    The first ``SNIFF_BYTES`` are held back until the body is known to be a
+    PDF, so nothing of an HTML page is handed on. At the end the size must
+    match ``Content-Length``, or, when there is none, the body must end with
+    ``%%EOF``.
+
+    Args:
+        response: A streamed ``requests.Response`` or ``CachedResponse``
+        chunk_size (int): Chunk size for ``iter_content``
+        offset (int): Bytes of the file already on disk when continuing a
+            ranged download; the %PDF check is skipped, since the start of
+            the file was checked when it was downloaded
+
+    Yields:
+        bytes: Body chunks
+
+    Raises:
+        NotPdfError: The body is not a PDF
+        throttle.TruncatedError: The body ended early
+    """
+    content_type = response.headers.get('Content-Type', '')
+    expected = _expected_length(response)
+    head = b'' if not offset else None
+    tail = b''
+    size = 0
+
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        if not chunk:
+            continue
+        size += len(chunk)
+        tail = (tail + chunk)[-TAIL_BYTES:]
+        if head is not None:
+            head += chunk
+            if len(head) < SNIFF_BYTES:
+                continue
+            if not is_pdf_response(content_type, head):
+                raise NotPdfError(content_type)
+            chunk, head = head, None
+        yield chunk
+
+    if head is not None:
+        # The whole body fit in the sniffing window
+        if not is_pdf_response(content_type, head):
+            raise NotPdfError(content_type)
+    if expected is not None:
+        if size != expected:
+            raise throttle.TruncatedError(f"Incomplete download ({size:,} of {expected:,} bytes)")
+    elif PDF_EOF not in tail:
+        raise throttle.TruncatedError(f"Incomplete download (no %%EOF after {size:,} bytes)")
+    if head:
+        yield head
@@ -0,0 +1,156 @@
+"""
+DocuMine - Speculative Prefetch
+Pulls the files of a scanned collection into the artifact store in the
+background while the user is still looking at the list, so a later ZIP build
+or single-file download reads them from local disk instead of the network.
+
+Prefetching is a guess, so it is bounded: it stops at a cap on the bytes
+transferred (stored or not) and a time cap, fetches one file at a time, and
+can be stopped between chunks.
+"""
+
+import os
+import tempfile
+import time
+
+import artifact_store
+import http_client
+import pdf_validation
+import profiling
+
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+DEFAULT_MAX_SECONDS = 300
+CHUNK_SIZE = 64 * 1024
+
+# Why a prefetch run ended
+DONE = 'done'
+BYTE_CAP = 'byte cap'
+TIME_CAP = 'time cap'
+STOPPED = 'stopped'
+
+
+class _Abandoned(Exception):
+    """A file was given up on part-way (cap reached or stop requested)."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def file_key(url, scope=''):
+    """Returns the artifact store key of a prefetched file."""
+    return artifact_store.make_key('pdf', [url], scope)
+
+
+def local_copy(store, url, scope=''):
+    """Returns the path of a prefetched copy of ``url``, or None."""
+    stored = store.get_file(file_key(url, scope))
+    return stored[0] if stored else None
+
+
+def _known_size(pdf):
+    """Returns the size found by a size or metadata probe, or None."""
+    if pdf.get('size') is not None:
+        return pdf['size']
+    return (pdf.get('metadata') or {}).get('size')
+
+
+def _fetch(session, url, totals, max_bytes, deadline, should_stop):
+    """
+    Download one file into a temporary file.
+
+    Every chunk received is added to ``totals['transferred']``, whether or
+    not the file is kept.
+
+    Returns:
+        tuple: (temporary file path, size)
+
+    Raises:
+        _Abandoned: The byte cap or time ran out, or a stop was requested
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix="documine_prefetch_", suffix=".pdf")
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as f, session.get(url, timeout=http_client.DOWNLOAD_TIMEOUT, stream=True) as response:
+            response.raise_for_status()
+            for chunk in pdf_validation.validated_chunks(response, CHUNK_SIZE):
+                size += len(chunk)
+                totals['transferred'] += len(chunk)
+                if totals['transferred'] > max_bytes:
+                    raise _Abandoned(BYTE_CAP)
+                if time.monotonic() >= deadline:
+                    raise _Abandoned(TIME_CAP)
+                if should_stop and should_stop():
+                    raise _Abandoned(STOPPED)
+                f.write(chunk)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, size
+
+
+@profiling.profiled('download')
+def prefetch(pdf_list, session, store, scope='', max_bytes=DEFAULT_MAX_BYTES, max_seconds=DEFAULT_MAX_SECONDS,
+             should_stop=None, on_progress=None):
+    """
+    Fetch files into ``store`` ahead of need, in list order.
+
+    Files already in the store are left alone, files whose probed size is
+    over what is left of the byte cap are skipped, and failures are skipped
+    without retrying. Each stored file's key is ``file_key(url, scope)``.
+
+    The byte cap bounds the traffic of the run, not only what is stored:
+    bytes of files that fail or are abandoned part-way count against it.
+
+    Args:
+        pdf_list (list): List of dictionaries containing PDF information
+        session (requests.Session): Session to fetch with
+        store (artifact_store.ArtifactStore): Where files are kept
+        scope (str): Cookie fingerprint (``http_client.cookie_scope``)
+        max_bytes (int): Stop once this many bytes have been transferred; a
+            file that would go over is abandoned part-way
+        max_seconds (float): Stop after this many seconds
+        should_stop (callable): Polled between chunks; True stops the run
+        on_progress (callable): Called as ``on_progress(done, total, totals)``
+            after each file
+
+    Returns:
+        dict: Files ``fetched``, already ``stored``, ``skipped`` and
+            ``failed``, the ``bytes`` stored, the bytes ``transferred`` and
+            the ``reason`` the run ended
+    """
+    totals = {'fetched': 0, 'stored': 0, 'skipped': 0, 'failed': 0, 'bytes': 0, 'transferred': 0, 'reason': DONE}
+    deadline = time.monotonic() + max_seconds
+    for done, pdf in enumerate(pdf_list, 1):
+        if should_stop and should_stop():
+            totals['reason'] = STOPPED
+            break
+        if time.monotonic() >= deadline:
+            totals['reason'] = TIME_CAP
+            break
+        budget = max_bytes - totals['transferred']
+        if budget <= 0:
+            totals['reason'] = BYTE_CAP
+            break
+
+        key = file_key(pdf['url'], scope)
+        size = _known_size(pdf)
+        if store.get_file(key):
+            totals['stored'] += 1
+        elif size is not None and size > budget:
+            totals['skipped'] += 1
+        else:
+            try:
+                tmp_path, size = _fetch(session, pdf['url'], totals, max_bytes, deadline, should_stop)
+            except _Abandoned as e:
+                totals['reason'] = e.reason
+                break
+            except Exception:
+                totals['failed'] += 1
+            else:
+                store.put_file(key, tmp_path, meta={'url': pdf['url'], 'filename': pdf['filename'], 'size': size})
+                totals['fetched'] += 1
+                totals['bytes'] += size
+        if on_progress:
+            on_progress(done, len(pdf_list), totals)
+    return totals
@@ -0,0 +1,300 @@
+"""
+DocuMine - Phase Profiling
+CPU and memory profiles of each phase of a run (fetch, parse, download,
+archive), so a slow or memory-hungry run can be pinned on one phase instead
+of the whole process.
+
+Code marks its phases with ``phase(name)`` or ``@profiled(name)``, and the
+items of a generator consumed inside another phase with
+``iterate(name, iterable)``; all cost one check when profiling is off. When
+it is on:
+
+- CPU: each thread gets its own ``cProfile`` profiler per phase, switched as
+  the thread enters and leaves phases, so worker threads are profiled too and
+  a parse nested inside a fetch is counted as parse. Profiles are merged per
+  phase into ``<phase>.prof``, loadable with ``pstats`` or any viewer that
+  reads them (``python -m pstats fetch.prof``).
+- Memory: ``tracemalloc`` traces every allocation. While a phase runs alone
+  (no other phase open in any thread), its peak traced memory and the
+  allocation sites that grew most are recorded, and the snapshot taken at
+  its end is saved as ``<phase>.tracemalloc``
+  (``tracemalloc.Snapshot.load``). Phases that only ever run inside or
+  alongside others get no memory figures.
+
+``profile_report.txt`` sums it up with the top functions and allocation
+sites of each phase.
+
+Work done in other processes (parse pools, text mining) is not profiled.
+On Python 3.12 and later only one profiler can run at a time, so threads
+that can't start their own are left out of the CPU profiles.
+"""
+
+import contextlib
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+DEFAULT_TOP = 25
+# Stack depth recorded per allocation
+TRACE_FRAMES = 5
+REPORT_NAME = 'profile_report.txt'
+
+_NO_PHASE = contextlib.nullcontext()
+_profiler = None
+
+
+class _PhaseStats:
+    """What has been recorded about one phase."""
+
+    def __init__(self):
+        self.profiles = []
+        self.windows = 0
+        self.wall = 0.0
+        # Memory of the window with the highest peak
+        self.peak = 0
+        self.growth = None
+        self.snapshot = None
+
+
+class PhaseProfiler:
+    """
+    Collects CPU and memory profiles per phase; see the module docstring.
+
+    Thread-safe.
+
+    Args:
+        directory (str): Where the files are written, created if missing
+        top (int): Functions and allocation sites listed per phase in the
+            report
+        memory (bool): Trace allocations with ``tracemalloc``
+        autosave (bool): Rewrite the files whenever no phase is running,
+            for a server that never stops
+    """
+
+    def __init__(self, directory, top=DEFAULT_TOP, memory=True, autosave=False):
+        self.directory = directory
+        self.top = top
+        self.memory = memory
+        self.autosave = autosave
+        os.makedirs(directory, exist_ok=True)
+        self._phases = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Spans open in all threads, and the window started when there were none
+        self._open = 0
+        self._window = None
+        self._running = set()
+        # Leave tracing alone if something else started it
+        self._tracing = memory and not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start(TRACE_FRAMES)
+
+    def _thread_profile(self, name):
+        """Returns this thread's profiler for a phase, creating it on first use."""
+        profiles = self._local.__dict__.setdefault('profiles', {})
+        if name not in profiles:
+            profiles[name] = cProfile.Profile()
+            self._phases.setdefault(name, _PhaseStats()).profiles.append(profiles[name])
+        return profiles[name]
+
+    def _switch(self, stop, start):
+        """Disables one profiler and enables another; returns the one now running, or None."""
+        if stop is not None:
+            stop.disable()
+            self._running.discard(stop)
+        if start is None:
+            return None
+        try:
+            start.enable()
+        except ValueError:
+            # Another profiler owns the interpreter (Python 3.12+)
+            return None
+        self._running.add(start)
+        return start
+
+    def _open_window(self, name):
+        snapshot = None
+        if self.memory:
+            tracemalloc.reset_peak()
+            snapshot = tracemalloc.take_snapshot()
+        self._window = (name, time.perf_counter(), snapshot)
+
+    def _close_window(self, name):
+        window, self._window = self._window, None
+        if window is None or window[0] != name:
+            # Opened by another phase that overlapped this one
+            return
+        stats = self._phases[name]
+        stats.windows += 1
+        stats.wall += time.perf_counter() - window[1]
+        if self.memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            if stats.snapshot is None or peak >= stats.peak:
+                ignore = (tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__))
+                end = tracemalloc.take_snapshot().filter_traces(ignore)
+                stats.peak = peak
+                stats.growth = end.compare_to(window[2].filter_traces(ignore), 'lineno')[:self.top]
+                stats.snapshot = end
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Attributes the CPU time (and, when running alone, memory) of the block to a phase."""
+        local = self._local
+        stack = local.__dict__.setdefault('stack', [])
+        with self._lock:
+            if not stack or stack[-1] != name:
+                local.running = self._switch(getattr(local, 'running', None), self._thread_profile(name))
+            stack.append(name)
+            if not self._open:
+                self._open_window(name)
+            self._open += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                stack.pop()
+                if not stack or stack[-1] != name:
+                    local.running = self._switch(local.running, self._thread_profile(stack[-1]) if stack else None)
+                self._open -= 1
+                if not self._open:
+                    self._close_window(name)
+                    if self.autosave:
+                        self._write_locked()
+
+    def _write_locked(self):
+        lines = [f"DocuMine profile - {time.strftime('%Y-%m-%d %H:%M:%S')}", '=' * 80,
+                 f"{'Phase':<12}{'Windows':>9}{'Wall (s)':>11}{'Profiled (s)':>14}{'Peak memory':>14}"]
+        details = []
+        for name, stats in sorted(self._phases.items()):
+            profiles = [profile for profile in stats.profiles if profile not in self._running]
+            buffer = io.StringIO()
+            merged = None
+            for profile in profiles:
+                if merged is None:
+                    merged = pstats.Stats(profile, stream=buffer)
+                else:
+                    merged.add(profile)
+            profiled = merged.total_tt if merged else 0.0
+            wall = f"{stats.wall:.2f}" if stats.windows else '-'
+            peak = f"{stats.peak / 1024 / 1024:.1f} MB" if stats.snapshot else '-'
+            lines.append(f"{name:<12}{stats.windows:>9}{wall:>11}{profiled:>14.2f}{peak:>14}")
+
+            details += ['', '=' * 80, f"Phase: {name}"]
+            if merged is not None:
+                prof_path = os.path.join(self.directory, f"{name}.prof")
+                merged.dump_stats(prof_path)
+                details.append(f"CPU profile: {prof_path}")
+                merged.sort_stats('cumulative').print_stats(self.top)
+                details.append(buffer.getvalue().rstrip())
+            if stats.snapshot is not None:
+                snapshot_path = os.path.join(self.directory, f"{name}.tracemalloc")
+                stats.snapshot.dump(snapshot_path)
+                details += [f"Memory snapshot: {snapshot_path}", '',
+                            f"Top {self.top} allocation sites by growth over the phase (peak "
+                            f"{stats.peak / 1024 / 1024:.1f} MB):"]
+                details += [f"  {diff}" for diff in stats.growth]
+
+        lines += ['', "Windows: times the phase ran with no other phase open; wall time and peak memory are",
+                  "measured over those. Profiled: time in the phase summed over all threads, waiting included."]
+        path = os.path.join(self.directory, REPORT_NAME)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines + details) + '\n')
+        return path
+
+    def write(self):
+        """
+        Write the profile files and the report.
+
+        Returns:
+            str: Path of the report
+        """
+        with self._lock:
+            return self._write_locked()
+
+    def close(self):
+        """
+        Write the files and stop tracing allocations.
+
+        Returns:
+            str: Path of the report
+        """
+        path = self.write()
+        if self._tracing:
+            tracemalloc.stop()
+        return path
+
+
+def enable(directory, top=DEFAULT_TOP, memory=True, autosave=False):
+    """
+    Start profiling the phases of this process.
+
+    Takes the same arguments as ``PhaseProfiler``. Calling it again while
+    profiling returns the running profiler.
+
+    Returns:
+        PhaseProfiler: The profiler
+    """
+    global _profiler
+    if _profiler is None:
+        _profiler = PhaseProfiler(directory, top=top, memory=memory, autosave=autosave)
+    return _profiler
+
+
+def disable():
+    """
+    Stop profiling and write the files.
+
+    Returns:
+        str: Path of the report, or None if profiling was off
+    """
+    global _profiler
+    profiler, _profiler = _profiler, None
+    return profiler.close() if profiler else None
+
+
+def phase(name):
+    """Returns a context manager attributing its block to a phase (a no-op unless profiling)."""
+    if _profiler is None:
+        return _NO_PHASE
+    return _profiler.phase(name)
+
+
+def iterate(name, iterable):
+    """
+    Attributes the work of producing each item of an iterable to a phase.
+
+    For generators consumed inside another phase, such as the links of a
+    pipelined run, which are fetched and parsed from within the download
+    loop. Returns ``iterable`` itself unless profiling.
+    """
+    if _profiler is None:
+        return iterable
+    return _iterate(name, iter(iterable))
+
+
+def _iterate(name, iterator):
+    while True:
+        with phase(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def profiled(name):
+    """Decorator attributing every call of a function to a phase (a no-op unless profiling)."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _profiler is None:
+                return fn(*args, **kwargs)
+            with _profiler.phase(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
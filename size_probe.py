@@ -0,0 +1,290 @@
+"""
+DocuMine - Size Probing and Byte Progress
+Learns file sizes ahead of a download run, so progress can be reported in
+bytes with an ETA, the largest files can be started first, and a harvest
+over a total-size budget can be refused before anything is downloaded.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import http_client
+import throttle
+
+DEFAULT_PROBE_WORKERS = 8
+# Probes are cheap; don't spend long retrying them
+PROBE_RETRIES = 1
+# ByteProgress listeners are called at most this often (seconds)
+REPORT_INTERVAL = 0.5
+
+
+class BudgetExceeded(ValueError):
+    """The probed files add up to more than the allowed total size."""
+
+
+def format_bytes(size):
+    """Formats a byte count as B, KB, MB or GB."""
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.2f} GB"
+
+
+def format_duration(seconds):
+    """Formats seconds as e.g. 45s, 3m20s or 1h05m."""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+
+def _content_range_total(response):
+    """Returns the complete length from a 206 response's Content-Range, or None."""
+    total = response.headers.get('Content-Range', '').rpartition('/')[2]
+    return int(total) if total.isdigit() else None
+
+
+def _plain_length(response):
+    """Returns Content-Length when it is the size of the file itself, or None."""
+    if response.headers.get('Content-Encoding', 'identity').lower() != 'identity':
+        return None
+    length = response.headers.get('Content-Length', '')
+    return int(length) if length.isdigit() else None
+
+
+def probe_size(session, url, timeout=http_client.PAGE_TIMEOUT):
+    """
+    Find the size of a file without downloading it.
+
+    Sends a HEAD request; when that fails or has no usable
+    ``Content-Length`` (some servers reject HEAD or omit the length), falls
+    back to a GET for the first byte only and reads the size from
+    ``Content-Range``.
+
+    Args:
+        session (requests.Session): Session to send the probes with
+        url (str): The file URL
+        timeout (tuple): Request timeout
+
+    Returns:
+        int: Size in bytes, or None if the server does not say
+
+    Raises:
+        requests.RequestException: Both probes failed with a network error
+            or error status
+    """
+    try:
+        with session.head(url, timeout=timeout, allow_redirects=True) as response:
+            response.raise_for_status()
+            size = _plain_length(response)
+        if size is not None:
+            return size
+    except Exception:
+        pass
+
+    with session.get(url, headers={'Range': 'bytes=0-0'}, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        if response.status_code == 206:
+            return _content_range_total(response)
+        # Range ignored: the headers still tell the size; the body is left unread
+        return _plain_length(response)
+
+
+def probe_sizes(pdf_links, session=None, workers=DEFAULT_PROBE_WORKERS, limits=None, on_progress=None):
+    """
+    Probe the sizes of many files concurrently.
+
+    Each link dict gets a ``size`` key: the size in bytes, or None when it
+    could not be determined.
+
+    Args:
+        pdf_links (list): List of dictionaries containing PDF information
+        session (requests.Session): Session to fetch with (default: shared session)
+        workers (int): Number of probes sent at once
+        limits (throttle.HostLimits): Optional per-host concurrency limits
+        on_progress (callable): Called as ``on_progress(done, total)`` after
+            each probe
+
+    Returns:
+        tuple: (total bytes of the files with a known size, number of files
+            of unknown size)
+    """
+    session = session or http_client.get_session()
+    retry = throttle.RetryPolicy(retries=PROBE_RETRIES)
+    total = len(pdf_links)
+    done = [0]
+    lock = threading.Lock()
+
+    def probe(pdf):
+        try:
+            pdf['size'] = throttle.call_with_retries(
+                pdf['url'], lambda: probe_size(session, pdf['url']), retry, limits)
+        except Exception:
+            pdf['size'] = None
+        with lock:
+            done[0] += 1
+            if on_progress:
+                on_progress(done[0], total)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        list(executor.map(probe, pdf_links))
+
+    known = [pdf['size'] for pdf in pdf_links if pdf['size'] is not None]
+    return sum(known), total - len(known)
+
+
+def largest_first(pdf_links):
+    """
+    Order links so the largest files start first.
+
+    Starting big files early keeps one of them from running alone at the end
+    of a concurrent run. Files of unknown size follow, in their original order.
+
+    Returns:
+        list: The reordered links
+    """
+    known = [pdf for pdf in pdf_links if pdf.get('size') is not None]
+    unknown = [pdf for pdf in pdf_links if pdf.get('size') is None]
+    return sorted(known, key=lambda pdf: pdf['size'], reverse=True) + unknown
+
+
+def check_budget(total_bytes, max_bytes):
+    """
+    Refuse a harvest whose probed size is over budget.
+
+    Args:
+        total_bytes (int): Total size of the files with a known size
+        max_bytes (int): The budget, or None for no limit
+
+    Raises:
+        BudgetExceeded: ``total_bytes`` is over ``max_bytes``
+    """
+    if max_bytes and total_bytes > max_bytes:
+        raise BudgetExceeded(f"The files total {format_bytes(total_bytes)}, "
+                             f"over the {format_bytes(max_bytes)} size limit")
+
+
+class ByteProgress:
+    """
+    Progress of a run in bytes, with transfer rate and ETA.
+
+    Bytes are counted as they stream (see ``counted``), so a large file
+    moves the progress while it downloads rather than only once it is done.
+    A file that is downloaded again after a failed attempt is not counted
+    twice, and a file that fails for good is taken out of the total.
+
+    Thread-safe; one instance is shared by every worker of a run.
+
+    Args:
+        total_bytes (int): Total size of the files with a known size
+        unknown (int): Number of files whose size is unknown
+        listener (callable): Called with this object as bytes arrive, at
+            most every ``REPORT_INTERVAL`` seconds
+    """
+
+    def __init__(self, total_bytes, unknown=0, listener=None):
+        self.total_bytes = total_bytes
+        self.unknown = unknown
+        self.listener = listener
+        self.completed = 0
+        # Bytes transferred by this run, which the rate is based on
+        self.transferred = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._last_report = 0.0
+
+    @property
+    def done_bytes(self):
+        with self._lock:
+            return self.completed + sum(self._in_flight.values())
+
+    def counted(self, key, chunks, offset=0):
+        """
+        Yield ``chunks`` while counting them towards the progress.
+
+        Args:
+            key (str): Identifies the file, usually its URL
+            chunks (iterable): Body chunks
+            offset (int): Bytes of the file already on disk (a resumed download)
+        """
+        with self._lock:
+            self._in_flight[key] = offset
+        for chunk in chunks:
+            with self._lock:
+                self._in_flight[key] = self._in_flight.get(key, 0) + len(chunk)
+                self.transferred += len(chunk)
+            self._notify()
+            yield chunk
+
+    def finish(self, key, size, expected=None):
+        """
+        Settle a file once it is complete, skipped or failed.
+
+        Args:
+            key (str): The key given to ``counted``
+            size (int): Bytes the file ended up with, 0 if it failed
+            expected (int): Its probed size, None if unknown
+        """
+        with self._lock:
+            self._in_flight.pop(key, None)
+            self.completed += size
+            if expected is None:
+                # Not part of the known total; grow it so the ETA stays honest
+                self.total_bytes += size
+                self.unknown = max(0, self.unknown - 1)
+            elif size != expected:
+                self.total_bytes += size - expected
+        self._notify(force=True)
+
+    def rate(self):
+        """Returns the bytes per second transferred so far, or None."""
+        elapsed = time.monotonic() - self._start
+        with self._lock:
+            transferred = self.transferred
+        if elapsed <= 0 or not transferred:
+            return None
+        return transferred / elapsed
+
+    def fraction(self):
+        """Returns the fraction done between 0 and 1, or None with no known total."""
+        if not self.total_bytes:
+            return None
+        return min(1.0, self.done_bytes / self.total_bytes)
+
+    def eta(self):
+        """Returns the estimated seconds left for the known total, or None."""
+        rate = self.rate()
+        if not rate or not self.total_bytes:
+            return None
+        return max(0.0, self.total_bytes - self.done_bytes) / rate
+
+    def describe(self):
+        """Returns e.g. '12.0 MB of 450.0 MB (2.7%), 3.1 MB/s, ETA 2m21s'."""
+        done = self.done_bytes
+        parts = [format_bytes(done)]
+        if self.total_bytes:
+            parts[0] += f" of {format_bytes(self.total_bytes)} ({done / self.total_bytes:.1%})"
+        if self.unknown:
+            parts[0] += f" + {self.unknown} of unknown size"
+        rate = self.rate()
+        if rate:
+            parts.append(f"{format_bytes(rate)}/s")
+        eta = self.eta()
+        if eta is not None:
+            parts.append(f"ETA {format_duration(eta)}")
+        return ', '.join(parts)
+
+    def _notify(self, force=False):
+        if not self.listener:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_report < REPORT_INTERVAL:
+                return
+            self._last_report = now
+        self.listener(self)
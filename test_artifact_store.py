@@ -0,0 +1,135 @@
+"""
+Tests for artifact_store: keys, LRU and idle-TTL eviction, and spilling
+values to disk.
+
+Run with: python -m pytest test_artifact_store.py
+"""
+
+import json
+import os
+
+import pytest
+
+import artifact_store
+
+LINKS = [{'filename': f"{i}.pdf", 'url': f"https://example.com/{i}.pdf"} for i in range(10)]
+SIZE = len(json.dumps(LINKS).encode('utf-8'))
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(artifact_store.time, 'time', clock)
+    return clock
+
+
+def artifacts(root):
+    return sorted(name for name in os.listdir(root) if name.endswith(artifact_store.ARTIFACT_SUFFIX))
+
+
+def test_key_ignores_link_order_and_query_order():
+    key = artifact_store.make_key('links', ['https://example.com/a.pdf?x=1&y=2', 'https://example.com/b.pdf'])
+    assert key == artifact_store.make_key('links', ['https://example.com/b.pdf', 'https://example.com/a.pdf?y=2&x=1'])
+    assert key != artifact_store.make_key('zip', ['https://example.com/a.pdf?x=1&y=2', 'https://example.com/b.pdf'])
+    assert key != artifact_store.make_key('links', ['https://example.com/a.pdf?x=1&y=2', 'https://example.com/b.pdf'],
+                                          scope='cookies')
+
+
+def test_least_recently_used_value_is_evicted(tmp_path, clock):
+    store = artifact_store.ArtifactStore(str(tmp_path), max_bytes=2 * SIZE)
+    store.put_value('a', LINKS)
+    clock.now += 1
+    store.put_value('b', LINKS)
+    clock.now += 1
+    assert store.get_value('a') == LINKS
+    clock.now += 1
+    store.put_value('c', LINKS)
+    assert store.get_value('b') is None
+    assert store.get_value('a') == LINKS and store.get_value('c') == LINKS
+    assert store.total_bytes() == 2 * SIZE
+
+
+def test_artifact_larger_than_the_budget_is_still_kept_alone(tmp_path, clock):
+    store = artifact_store.ArtifactStore(str(tmp_path), max_bytes=SIZE // 2)
+    store.put_value('a', LINKS)
+    store.put_value('b', LINKS)
+    assert store.get_value('a') is None
+    assert store.get_value('b') == LINKS
+
+
+def test_idle_artifacts_expire(tmp_path, clock):
+    store = artifact_store.ArtifactStore(str(tmp_path), idle_ttl=60)
+    store.put_value('a', LINKS)
+    store.put_value('b', LINKS)
+    clock.now += 50
+    # Reading an artifact keeps it alive
+    assert store.get_value('a') == LINKS
+    clock.now += 50
+    assert store.get_value('a') == LINKS
+    assert store.get_value('b') is None
+    assert store.total_bytes() == SIZE
+
+
+def test_max_age_ignores_old_values_without_dropping_them(tmp_path, clock):
+    store = artifact_store.ArtifactStore(str(tmp_path))
+    store.put_value('a', LINKS)
+    clock.now += 30
+    assert store.get_value('a', max_age=10) is None
+    assert store.get_value('a', max_age=60) == LINKS
+
+
+def test_values_beyond_the_memory_budget_spill_to_disk(tmp_path, clock):
+    store = artifact_store.ArtifactStore(str(tmp_path), memory_bytes=SIZE)
+    store.put_value('a', LINKS)
+    assert artifacts(tmp_path) == []
+    clock.now += 1
+    store.put_value('b', LINKS[:5])
+    # The older value went to disk and still reads back
+    spilled = artifacts(tmp_path)
+    assert len(spilled) == 1 and spilled[0].startswith('a-')
+    assert store.get_value('a') == LINKS
+    assert store.get_value('b') == LINKS[:5]
+
+    store.discard('a')
+    assert artifacts(tmp_path) == []
+
+
+def test_files_are_moved_in_and_removed_on_eviction(tmp_path, clock):
+    root = tmp_path / 'store'
+    store = artifact_store.ArtifactStore(str(root), max_bytes=150)
+    for name in ('one', 'two'):
+        (tmp_path / f"{name}.zip").write_bytes(b'z' * 100)
+        clock.now += 1
+        path = store.put_file(name, str(tmp_path / f"{name}.zip"), meta={'files': 3})
+        assert not (tmp_path / f"{name}.zip").exists()
+    assert store.get_file('one') is None
+    assert store.get_file('two') == (path, {'files': 3})
+    assert artifacts(root) == [os.path.basename(path)]
+    # A file is not handed out as a value, nor a value as a file
+    assert store.get_value('two') is None
+    store.put_value('v', [1])
+    assert store.get_file('v') is None
+
+
+def test_replacing_a_key_drops_the_old_artifact(tmp_path, clock):
+    store = artifact_store.ArtifactStore(str(tmp_path), memory_bytes=0)
+    store.put_value('a', LINKS)
+    store.put_value('a', LINKS[:1])
+    assert len(artifacts(tmp_path)) == 1
+    assert store.get_value('a') == LINKS[:1]
+    assert store.total_bytes() == len(json.dumps(LINKS[:1]).encode('utf-8'))
+
+
+def test_leftovers_of_an_earlier_process_are_removed(tmp_path):
+    (tmp_path / f"old{artifact_store.ARTIFACT_SUFFIX}").write_bytes(b'x')
+    (tmp_path / 'unrelated.txt').write_bytes(b'x')
+    artifact_store.ArtifactStore(str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ['unrelated.txt']
@@ -0,0 +1,96 @@
+"""
+Tests for content_store: one object per unique file, exposed by hardlink or
+by copy where hardlinks are not supported.
+
+Run with: python -m pytest test_content_store.py
+"""
+
+import hashlib
+import os
+
+import pytest
+
+import content_store
+
+BODY = b'%PDF-1.4 ' + b'x' * 5000 + b' %%EOF'
+DIGEST = hashlib.sha256(BODY).hexdigest()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return content_store.ContentStore(str(tmp_path / content_store.STORE_NAME))
+
+
+def test_identical_streams_are_stored_once(store):
+    digest, size, path = store.write_stream([BODY[:100], b'', BODY[100:]])
+    assert (digest, size) == (DIGEST, len(BODY))
+    assert path == store.object_path(DIGEST)
+    assert store.write_stream([BODY])[2] == path
+    assert (store.new_objects, store.duplicates) == (1, 1)
+    assert os.listdir(store.tmp_dir) == []
+
+
+def test_failed_stream_leaves_nothing_behind(store):
+    def chunks():
+        yield BODY[:100]
+        raise IOError("connection reset")
+
+    with pytest.raises(IOError):
+        store.write_stream(chunks())
+    assert os.listdir(store.tmp_dir) == []
+    assert store.new_objects == 0
+
+
+def test_names_are_hardlinks_to_the_object(store, tmp_path):
+    _, _, path = store.write_stream([BODY])
+    for name in ('a.pdf', 'b.pdf'):
+        store.link(path, str(tmp_path / name))
+    assert os.path.samefile(path, tmp_path / 'a.pdf')
+    assert os.stat(path).st_nlink == 3
+    # Linking again is a no-op
+    store.link(path, str(tmp_path / 'a.pdf'))
+    assert os.stat(path).st_nlink == 3
+
+
+def test_copy_when_hardlinks_are_not_supported(store, tmp_path, monkeypatch):
+    def no_links(src, dst):
+        raise OSError(1, "Operation not permitted")
+
+    _, _, path = store.write_stream([BODY])
+    monkeypatch.setattr(content_store.os, 'link', no_links)
+    store.link(path, str(tmp_path / 'a.pdf'))
+    assert (tmp_path / 'a.pdf').read_bytes() == BODY
+    assert not os.path.samefile(path, tmp_path / 'a.pdf')
+    assert os.stat(path).st_nlink == 1
+
+
+def test_existing_file_under_the_name_is_replaced(store, tmp_path):
+    (tmp_path / 'a.pdf').write_bytes(b'older version')
+    _, _, path = store.write_stream([BODY])
+    store.link(path, str(tmp_path / 'a.pdf'))
+    assert os.path.samefile(path, tmp_path / 'a.pdf')
+
+
+def test_adopt_moves_a_download_into_the_store(store, tmp_path):
+    download = tmp_path / 'a.pdf'
+    download.write_bytes(BODY)
+    path = store.adopt(str(download), DIGEST)
+    assert path == store.object_path(DIGEST)
+    assert os.path.samefile(path, download)
+
+    # A second copy of the same content becomes another link to it
+    second = tmp_path / 'b.pdf'
+    second.write_bytes(BODY)
+    assert store.adopt(str(second), DIGEST) == path
+    assert os.path.samefile(path, second)
+    assert store.duplicates == 1
+
+
+def test_manifest_keeps_the_latest_entry_per_name(store, tmp_path):
+    name = str(tmp_path / 'a.pdf')
+    store.record(name, 'https://example.com/2023/a.pdf', 'old', 10)
+    store.record(name, 'https://example.com/2024/a.pdf', DIGEST, len(BODY))
+    with open(store.manifest_path, 'a', encoding='utf-8') as f:
+        f.write('{"path": "torn')
+    assert store.load_manifest() == {name: {'path': name, 'url': 'https://example.com/2024/a.pdf',
+                                            'sha256': DIGEST, 'size': len(BODY)}}
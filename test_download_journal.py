@@ -0,0 +1,63 @@
+"""
+Tests for download_journal: what a resumed run trusts after a crash.
+
+Run with: python -m pytest test_download_journal.py
+"""
+
+import download_journal
+
+URL = 'https://example.com/files/a.pdf'
+
+
+def test_entries_survive_reopening(tmp_path):
+    path = tmp_path / 'a.pdf'
+    path.write_bytes(b'%PDF-1.4 ... %%EOF')
+    journal = download_journal.DownloadJournal(str(tmp_path))
+    journal.record(URL, download_journal.PARTIAL, str(path), size=5)
+    journal.record(URL, download_journal.COMPLETE, str(path), size=path.stat().st_size)
+    journal.close()
+
+    reopened = download_journal.DownloadJournal(str(tmp_path))
+    try:
+        # The last line for a URL wins
+        assert reopened.get(URL)['status'] == download_journal.COMPLETE
+        assert reopened.is_complete(URL)
+        assert reopened.paths() == {str(path)}
+    finally:
+        reopened.close()
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    journal = download_journal.DownloadJournal(str(tmp_path))
+    journal.record(URL, download_journal.PARTIAL, str(tmp_path / 'a.pdf'), size=3)
+    journal.close()
+    with open(tmp_path / download_journal.JOURNAL_NAME, 'a', encoding='utf-8') as f:
+        f.write('{"url": "https://example.com/files/b.pdf", "sta')
+
+    reopened = download_journal.DownloadJournal(str(tmp_path))
+    try:
+        assert reopened.get(URL)['status'] == download_journal.PARTIAL
+        assert reopened.get('https://example.com/files/b.pdf') is None
+    finally:
+        reopened.close()
+
+
+def test_complete_needs_the_file_at_its_journaled_size(tmp_path):
+    path = tmp_path / 'a.pdf'
+    path.write_bytes(b'0123456789')
+    journal = download_journal.DownloadJournal(str(tmp_path))
+    try:
+        journal.record(URL, download_journal.COMPLETE, str(path), size=10)
+        assert journal.is_complete(URL)
+
+        path.write_bytes(b'01234')
+        assert not journal.is_complete(URL)
+
+        path.unlink()
+        assert not journal.is_complete(URL)
+
+        journal.record(URL, download_journal.FAILED, None, error='HTTP 500')
+        assert not journal.is_complete(URL)
+        assert not journal.is_complete('https://example.com/never-seen.pdf')
+    finally:
+        journal.close()
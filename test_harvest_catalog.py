@@ -0,0 +1,166 @@
+"""
+Tests for harvest_catalog: run bookkeeping, and incremental and revalidating
+re-runs of download_pdfs against a local server.
+
+Run with: python -m pytest test_harvest_catalog.py
+"""
+
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import harvest_catalog
+import pdf_extractor
+
+SEED = 'https://example.com/records/'
+
+
+def link(name, page=None):
+    pdf = {'filename': name, 'url': f"https://example.com/files/{name}", 'text': name}
+    if page:
+        pdf['page'] = page
+    return pdf
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = harvest_catalog.HarvestCatalog(str(tmp_path / 'catalog.db'))
+    yield catalog
+    catalog.close()
+
+
+def test_runs_count_found_and_new_links(catalog):
+    catalog.start_run(SEED)
+    assert catalog.record_links([link('a.pdf'), link('b.pdf', page=SEED + '?page=2')], SEED) == 2
+    assert catalog.finish_run() == {'found': 2, 'new': 2, 'downloaded': 0, 'failed': 0}
+
+    catalog.start_run(SEED)
+    # The same URL with its host in capitals is the same link
+    moved = {'filename': 'a.pdf', 'url': 'https://EXAMPLE.com/files/a.pdf', 'text': 'A'}
+    assert catalog.record_links([moved, link('c.pdf')], SEED) == 1
+    assert catalog.finish_run() == {'found': 2, 'new': 1, 'downloaded': 0, 'failed': 0}
+    assert catalog.stats() == {'pages': 2, 'links': 3, 'downloaded': 0, 'failed': 0, 'new': 1}
+    assert catalog.get(link('a.pdf')['url'])['text'] == 'A'
+
+
+def test_observe_records_links_as_they_pass(catalog, monkeypatch):
+    monkeypatch.setattr(harvest_catalog, 'BATCH_SIZE', 2)
+    catalog.start_run(SEED)
+    links = (link(f"{i}.pdf") for i in range(5))
+    seen = []
+    for pdf in catalog.observe(links, SEED):
+        # Written before it is handed on, so its download can be recorded
+        assert catalog.get(pdf['url']) is not None
+        seen.append(pdf['filename'])
+    assert seen == [f"{i}.pdf" for i in range(5)]
+    other = harvest_catalog.HarvestCatalog(catalog.path)
+    try:
+        assert other.stats()['links'] == 5
+    finally:
+        other.close()
+
+
+def test_failure_keeps_the_last_good_download(catalog):
+    catalog.start_run(SEED)
+    catalog.record_links([link('a.pdf'), link('b.pdf')], SEED)
+    url = link('a.pdf')['url']
+    catalog.record_download(url, harvest_catalog.COMPLETE, path='/tmp/a.pdf', size=10, sha256='ab',
+                            etag='"v1"', last_modified='Mon, 01 Jan 2024 00:00:00 GMT')
+    catalog.record_download(url, harvest_catalog.FAILED, error='HTTP 503')
+    catalog.record_download(link('b.pdf')['url'], harvest_catalog.FAILED, error='HTTP 404')
+
+    row = catalog.get(url)
+    assert row['status'] == harvest_catalog.COMPLETE
+    assert (row['path'], row['size'], row['sha256'], row['etag']) == ('/tmp/a.pdf', 10, 'ab', '"v1"')
+    assert row['error'] == 'HTTP 503'
+    assert catalog.is_downloaded(url)
+    assert not catalog.is_downloaded(link('b.pdf')['url'])
+    assert catalog.finish_run() == {'found': 2, 'new': 2, 'downloaded': 1, 'failed': 2}
+    assert catalog.stats()['failed'] == 1
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    files = {}
+    requests = []
+
+    def _respond(self, send_body):
+        self.requests.append((self.command, self.path))
+        body = self.files.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()[:12]
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond(True)
+
+    def do_HEAD(self):
+        self._respond(False)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.files = {f"/{name}": b'%PDF-1.4 ' + name.encode() * 200 + b' %%EOF' for name in ('a.pdf', 'b.pdf')}
+    Handler.requests = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def harvest(catalog, base, download_dir, **options):
+    links = [{'filename': name, 'url': f"{base}/{name}", 'text': name} for name in ('a.pdf', 'b.pdf')]
+    catalog.start_run(base)
+    catalog.record_links(links, base)
+    results = pdf_extractor.download_pdfs(links, str(download_dir), catalog=catalog, **options)
+    return results, catalog.finish_run()
+
+
+def test_incremental_run_sends_no_requests_for_known_files(catalog, server, tmp_path):
+    results, totals = harvest(catalog, server, tmp_path)
+    assert results == (2, 0)
+    assert totals['downloaded'] == 2
+    row = catalog.get(f"{server}/a.pdf")
+    assert row['etag'] and row['size'] == len(Handler.files['/a.pdf'])
+    assert row['sha256'] == hashlib.sha256(Handler.files['/a.pdf']).hexdigest()
+
+    Handler.requests.clear()
+    results, totals = harvest(catalog, server, tmp_path, incremental=True)
+    assert results == (2, 0)
+    assert Handler.requests == []
+    assert totals == {'found': 2, 'new': 0, 'downloaded': 0, 'failed': 0}
+
+
+def test_revalidate_downloads_only_changed_files_in_place(catalog, server, tmp_path):
+    harvest(catalog, server, tmp_path)
+    Handler.files['/b.pdf'] = b'%PDF-1.4 revised %%EOF'
+    Handler.requests.clear()
+
+    results, totals = harvest(catalog, server, tmp_path, incremental=True, revalidate=True)
+    assert results == (2, 0)
+    assert sorted(Handler.requests) == [('GET', '/b.pdf'), ('HEAD', '/a.pdf'), ('HEAD', '/b.pdf')]
+    assert totals['downloaded'] == 1
+    # The changed file replaced the old copy instead of getting a new name
+    assert sorted(path.name for path in tmp_path.glob('*.pdf')) == ['a.pdf', 'b.pdf']
+    assert (tmp_path / 'b.pdf').read_bytes() == b'%PDF-1.4 revised %%EOF'
+    assert catalog.get(f"{server}/b.pdf")['size'] == len(b'%PDF-1.4 revised %%EOF')
@@ -0,0 +1,160 @@
+"""
+Tests for http_cache: validator round-trips against a local server, what is
+stored, and eviction.
+
+Run with: python -m pytest test_http_cache.py
+"""
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import http_cache
+
+LAST_MODIFIED = 'Mon, 01 Jan 2024 00:00:00 GMT'
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # path -> (body, response headers)
+    resources = {}
+    # (path, request headers) of every request
+    seen = []
+
+    def do_GET(self):
+        self.seen.append((self.path, dict(self.headers)))
+        body, headers = self.resources[self.path]
+        etag, modified = headers.get('ETag'), headers.get('Last-Modified')
+        if (etag and self.headers.get('If-None-Match') == etag) or \
+                (not etag and modified and self.headers.get('If-Modified-Since') == modified):
+            self.send_response(304)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.resources = {
+        '/etag': (b'etag body ' * 100, {'ETag': '"v1"'}),
+        '/modified': (b'dated body ' * 100, {'Last-Modified': LAST_MODIFIED}),
+        '/plain': (b'no validators', {}),
+        '/private': (b'private', {'ETag': '"p"', 'Cache-Control': 'private, no-store'}),
+    }
+    Handler.seen = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def session():
+    session = requests.Session()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return http_cache.HttpCache(str(tmp_path / 'cache'))
+
+
+def fetch(cache, session, url, **kwargs):
+    with cache.get(session, url, timeout=5, **kwargs) as response:
+        return response.from_cache, response.content
+
+
+def test_etag_round_trip(cache, session, server):
+    body = Handler.resources['/etag'][0]
+    assert fetch(cache, session, f"{server}/etag") == (False, body)
+    assert fetch(cache, session, f"{server}/etag") == (True, body)
+    assert 'If-None-Match' not in Handler.seen[0][1]
+    assert Handler.seen[1][1]['If-None-Match'] == '"v1"'
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.total_bytes() == len(body)
+
+
+def test_last_modified_round_trip(cache, session, server):
+    body = Handler.resources['/modified'][0]
+    fetch(cache, session, f"{server}/modified")
+    assert fetch(cache, session, f"{server}/modified") == (True, body)
+    assert Handler.seen[1][1]['If-Modified-Since'] == LAST_MODIFIED
+
+
+def test_changed_resource_replaces_the_entry(cache, session, server):
+    fetch(cache, session, f"{server}/etag")
+    Handler.resources['/etag'] = (b'new body', {'ETag': '"v2"'})
+    assert fetch(cache, session, f"{server}/etag") == (False, b'new body')
+    assert fetch(cache, session, f"{server}/etag") == (True, b'new body')
+    assert Handler.seen[2][1]['If-None-Match'] == '"v2"'
+    assert cache.total_bytes() == len(b'new body')
+
+
+def test_responses_without_validators_or_with_no_store_are_not_kept(cache, session, server):
+    for path in ('/plain', '/private'):
+        fetch(cache, session, f"{server}{path}")
+        assert fetch(cache, session, f"{server}{path}")[0] is False
+    assert cache.total_bytes() == 0
+    assert 'If-None-Match' not in Handler.seen[-1][1]
+
+
+def test_entries_are_kept_apart_by_scope(cache, session, server):
+    fetch(cache, session, f"{server}/etag", scope='alice')
+    assert fetch(cache, session, f"{server}/etag", scope='bob')[0] is False
+    assert fetch(cache, session, f"{server}/etag", scope='alice')[0] is True
+
+
+def test_partly_read_body_is_not_stored(cache, session, server):
+    with cache.get(session, f"{server}/etag", timeout=5, stream=True) as response:
+        chunks = response.iter_content(chunk_size=10)
+        next(chunks)
+        chunks.close()
+    assert cache.total_bytes() == 0
+    assert not [name for name in os.listdir(cache.cache_dir) if name.endswith('.tmp')]
+
+
+def test_range_requests_bypass_the_cache(cache, session, server):
+    fetch(cache, session, f"{server}/etag")
+    from_cache, _ = fetch(cache, session, f"{server}/etag", headers={'Range': 'bytes=0-9'})
+    assert from_cache is False
+    assert 'If-None-Match' not in Handler.seen[-1][1]
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, session, server):
+    size = len(Handler.resources['/etag'][0])
+    cache = http_cache.HttpCache(str(tmp_path / 'cache'), max_bytes=size + len(Handler.resources['/modified'][0]))
+    fetch(cache, session, f"{server}/etag")
+    fetch(cache, session, f"{server}/modified")
+    # Using /etag again leaves /modified the least recently used
+    fetch(cache, session, f"{server}/etag")
+    Handler.resources['/other'] = (b'x' * 50, {'ETag': '"o"'})
+    fetch(cache, session, f"{server}/other")
+    assert fetch(cache, session, f"{server}/modified")[0] is False
+    assert cache.total_bytes() <= cache.max_bytes
+
+
+def test_reopened_cache_keeps_entries_and_drops_leftovers(cache, session, server, tmp_path):
+    fetch(cache, session, f"{server}/etag")
+    leftover = os.path.join(cache.cache_dir, 'interrupted.tmp')
+    open(leftover, 'wb').close()
+
+    reopened = http_cache.HttpCache(cache.cache_dir)
+    assert reopened.total_bytes() == len(Handler.resources['/etag'][0])
+    assert not os.path.exists(leftover)
+    assert fetch(reopened, session, f"{server}/etag")[0] is True
@@ -0,0 +1,141 @@
+"""
+Tests for link_parser: the exact backends must return the records of a full
+BeautifulSoup parse, on sloppy markup as well as clean markup.
+
+Run with: python -m pytest test_link_parser.py
+"""
+
+import random
+
+import pytest
+
+import link_parser
+
+BASE_URL = 'https://example.com/records/'
+
+CLEAN = [
+    '<ul><li><a href="a.pdf">Doc A</a></li><li><a href="/b.PDF"><span>Doc</span> <b>B</b></a></li></ul>',
+    '<a href="c.pdf">  Filing&nbsp;3 &amp; more <!-- hidden --> text</a><a href="?page=2">next</a>',
+    '<a href="d.pdf"><img src="icon.png"></a><a name="top">Top</a><a href="">empty</a>',
+    '<a href="e.pdf">x<script>var y = "<a href=f.pdf>";</script><style>a{}</style>z</a>',
+]
+
+SLOPPY = [
+    # Anchors left open inside list items are closed by </li>
+    '<ul><li><a href="a.pdf">Doc A</li><li><a href="b.pdf">Doc B</li><li>Other</li></ul><p>Footer text</p>',
+    # ...and by </p>, so the tail text is not theirs
+    '<p><a href="a.pdf">x</p> tail <a href="b.pdf">z</a>',
+    # Closed in the wrong order
+    '<li><a href="a.pdf"><em>Bad</a></em> after</li>',
+    '<table><tr><td><a href="a.pdf"><b>Cell</td><td>next</td></tr></table>',
+    # Nested anchors each get their own text
+    '<a href="outer.pdf">Outer <a href="inner.pdf">inner</a> after</a> rest',
+    # Void elements with end tags
+    '<a href="a.pdf">Line<br>next</br> line<img src="x.png"></img></a>',
+    # Stray end tags and an anchor open to the end of the document
+    '</div></a><a href="a.pdf">Last<p>Footer</p>',
+    '<a href="a.pdf">ruby <ruby>漢<rt>kan</rt></ruby> and <template><p>hidden</p></template>shown</a>',
+    '<a href="a.pdf">x<![CDATA[data]]>y</a>',
+]
+
+
+def random_page(rng):
+    """Markup broken in random ways, from a small set of tags."""
+    tags = ['a', 'p', 'li', 'ul', 'div', 'span', 'b', 'br', 'img', 'template', 'script', 'rt', 'td', 'table']
+    parts = []
+    for _ in range(rng.randint(1, 40)):
+        kind = rng.random()
+        tag = rng.choice(tags)
+        if kind < 0.2:
+            parts.append(f'<a href="{rng.randint(0, 99)}.pdf">')
+        elif kind < 0.25:
+            parts.append('<a name="x">')
+        elif kind < 0.28:
+            parts.append(f'<a href="page{rng.randint(0, 9)}"/>')
+        elif kind < 0.45:
+            parts.append(f'<{tag}>')
+        elif kind < 0.62:
+            parts.append(f'</{tag}>')
+        elif kind < 0.66:
+            parts.append('<!-- c -->')
+        elif kind < 0.68:
+            parts.append('<![CDATA[cd]]>')
+        else:
+            parts.append(rng.choice(['Doc A', '  ', ' tail ', '&amp; x&nbsp;', '\n q ']))
+    return ''.join(parts)
+
+
+def chunked(content, size):
+    return [content[i:i + size] for i in range(0, len(content), size)]
+
+
+@pytest.mark.parametrize('backend', link_parser.EXACT_BACKENDS)
+@pytest.mark.parametrize('html', CLEAN + SLOPPY)
+def test_exact_backends_match_soup(backend, html):
+    content = html.encode('utf-8')
+    assert link_parser.parse_links(content, BASE_URL, backend=backend) == \
+        link_parser.parse_links(content, BASE_URL, backend='soup')
+    assert link_parser.parse_pdf_links(content, BASE_URL, backend=backend) == \
+        link_parser.parse_pdf_links(content, BASE_URL, backend='soup')
+
+
+def test_unclosed_anchors_are_closed_by_their_parent():
+    pdfs = link_parser.parse_pdf_links(SLOPPY[0], BASE_URL)
+    assert [(pdf['filename'], pdf['text']) for pdf in pdfs] == [('a.pdf', 'Doc A'), ('b.pdf', 'Doc B')]
+    pdfs = link_parser.parse_pdf_links(SLOPPY[1], BASE_URL)
+    assert [(pdf['filename'], pdf['text']) for pdf in pdfs] == [('a.pdf', 'x'), ('b.pdf', 'z')]
+
+
+@pytest.mark.parametrize('html', CLEAN)
+def test_strainer_matches_soup_on_clean_markup(html):
+    assert link_parser.parse_links(html, BASE_URL, backend='strainer') == \
+        link_parser.parse_links(html, BASE_URL, backend='soup')
+
+
+def test_stream_matches_soup_on_random_broken_markup():
+    for seed in range(2000):
+        content = random_page(random.Random(seed)).encode('utf-8')
+        assert link_parser.parse_links(content, BASE_URL, backend='stream') == \
+            link_parser.parse_links(content, BASE_URL, backend='soup'), content
+
+
+@pytest.mark.parametrize('size', [1, 7, 4096])
+def test_streamed_parse_matches_whole_document(size):
+    content = ''.join(CLEAN + SLOPPY).encode('utf-8')
+    assert list(link_parser.iter_pdf_links(chunked(content, size), BASE_URL)) == \
+        link_parser.parse_pdf_links(content, BASE_URL, backend='soup')
+
+
+def test_streamed_parse_keeps_multibyte_characters_split_across_chunks():
+    content = '<meta charset="utf-8"><a href="ü.pdf">Überblick – 2024</a>'.encode('utf-8')
+    pdfs = list(link_parser.iter_pdf_links(chunked(content, 1), BASE_URL))
+    assert pdfs == link_parser.parse_pdf_links(content, BASE_URL, backend='soup')
+    assert pdfs[0]['text'] == 'Überblick – 2024'
+
+
+def test_pdf_link_reads_like_a_dict():
+    pdf = link_parser.PdfLink('a.pdf', 'https://example.com/a.pdf', 'A')
+    assert pdf == {'filename': 'a.pdf', 'url': 'https://example.com/a.pdf', 'text': 'A'}
+    assert 'size' not in pdf and pdf.get('size') is None
+    pdf['size'] = 10
+    assert pdf['size'] == 10 and dict(pdf)['size'] == 10
+    copy = pdf.copy()
+    copy['size'] = 20
+    assert pdf['size'] == 10
+    with pytest.raises(KeyError):
+        pdf['keys']
+    with pytest.raises(KeyError):
+        pdf['unknown'] = 1
+
+
+def test_link_table_round_trip_and_search():
+    pdfs = link_parser.parse_pdf_links(''.join(CLEAN), BASE_URL)
+    pdfs[0]['size'] = 123
+    table = link_parser.LinkTable(link_parser.LinkTable.from_links(pdfs).columns)
+    assert len(table) == len(pdfs)
+    assert table.records() == pdfs
+    assert table.has('size') and not table.has('metadata')
+    assert table.search('') == list(range(len(pdfs)))
+    assert table.search('FILING') == [2]
+    assert table.search('b.pdf', fields=('filename',)) == [1]
+    assert table.search('b.pdf', fields=('text',)) == []
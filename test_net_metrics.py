@@ -0,0 +1,108 @@
+"""
+Tests for net_metrics: percentiles and the records of timed requests.
+
+Run with: python -m pytest test_net_metrics.py
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_client
+import net_metrics
+
+BODY = b'%PDF-1.4 ' + b'x' * 10000 + b' %%EOF'
+
+
+@pytest.mark.parametrize('values, pct, expected', [
+    (range(1, 101), 50, 50),
+    (range(1, 101), 90, 90),
+    (range(1, 101), 95, 95),
+    (range(1, 101), 99, 99),
+    (range(1, 101), 100, 100),
+    (range(1, 21), 90, 18),
+    (range(1, 21), 95, 19),
+    (range(1, 21), 99, 20),
+    ([7], 50, 7),
+    ([7], 99, 7),
+    ([3, 1, 2], 50, 2),
+    ([1, 2, 3, 4], 50, 2),
+    ([1, 2, 3, 4], 0, 1),
+])
+def test_percentile_is_nearest_rank(values, pct, expected):
+    assert net_metrics.percentile(list(values), pct) == expected
+
+
+def test_percentile_of_nothing():
+    assert net_metrics.percentile([], 50) is None
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/missing':
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_requests_are_recorded_and_summarized(server, tmp_path):
+    path = tmp_path / 'metrics.jsonl'
+    metrics = net_metrics.MetricsRecorder(str(path))
+    session = http_client.create_session(metrics=metrics)
+    try:
+        for _ in range(3):
+            assert session.get(f"{server}/file.pdf").content == BODY
+        assert session.get(f"{server}/missing").status_code == 404
+    finally:
+        session.close()
+        metrics.close()
+
+    records = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert len(records) == 4
+    assert [record['status'] for record in records] == [200, 200, 200, 404]
+    assert records[0]['bytes'] == len(BODY)
+    # One connection, kept alive for the rest
+    assert records[0]['reused'] is False and records[0]['connect_ms'] is not None
+    assert all(record['reused'] for record in records[1:])
+    assert all(record['total_ms'] >= record['ttfb_ms'] for record in records)
+
+    summary = metrics.summary()
+    assert summary['requests'] == 4
+    assert summary['new_connections'] == 1
+    assert summary['statuses'] == {200: 3, 404: 1}
+    assert summary['bytes'] >= 3 * len(BODY)
+    assert summary['phases']['total']['count'] == 4
+    assert summary['phases']['connect']['count'] == 1
+
+
+def test_abandoned_body_is_recorded_once(server):
+    metrics = net_metrics.MetricsRecorder()
+    session = http_client.create_session(metrics=metrics)
+    try:
+        with session.get(f"{server}/file.pdf", stream=True) as response:
+            next(response.iter_content(1024))
+    finally:
+        session.close()
+        metrics.close()
+    assert metrics.summary()['requests'] == 1
@@ -0,0 +1,239 @@
+"""
+Tests for pdf_metadata: classic and stream cross-references, incremental
+updates, and what is read over Range requests.
+
+Run with: python -m pytest test_pdf_metadata.py
+"""
+
+import zlib
+
+import pytest
+
+import pdf_metadata
+
+URL = 'https://example.com/files/report.pdf'
+
+INFO = (b"<< /Title (Annual Report) /Author <FEFF004A006F00200042006F006E0064> "
+        b"/Producer (Acrobat Distiller 9.0) /CreationDate (D:20240131123000+01'00') >>")
+CATALOG = b"<< /Type /Catalog /Pages 2 0 R >>"
+PAGES = b"<< /Type /Pages /Kids [] /Count 12 >>"
+# Puts the metadata objects far from the trailer, so they need their own reads
+FILLER = b"x" * 30000
+
+
+def stream(body, entries=b''):
+    return b"<< /Length %d %s>>\nstream\n" % (len(body), entries) + body + b"\nendstream"
+
+
+def write_objects(out, objects):
+    """Appends ``n 0 obj`` blocks to ``out``; returns their offsets."""
+    offsets = {}
+    for number, body in sorted(objects.items()):
+        offsets[number] = len(out)
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    return offsets
+
+
+def classic_pdf(objects, trailer, base=None, prev=None):
+    """A PDF with an xref table, or an incremental update appended to ``base``."""
+    out = bytearray(base or b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = write_objects(out, objects)
+    xref = len(out)
+    out += b"xref\n"
+    if base is None:
+        offsets[0] = None
+    numbers = sorted(offsets)
+    # One subsection per run of consecutive object numbers
+    runs = []
+    for number in numbers:
+        if runs and runs[-1][-1] == number - 1:
+            runs[-1].append(number)
+        else:
+            runs.append([number])
+    for run in runs:
+        out += b"%d %d\n" % (run[0], len(run))
+        for number in run:
+            if offsets[number] is None:
+                out += b"0000000000 65535 f\r\n"
+            else:
+                out += b"%010d 00000 n\r\n" % offsets[number]
+    size = max(numbers) + 1
+    out += b"trailer\n<< /Size %d %s" % (size, trailer)
+    if prev is not None:
+        out += b" /Prev %d" % prev
+    out += b" >>\nstartxref\n%d\n%%%%EOF\n" % xref
+    return bytes(out), xref
+
+
+def basic_pdf(trailer=b"/Root 1 0 R /Info 3 0 R"):
+    return classic_pdf({1: CATALOG, 2: PAGES, 3: INFO, 4: stream(FILLER)}, trailer)
+
+
+def xref_stream_pdf(predictor=False):
+    """A PDF 1.5 file: objects 1-3 in a compressed object stream, found through an xref stream."""
+    members = [CATALOG, PAGES, INFO]
+    header, body = b'', b''
+    for number, member in enumerate(members, 1):
+        header += b"%d %d " % (number, len(body))
+        body += member + b"\n"
+    objstm = zlib.compress(header + body)
+    out = bytearray(b"%PDF-1.5\n")
+    offsets = write_objects(out, {
+        4: stream(FILLER),
+        5: stream(objstm, b"/Type /ObjStm /N 3 /First %d /Filter /FlateDecode " % len(header)),
+    })
+    xref = len(out)
+    rows = [(0, 0, 255), (2, 5, 0), (2, 5, 1), (2, 5, 2), (1, offsets[4], 0), (1, offsets[5], 0), (1, xref, 0)]
+    data = b''.join(bytes([kind]) + second.to_bytes(4, 'big') + bytes([third]) for kind, second, third in rows)
+    params = b''
+    if predictor:
+        # PNG "up" predictor, one filter byte per six-byte row
+        previous = bytes(6)
+        encoded = b''
+        for k in range(0, len(data), 6):
+            row = data[k:k + 6]
+            encoded += b'\x02' + bytes((a - b) & 0xFF for a, b in zip(row, previous))
+            previous = row
+        data = encoded
+        params = b"/DecodeParms << /Predictor 12 /Columns 6 >> "
+    entries = b"/Type /XRef /Size 7 /W [1 4 1] /Root 1 0 R /Info 3 0 R /Filter /FlateDecode " + params
+    out += b"6 0 obj\n" + stream(zlib.compress(data), entries) + b"\nendobj\n"
+    out += b"startxref\n%d\n%%%%EOF\n" % xref
+    return bytes(out)
+
+
+class StubResponse:
+    def __init__(self, status_code, body, headers):
+        self.status_code = status_code
+        self.content = body
+        self.headers = headers
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def iter_content(self, chunk_size=None):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class StubSession:
+    """Serves one file, honouring Range unless ``ranges`` is False."""
+
+    def __init__(self, body, ranges=True):
+        self.body = body
+        self.ranges = ranges
+        self.requested = []
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        byte_range = (headers or {}).get('Range')
+        self.requested.append(byte_range)
+        size = len(self.body)
+        if not self.ranges or not byte_range:
+            return StubResponse(200, self.body, {'Content-Type': 'application/pdf', 'Content-Length': str(size)})
+        first, _, last = byte_range[len('bytes='):].partition('-')
+        if not first:
+            start, end = max(0, size - int(last)), size - 1
+        else:
+            start, end = int(first), min(int(last), size - 1)
+        return StubResponse(206, self.body[start:end + 1],
+                            {'Content-Type': 'application/pdf', 'Content-Range': f"bytes {start}-{end}/{size}"})
+
+
+EXPECTED = {'pages': 12, 'title': 'Annual Report', 'author': 'Jo Bond', 'producer': 'Acrobat Distiller 9.0',
+            'created': '2024-01-31 12:30:00', 'encrypted': False}
+
+
+def assert_metadata(metadata, expected=EXPECTED):
+    assert {key: metadata[key] for key in expected} == expected
+
+
+def test_classic_xref_table_over_range_requests():
+    body, _ = basic_pdf()
+    session = StubSession(body)
+    metadata = pdf_metadata.fetch_metadata(session, URL)
+    assert_metadata(metadata)
+    assert metadata['size'] == len(body)
+    assert not metadata['full_fetch']
+    # The tail, then the blocks holding the xref entries and the objects
+    assert session.requested[0] == f"bytes=-{pdf_metadata.TAIL_BYTES}"
+    assert metadata['requests'] == len(session.requested) <= 4
+    assert metadata['bytes_read'] < len(body) / 2
+
+
+def test_classic_xref_table_on_disk(tmp_path):
+    path = tmp_path / 'report.pdf'
+    path.write_bytes(basic_pdf()[0])
+    assert_metadata(pdf_metadata.file_metadata(str(path)))
+
+
+@pytest.mark.parametrize('predictor', [False, True])
+def test_cross_reference_stream_and_object_stream(predictor):
+    metadata = pdf_metadata.fetch_metadata(StubSession(xref_stream_pdf(predictor)), URL)
+    assert_metadata(metadata)
+
+
+def test_incremental_update_overrides_earlier_objects():
+    base, xref = basic_pdf()
+    update = b"<< /Title (Annual Report, revised) /ModDate (D:20240301) >>"
+    body, _ = classic_pdf({2: b"<< /Type /Pages /Kids [] /Count 13 >>", 5: update},
+                          b"/Root 1 0 R /Info 5 0 R", base=base, prev=xref)
+    metadata = pdf_metadata.fetch_metadata(StubSession(body), URL)
+    assert metadata['pages'] == 13
+    assert metadata['title'] == 'Annual Report, revised'
+    assert metadata['modified'] == '2024-03-01'
+    # Objects the update left alone still come from the first section
+    assert pdf_metadata.fetch_metadata(StubSession(classic_pdf(
+        {5: update}, b"/Root 1 0 R /Info 5 0 R", base=base, prev=xref)[0]), URL)['pages'] == 12
+
+
+def test_missing_info_leaves_the_strings_empty():
+    metadata = pdf_metadata.fetch_metadata(StubSession(basic_pdf(b"/Root 1 0 R")[0]), URL)
+    assert metadata['pages'] == 12
+    assert metadata['title'] is None and metadata['author'] is None
+    assert pdf_metadata.describe(metadata) == '12 pages'
+
+
+def test_encrypted_file_reports_pages_but_not_strings():
+    body, _ = basic_pdf(b"/Root 1 0 R /Info 3 0 R /Encrypt << /Filter /Standard /V 2 /R 3 >>")
+    metadata = pdf_metadata.fetch_metadata(StubSession(body), URL)
+    assert metadata['encrypted'] is True
+    assert metadata['pages'] == 12
+    assert metadata['title'] is None
+    assert pdf_metadata.describe(metadata) == '12 pages | encrypted'
+
+
+def test_server_ignoring_range_is_read_from_one_full_download():
+    body, _ = basic_pdf()
+    session = StubSession(body, ranges=False)
+    metadata = pdf_metadata.fetch_metadata(session, URL)
+    assert_metadata(metadata)
+    assert metadata['full_fetch'] is True
+    assert metadata['requests'] == 1
+    assert metadata['bytes_read'] == metadata['size'] == len(body)
+
+
+def test_html_page_and_truncated_file_are_errors():
+    page = b'<html>' + b' ' * 10000 + b'</html>'
+    with pytest.raises(ValueError):
+        pdf_metadata.fetch_metadata(StubSession(page, ranges=False), URL)
+    body, _ = basic_pdf()
+    with pytest.raises(ValueError):
+        pdf_metadata.fetch_metadata(StubSession(body[:len(body) // 2]), URL)
+
+
+def test_probe_metadata_records_errors_per_link():
+    body, _ = basic_pdf()
+    links = [{'filename': 'a.pdf', 'url': URL}, {'filename': 'b.pdf', 'url': URL}]
+    totals = pdf_metadata.probe_metadata(links[:1], session=StubSession(body), workers=1)
+    assert totals['remote'] == 1 and totals['failed'] == 0
+    assert links[0]['metadata']['pages'] == 12
+    totals = pdf_metadata.probe_metadata(links[1:], session=StubSession(b'not a pdf', ranges=False), workers=1)
+    assert totals['failed'] == 1
+    assert links[1]['metadata']['error']
@@ -0,0 +1,76 @@
+"""
+Tests for pdf_validation: rejecting gate pages and truncated bodies while
+they stream.
+
+Run with: python -m pytest test_pdf_validation.py
+"""
+
+import pytest
+
+import pdf_validation
+import throttle
+
+PDF = b'%PDF-1.7\n' + b'x' * 5000 + b'\n%%EOF\n'
+
+
+class StreamedResponse:
+    """The parts of a streamed requests.Response that validated_chunks reads."""
+
+    def __init__(self, body, headers=None, chunk=700):
+        self.body = body
+        self.headers = headers or {}
+        self.chunk = chunk
+        self.sent = 0
+
+    def iter_content(self, chunk_size=None):
+        for start in range(0, len(self.body), self.chunk):
+            self.sent = start + self.chunk
+            yield self.body[start:start + self.chunk]
+
+
+def read(response, **kwargs):
+    return b''.join(pdf_validation.validated_chunks(response, **kwargs))
+
+
+def test_complete_pdf_passes_unchanged():
+    assert read(StreamedResponse(PDF, {'Content-Type': 'application/pdf', 'Content-Length': str(len(PDF))})) == PDF
+    # Without a Content-Length the %%EOF marker shows the body is complete
+    assert read(StreamedResponse(PDF, {'Content-Type': 'application/octet-stream'})) == PDF
+
+
+def test_small_pdf_that_fits_the_sniffing_window():
+    body = b'%PDF-1.4 tiny %%EOF'
+    assert read(StreamedResponse(body, {'Content-Length': str(len(body))})) == body
+
+
+def test_html_gate_page_is_rejected_before_anything_is_handed_on():
+    page = b'<html><body>Are you over 18?</body></html>' + b' ' * 50000
+    response = StreamedResponse(page, {'Content-Type': 'text/html; charset=utf-8'})
+    chunks = pdf_validation.validated_chunks(response)
+    with pytest.raises(pdf_validation.NotPdfError) as error:
+        next(chunks)
+    assert 'text/html' in str(error.value)
+    # Stopped within the sniffing window, not at the end of the page
+    assert response.sent < len(page)
+
+
+def test_body_shorter_than_content_length_is_truncated():
+    response = StreamedResponse(PDF[:3000], {'Content-Type': 'application/pdf', 'Content-Length': str(len(PDF))})
+    with pytest.raises(throttle.TruncatedError):
+        read(response)
+
+
+def test_body_without_length_or_eof_marker_is_truncated():
+    with pytest.raises(throttle.TruncatedError):
+        read(StreamedResponse(PDF[:-7], {'Content-Type': 'application/pdf'}))
+
+
+def test_compressed_body_is_checked_by_eof_marker_not_length():
+    headers = {'Content-Type': 'application/pdf', 'Content-Encoding': 'gzip', 'Content-Length': '100'}
+    assert read(StreamedResponse(PDF, headers)) == PDF
+
+
+def test_continued_download_skips_the_header_check():
+    rest = PDF[4000:]
+    response = StreamedResponse(rest, {'Content-Type': 'application/octet-stream', 'Content-Length': str(len(rest))})
+    assert read(response, offset=4000) == rest
@@ -0,0 +1,59 @@
+"""
+Tests for profiling: work is charged to the phase it runs in, including the
+items of a generator consumed inside another phase.
+
+Run with: python -m pytest test_profiling.py
+"""
+
+import pstats
+
+import pytest
+
+import profiling
+
+
+def busy_parse():
+    return sum(i * i for i in range(20000))
+
+
+def produce_links():
+    for i in range(3):
+        busy_parse()
+        yield i
+
+
+def functions(path):
+    return {name for _, _, name in pstats.Stats(str(path)).stats}
+
+
+@pytest.fixture
+def profile_dir(tmp_path):
+    profiling.enable(str(tmp_path), memory=False)
+    yield tmp_path
+    profiling.disable()
+
+
+def test_iterate_is_a_no_op_when_not_profiling():
+    links = produce_links()
+    assert profiling.iterate('parse', links) is links
+
+
+def test_generator_items_are_charged_to_their_own_phase(profile_dir):
+    with profiling.phase('download'):
+        assert list(profiling.iterate('parse', produce_links())) == [0, 1, 2]
+    profiling.disable()
+
+    assert 'busy_parse' in functions(profile_dir / 'parse.prof')
+    assert 'busy_parse' not in functions(profile_dir / 'download.prof')
+    report = (profile_dir / profiling.REPORT_NAME).read_text(encoding='utf-8')
+    assert 'Phase: parse' in report
+
+
+def test_nested_phase_wins(profile_dir):
+    with profiling.phase('fetch'):
+        with profiling.phase('parse'):
+            busy_parse()
+    profiling.disable()
+
+    assert 'busy_parse' in functions(profile_dir / 'parse.prof')
+    assert 'busy_parse' not in functions(profile_dir / 'fetch.prof')
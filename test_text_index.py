@@ -0,0 +1,83 @@
+"""
+Tests for text_index: what gets mined from a download directory, and
+incremental re-runs.
+
+Run with: python -m pytest test_text_index.py
+"""
+
+import os
+
+import pytest
+
+import content_store
+import text_index
+
+
+def pdf_bytes(text):
+    """A one-page PDF showing ``text``, readable by the basic extractor."""
+    stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode('latin-1')
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R >>",
+        b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream",
+    ]
+    out = b"%PDF-1.4\n"
+    for number, body in enumerate(objects, 1):
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    return out + b"trailer\n<< /Root 1 0 R >>\n%%EOF\n"
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = text_index.TextIndex(str(tmp_path / 'index.db'))
+    yield index
+    index.close()
+
+
+@pytest.fixture
+def downloads(tmp_path):
+    """A --dedupe download directory: two files and their store objects."""
+    directory = tmp_path / 'downloads'
+    store = content_store.ContentStore(str(directory / content_store.STORE_NAME))
+    for name, text in (('budget.pdf', 'flood control budget'), ('minutes.pdf', 'council minutes')):
+        _, _, object_path = store.write_stream([pdf_bytes(text)])
+        store.link(object_path, str(directory / name))
+    (directory / '.hidden').mkdir()
+    (directory / '.hidden' / 'other.pdf').write_bytes(pdf_bytes('hidden'))
+    return directory
+
+
+def test_find_pdfs_skips_the_content_store_and_hidden_directories(downloads):
+    assert [os.path.basename(path) for path in text_index.find_pdfs(str(downloads))] == ['budget.pdf', 'minutes.pdf']
+
+
+def test_mining_a_deduplicated_directory_indexes_each_file_once(index, downloads):
+    paths = text_index.find_pdfs(str(downloads))
+    totals = index.mine(paths, processes=1, backend='basic')
+    assert totals == {'indexed': 2, 'unchanged': 0, 'failed': 0}
+    assert index.stats()['documents'] == 2
+    results = index.search('flood')
+    assert [result['filename'] for result in results] == ['budget.pdf']
+
+    # A re-run extracts nothing
+    assert index.mine(paths, processes=1, backend='basic')['unchanged'] == 2
+
+
+def test_documents_from_the_store_indexed_earlier_are_dropped(index, downloads):
+    store_objects = []
+    for root, _, files in os.walk(downloads / content_store.STORE_NAME):
+        store_objects.extend(os.path.join(root, name) for name in files if name.endswith('.pdf'))
+    paths = text_index.find_pdfs(str(downloads))
+    index.mine(paths + store_objects, processes=1, backend='basic')
+    assert index.stats()['documents'] == 4
+
+    assert index.remove_missing(str(downloads), paths) == 2
+    assert index.stats()['documents'] == 2
+
+
+def test_files_deleted_during_a_run_are_skipped(index, downloads):
+    paths = text_index.find_pdfs(str(downloads))
+    os.remove(paths[0])
+    assert index.needs_indexing(paths) == paths[1:]
+    assert index.remove_missing(str(downloads)) == 0
@@ -0,0 +1,184 @@
+"""
+Tests for throttle: error classification, backoff and Retry-After, and the
+AIMD per-host limiter.
+
+Run with: python -m pytest test_throttle.py
+"""
+
+import email.utils
+import time
+
+import pytest
+import requests
+
+import throttle
+
+URL = 'https://example.com/files/a.pdf'
+
+
+def http_error(status, retry_after=None):
+    response = requests.Response()
+    response.status_code = status
+    if retry_after is not None:
+        response.headers['Retry-After'] = retry_after
+    return requests.HTTPError(f"HTTP {status}", response=response)
+
+
+@pytest.fixture
+def no_jitter(monkeypatch):
+    """Makes every random delay its upper bound."""
+    monkeypatch.setattr(throttle.random, 'uniform', lambda low, high: high)
+
+
+def test_parse_retry_after():
+    assert throttle.parse_retry_after('120') == 120.0
+    assert throttle.parse_retry_after(' 5 ') == 5.0
+    later = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 25 <= throttle.parse_retry_after(later) <= 30
+    earlier = email.utils.formatdate(time.time() - 30, usegmt=True)
+    assert throttle.parse_retry_after(earlier) == 0.0
+    assert throttle.parse_retry_after('soon') is None
+    assert throttle.parse_retry_after(None) is None
+
+
+@pytest.mark.parametrize('error, expected', [
+    (http_error(503), (True, throttle.THROTTLED)),
+    (http_error(429), (True, throttle.THROTTLED)),
+    (http_error(500), (True, throttle.FAILED)),
+    (http_error(404), (False, throttle.FAILED)),
+    (requests.exceptions.ConnectTimeout(), (True, throttle.THROTTLED)),
+    (requests.exceptions.ConnectionError(), (True, throttle.THROTTLED)),
+    (requests.exceptions.SSLError(), (False, throttle.FAILED)),
+    (throttle.TruncatedError(), (True, throttle.FAILED)),
+    (ValueError(), (False, throttle.FAILED)),
+])
+def test_classify(error, expected):
+    assert throttle.classify(error) == expected
+
+
+def test_backoff_doubles_up_to_the_cap(no_jitter):
+    policy = throttle.RetryPolicy(retries=10, backoff=0.5, max_backoff=3.0)
+    error = http_error(500)
+    assert [policy.delay(error, attempt) for attempt in range(1, 6)] == [0.5, 1.0, 2.0, 3.0, 3.0]
+
+
+def test_delay_gives_up_after_the_retries_or_on_permanent_errors(no_jitter):
+    policy = throttle.RetryPolicy(retries=2)
+    assert policy.delay(http_error(503), 2) is not None
+    assert policy.delay(http_error(503), 3) is None
+    assert policy.delay(http_error(404), 1) is None
+
+
+def test_retry_after_is_waited_for_in_full(no_jitter):
+    policy = throttle.RetryPolicy(backoff=0.5, max_retry_after=60)
+    assert policy.delay(http_error(429, '10'), 1) == 10.5
+    assert policy.delay(http_error(503, '61'), 1) is None
+
+
+def test_limiter_ramps_up_until_the_first_throttle():
+    limiter = throttle.HostLimiter(8)
+    assert limiter.limit == throttle.INITIAL_LIMIT
+    for expected in (3, 4, 5):
+        limiter.acquire()
+        limiter.release(throttle.OK)
+        assert limiter.limit == expected
+
+
+def test_limiter_halves_once_per_cooldown_then_grows_additively(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(throttle.time, 'monotonic', lambda: now[0])
+    limiter = throttle.HostLimiter(8, initial=8)
+    for _ in range(2):
+        limiter.acquire()
+        limiter.release(throttle.THROTTLED)
+    # Two signals within the cooldown count as one
+    assert (limiter.limit, limiter.throttles) == (4.0, 2)
+
+    now[0] += throttle.DECREASE_COOLDOWN
+    limiter.acquire()
+    limiter.release(throttle.THROTTLED)
+    assert limiter.limit == 2.0
+
+    # Out of slow start: one more slot per window of ``limit`` successes
+    for _ in range(2):
+        limiter.acquire()
+        limiter.release(throttle.OK)
+    assert limiter.limit == pytest.approx(2.0 + 0.5 + 1 / 2.5)
+
+
+def test_limiter_stays_within_its_bounds(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(throttle.time, 'monotonic', lambda: now[0])
+    limiter = throttle.HostLimiter(3)
+    for _ in range(5):
+        limiter.acquire()
+        limiter.release(throttle.OK)
+    assert limiter.limit == 3
+    for _ in range(5):
+        now[0] += throttle.DECREASE_COOLDOWN
+        limiter.acquire()
+        limiter.release(throttle.THROTTLED)
+    assert limiter.limit == 1
+
+    fixed = throttle.HostLimiter(3, adaptive=False)
+    fixed.acquire()
+    fixed.release(throttle.THROTTLED)
+    assert fixed.limit == 3
+
+
+def test_pause_holds_back_new_requests():
+    limiter = throttle.HostLimiter(2)
+    limiter.acquire()
+    limiter.release(throttle.THROTTLED, pause=0.2)
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.15
+
+
+def test_hosts_get_their_own_limiters():
+    limits = throttle.HostLimits(4)
+    assert limits.for_url(URL) is limits.for_url('https://EXAMPLE.com/other.pdf')
+    assert limits.for_url(URL) is not limits.for_url('https://example.org/a.pdf')
+    assert set(limits.hosts()) == {'example.com', 'example.org'}
+
+
+def test_call_with_retries_waits_out_retry_after(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(throttle.time, 'sleep', sleeps.append)
+    errors = [http_error(503, '1'), requests.exceptions.ConnectionError()]
+    retries = []
+
+    def fetch():
+        if errors:
+            raise errors.pop(0)
+        return 'body'
+
+    limits = throttle.HostLimits(4)
+    policy = throttle.RetryPolicy(retries=3, backoff=0.1)
+    start = time.monotonic()
+    result = throttle.call_with_retries(URL, fetch, policy, limits,
+                                        on_retry=lambda attempt, error, delay: retries.append(attempt))
+    assert result == 'body'
+    assert retries == [1, 2]
+    assert 1.0 <= sleeps[0] <= 1.1 and sleeps[1] <= 0.2
+    # With sleep patched out, only the limiter's pause for the host held
+    # the next attempt back
+    assert time.monotonic() - start >= 0.9
+    limiter = limits.for_url(URL)
+    assert limiter.active == 0
+    assert limiter.throttles == 2
+
+
+def test_call_with_retries_raises_permanent_errors_at_once(monkeypatch):
+    monkeypatch.setattr(throttle.time, 'sleep', lambda delay: pytest.fail("slept"))
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        raise http_error(404)
+
+    limits = throttle.HostLimits(4)
+    with pytest.raises(requests.HTTPError):
+        throttle.call_with_retries(URL, fetch, throttle.RetryPolicy(retries=3), limits)
+    assert len(calls) == 1
+    assert limits.for_url(URL).active == 0
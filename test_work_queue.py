@@ -0,0 +1,165 @@
+"""
+Tests for work_queue: leases, attempts, first-report-wins and manifests.
+
+Run with: python -m pytest test_work_queue.py
+"""
+
+import io
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import pdf_extractor
+import work_queue
+
+
+def link(name, url=None):
+    return {'filename': name, 'url': url or f"https://example.com/files/{name}", 'text': name}
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = work_queue.WorkQueue(str(tmp_path / 'queue.db'), max_attempts=2)
+    yield queue
+    queue.close()
+
+
+def test_enqueue_keys_tasks_by_canonical_url(queue):
+    assert queue.enqueue([link('a.pdf'), link('a.pdf', 'https://EXAMPLE.com:443/files/a.pdf#top')]) == 1
+    assert queue.enqueue([link('a.pdf')]) == 0
+    assert queue.stats()[work_queue.PENDING] == 1
+
+
+def test_enqueue_gives_every_task_its_own_filename(queue):
+    queue.enqueue([link('report.pdf', 'https://example.com/2023/report.pdf'),
+                   link('report.pdf', 'https://example.com/2024/report.pdf')])
+    names = {queue.claim('w1')['filename'], queue.claim('w1')['filename']}
+    assert names == {'report.pdf', 'report_1.pdf'}
+
+
+def test_claim_never_leases_a_task_twice(queue):
+    queue.enqueue([link('a.pdf'), link('b.pdf')])
+    first = queue.claim('w1')
+    second = queue.claim('w2')
+    assert {first['filename'], second['filename']} == {'a.pdf', 'b.pdf'}
+    assert queue.claim('w3') is None
+    assert queue.stats()[work_queue.LEASED] == 2
+
+
+def test_expired_lease_is_claimed_by_another_worker(queue):
+    queue.enqueue([link('a.pdf')])
+    assert queue.claim('w1', lease_seconds=-1)['attempts'] == 1
+    task = queue.claim('w2')
+    assert task['filename'] == 'a.pdf'
+    assert task['attempts'] == 2
+    # w1 lost the lease; its heartbeat says so
+    assert queue.heartbeat('w1', [task['url']]) == [task['url']]
+    assert queue.heartbeat('w2', [task['url']]) == []
+
+
+def test_task_fails_once_its_leases_run_out_max_attempts_times(queue):
+    queue.enqueue([link('a.pdf')])
+    queue.claim('w1', lease_seconds=-1)
+    queue.claim('w2', lease_seconds=-1)
+    assert queue.claim('w3') is None
+    stats = queue.stats()
+    assert stats[work_queue.FAILED] == 1
+    assert queue.unfinished() == 0
+
+
+def test_first_report_wins(queue):
+    queue.enqueue([link('a.pdf')])
+    url = queue.claim('w1', lease_seconds=-1)['url']
+    queue.claim('w2')
+    assert queue.complete(url, 'w2', 'success', path='/tmp/a.pdf', size=10, sha256='ab')
+    assert not queue.complete(url, 'w1', 'success', path='/tmp/a_1.pdf', size=10, sha256='ab')
+    assert not queue.fail(url, 'w1', 'late failure')
+    stats = queue.stats()
+    assert stats[work_queue.DONE] == 1
+    assert stats['bytes'] == 10
+
+
+def test_release_returns_leases_without_using_up_attempts(queue):
+    queue.enqueue([link('a.pdf'), link('b.pdf')])
+    queue.claim('w1')
+    queue.claim('w1')
+    assert queue.release('w1') == 2
+    assert queue.claim('w2')['attempts'] == 1
+
+
+def test_failed_task_is_retried_when_enqueued_again(queue):
+    queue.enqueue([link('a.pdf')])
+    url = queue.claim('w1')['url']
+    queue.fail(url, 'w1', 'HTTP 500')
+    assert queue.claim('w1') is None
+    assert queue.enqueue([link('a.pdf')]) == 1
+    assert queue.claim('w1')['attempts'] == 1
+
+
+def test_manifest_lists_finished_tasks_in_queue_order(queue):
+    queue.enqueue([link('a.pdf'), link('b.pdf'), link('c.pdf')])
+    a, b = queue.claim('w1'), queue.claim('w1')
+    queue.complete(a['url'], 'w1', 'success', size=5)
+    queue.fail(b['url'], 'w1', 'HTTP 404')
+    stream = io.StringIO()
+    assert queue.write_manifest(stream) == 2
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [(r['filename'], r['state']) for r in records] == [('a.pdf', work_queue.DONE), ('b.pdf', work_queue.FAILED)]
+    assert records[1]['error'] == 'HTTP 404'
+
+
+def test_two_connections_share_one_queue(queue):
+    other = work_queue.WorkQueue(queue.path)
+    try:
+        queue.enqueue([link('a.pdf')])
+        assert other.claim('w2')['filename'] == 'a.pdf'
+        assert queue.claim('w1') is None
+    finally:
+        other.close()
+
+
+class SlowPdfHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        time.sleep(0.05)
+        body = b'%PDF-1.4 ' + b'x' * 1000 + b' %%EOF'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_worker_leases_no_more_tasks_than_it_has_threads(queue, tmp_path):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SlowPdfHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    queue.enqueue([link(f"{i}.pdf", f"{base}/{i}.pdf") for i in range(12)])
+    leased = []
+
+    def claimed():
+        while True:
+            pdf = queue.claim('w1')
+            if not pdf:
+                return
+            leased.append(queue.stats()[work_queue.LEASED])
+            yield pdf
+
+    def on_result(pdf, status, details):
+        queue.complete(pdf['url'], 'w1', status, **details)
+
+    try:
+        successful, failed = pdf_extractor.download_pdfs(claimed(), str(tmp_path / 'downloads'), workers=3,
+                                                         on_result=on_result, lookahead=3)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert (successful, failed) == (12, 0)
+    assert max(leased) == 3
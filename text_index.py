@@ -0,0 +1,347 @@
+"""
+DocuMine - Full-Text Search Index
+Mines downloaded PDFs: extracts their text in worker processes and adds it,
+page by page, to a persistent SQLite FTS5 index that can be searched with
+ranked results and page references.
+
+The index is incremental. Each file's size and modification time are
+stored with it, so a re-run only extracts files that are new or changed;
+adding a thousand files to an index of a hundred thousand touches only the
+thousand.
+"""
+
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pdf_text
+
+# Documents are written in batches of this many per transaction
+BATCH_SIZE = 50
+DEFAULT_LIMIT = 20
+# Pages looked at per result when grouping page hits into documents
+PAGES_PER_RESULT = 10
+SNIPPET_TOKENS = 16
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    pages INTEGER,
+    indexed_at REAL NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    doc_id INTEGER NOT NULL REFERENCES documents(id),
+    page INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_doc ON pages(doc_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(
+    text, content='pages', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS pages_insert AFTER INSERT ON pages BEGIN
+    INSERT INTO pages_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS pages_delete AFTER DELETE ON pages BEGIN
+    INSERT INTO pages_fts (pages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+_TERM = re.compile(r'"([^"]+)"|(\S+)')
+
+
+def default_processes():
+    """Returns one extraction process per CPU."""
+    return os.cpu_count() or 1
+
+
+def match_query(query):
+    """
+    Turn a user's query into an FTS5 ``MATCH`` expression.
+
+    Words are ANDed together, ``"quoted words"`` match as a phrase and a
+    trailing ``*`` matches a prefix (``flood*``). Everything is quoted, so
+    punctuation in a query never raises an FTS5 syntax error.
+
+    Returns:
+        str: The expression, or '' when the query has no words
+    """
+    terms = []
+    for phrase, word in _TERM.findall(query):
+        prefix = word.endswith('*')
+        text = ' '.join(re.findall(r'\w+', phrase or word))
+        if text:
+            terms.append('"' + text + '"' + ('*' if prefix and not phrase else ''))
+    return ' '.join(terms)
+
+
+def find_pdfs(directory):
+    """
+    Returns the paths of the PDF files under a directory, sorted.
+
+    Hidden directories are skipped, among them the ``--dedupe`` content
+    store, whose objects are the same files again under their hash.
+    """
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [name for name in dirs if not name.startswith('.')]
+        paths.extend(os.path.join(root, name) for name in files if name.lower().endswith('.pdf'))
+    return sorted(paths)
+
+
+def _extract_in_worker(path, backend):
+    """
+    Extract one file inside a worker process.
+
+    Returns:
+        tuple: (path, list of page texts or None, error message or None)
+    """
+    try:
+        return path, pdf_text.extract_pages(path, backend), None
+    except Exception as e:
+        return path, None, str(e) or type(e).__name__
+
+
+class TextIndex:
+    """
+    SQLite FTS5 index of the text of PDF pages.
+
+    Page text lives in a ``pages`` table that the FTS5 table indexes as
+    external content, so a changed document's pages are replaced by their
+    document id rather than by scanning the full-text table.
+
+    Thread-safe. The database runs in WAL mode, so it can be searched while
+    a mining run writes to it.
+
+    Args:
+        path (str): The SQLite database file, created if missing
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(SCHEMA)
+            self._db.commit()
+
+    def needs_indexing(self, paths):
+        """
+        Pick the files that are new or changed since they were indexed.
+
+        Args:
+            paths (list): File paths
+
+        Returns:
+            list: The paths to (re-)index, in the given order; files that
+                no longer exist are left out
+        """
+        with self._lock:
+            known = {row['path']: (row['size'], row['mtime'])
+                     for row in self._db.execute("SELECT path, size, mtime FROM documents")}
+        stale = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Deleted since it was found
+                continue
+            if known.get(os.path.abspath(path)) != (stat.st_size, stat.st_mtime):
+                stale.append(path)
+        return stale
+
+    def _add_locked(self, path, pages, error):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        row = self._db.execute("SELECT id FROM documents WHERE path = ?", (path,)).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM pages WHERE doc_id = ?", (row[0],))
+            self._db.execute("DELETE FROM documents WHERE id = ?", (row[0],))
+        doc_id = self._db.execute(
+            "INSERT INTO documents (path, size, mtime, pages, indexed_at, error) VALUES (?, ?, ?, ?, ?, ?)",
+            (path, stat.st_size, stat.st_mtime, len(pages) if pages is not None else None,
+             time.time(), error)).lastrowid
+        self._db.executemany("INSERT INTO pages (doc_id, page, text) VALUES (?, ?, ?)",
+                             [(doc_id, number, text) for number, text in enumerate(pages or [], 1) if text])
+
+    def add(self, path, pages, error=None):
+        """
+        Store the text of one file, replacing what was indexed for it before.
+
+        A file that could not be extracted is stored with its error and no
+        pages, so it is not retried until it changes.
+
+        Args:
+            path (str): The PDF file
+            pages (list): Text of each page, or None on error
+            error (str): Why extraction failed
+        """
+        with self._lock, self._db:
+            self._add_locked(path, pages, error)
+
+    def remove_missing(self, directory, paths=None):
+        """
+        Drop documents under ``directory`` whose file no longer exists.
+
+        Args:
+            directory (str): Directory the documents were mined from
+            paths (list): The files found there (``find_pdfs``); documents
+                for any other file are dropped too, e.g. files of a content
+                store indexed before it was skipped
+
+        Returns:
+            int: Number of documents removed
+        """
+        prefix = os.path.join(os.path.abspath(directory), '')
+        found = {os.path.abspath(path) for path in paths} if paths is not None else None
+        with self._lock, self._db:
+            rows = self._db.execute("SELECT id, path FROM documents WHERE substr(path, 1, ?) = ?",
+                                    (len(prefix), prefix)).fetchall()
+            gone = [row['id'] for row in rows
+                    if (found is not None and row['path'] not in found) or not os.path.exists(row['path'])]
+            for doc_id in gone:
+                self._db.execute("DELETE FROM pages WHERE doc_id = ?", (doc_id,))
+                self._db.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+        return len(gone)
+
+    def mine(self, paths, processes=None, backend=None, on_progress=None):
+        """
+        Extract and index the files that are new or changed.
+
+        Extraction runs in a pool of worker processes (started with
+        ``spawn``); results are written here as they complete, in batches of
+        ``BATCH_SIZE`` documents per transaction. Only a few files per
+        process are in flight at once, so the pages of a large collection
+        are never all held in memory.
+
+        Args:
+            paths (list): PDF file paths; unchanged ones are skipped
+            processes (int): Number of extraction processes (default: one per CPU)
+            backend (str): ``pdf_text`` backend (default: pypdf if installed)
+            on_progress (callable): Called as ``on_progress(done, total, path,
+                error)`` after each file
+
+        Returns:
+            dict: Files indexed, skipped as unchanged, and failed
+        """
+        stale = self.needs_indexing(paths)
+        totals = {'indexed': 0, 'unchanged': len(paths) - len(stale), 'failed': 0}
+        if not stale:
+            return totals
+        backend = backend or pdf_text.default_backend()
+        processes = max(1, processes or default_processes())
+
+        todo = iter(stale)
+        pending = set()
+        done = 0
+        batch = 0
+        with ProcessPoolExecutor(max_workers=processes,
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            def submit():
+                path = next(todo, None)
+                if path is not None:
+                    pending.add(executor.submit(_extract_in_worker, path, backend))
+
+            try:
+                for _ in range(processes * 2):
+                    submit()
+                while pending:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        pending.discard(future)
+                        submit()
+                        path, pages, error = future.result()
+                        with self._lock:
+                            try:
+                                self._add_locked(path, pages, error)
+                            except OSError as e:
+                                # Deleted while it was being extracted
+                                error = str(e)
+                            batch += 1
+                            if batch >= BATCH_SIZE:
+                                self._db.commit()
+                                batch = 0
+                        totals['failed' if error else 'indexed'] += 1
+                        done += 1
+                        if on_progress:
+                            on_progress(done, len(stale), path, error)
+            finally:
+                for future in pending:
+                    future.cancel()
+                with self._lock:
+                    self._db.commit()
+        return totals
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """
+        Search the index.
+
+        Pages are ranked by BM25 and grouped into documents; a document
+        ranks by its best page.
+
+        Args:
+            query (str): Words, ``"phrases"`` and ``prefix*`` terms (see
+                ``match_query``)
+            limit (int): Maximum number of documents
+
+        Returns:
+            list: One dict per document, best first, with ``path``,
+                ``filename``, ``score`` (higher is better), ``pages`` (the
+                matching page numbers, best first) and ``snippet`` (from the
+                best page, matches in [brackets])
+        """
+        expression = match_query(query)
+        if not expression:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT d.path, p.page, bm25(pages_fts) AS rank, "
+                "snippet(pages_fts, 0, '[', ']', '...', ?) AS snippet "
+                "FROM pages_fts JOIN pages p ON p.id = pages_fts.rowid JOIN documents d ON d.id = p.doc_id "
+                "WHERE pages_fts MATCH ? ORDER BY rank LIMIT ?",
+                (SNIPPET_TOKENS, expression, limit * PAGES_PER_RESULT)).fetchall()
+
+        results = {}
+        for row in rows:
+            result = results.get(row['path'])
+            if result is None:
+                if len(results) >= limit:
+                    continue
+                # bm25() is lower-is-better; flip it so scores read naturally
+                result = results[row['path']] = {
+                    'path': row['path'], 'filename': os.path.basename(row['path']),
+                    'score': -row['rank'], 'pages': [], 'snippet': ' '.join(row['snippet'].split()),
+                }
+            result['pages'].append(row['page'])
+        return list(results.values())
+
+    def stats(self):
+        """
+        Summarize the index.
+
+        Returns:
+            dict: Numbers of documents, pages and documents that failed
+        """
+        with self._lock:
+            documents = self._db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            pages = self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            failed = self._db.execute("SELECT COUNT(*) FROM documents WHERE error IS NOT NULL").fetchone()[0]
+        return {'documents': documents, 'pages': pages, 'failed': failed}
+
+    def close(self):
+        """Closes the database."""
+        with self._lock:
+            self._db.close()
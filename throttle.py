@@ -0,0 +1,275 @@
+"""
+DocuMine - Retries and Adaptive Concurrency
+Retries transient failures with exponential backoff and jitter, honouring
+``Retry-After``, and adapts how many requests run at once against each host.
+
+The per-host limit follows AIMD (additive increase, multiplicative decrease):
+it ramps up while responses stay healthy and halves when the host throttles
+(429/503), its gateway times out, or requests time out or get reset.
+"""
+
+import email.utils
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+import net_metrics
+
+DEFAULT_RETRIES = 4
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 60.0
+# A Retry-After longer than this is not waited for; the request fails instead
+MAX_RETRY_AFTER = 300.0
+
+# Statuses worth retrying, and those that mean the host wants less load
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+THROTTLE_STATUSES = (429, 502, 503, 504)
+
+# Outcomes reported to a HostLimiter
+OK = 'ok'
+THROTTLED = 'throttled'
+FAILED = 'failed'
+
+# AIMD settings
+INITIAL_LIMIT = 2
+DECREASE_FACTOR = 0.5
+# Repeated throttling signals within this many seconds count as one
+DECREASE_COOLDOWN = 1.0
+
+
+class TruncatedError(IOError):
+    """A body ended before its advertised length."""
+
+
+def parse_retry_after(value):
+    """
+    Parse a ``Retry-After`` header (delay in seconds or an HTTP date).
+
+    Args:
+        value (str): The header value
+
+    Returns:
+        float: Seconds to wait, or None if missing or invalid
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def _error_status(error):
+    """Returns the HTTP status behind an exception, if any."""
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def classify(error):
+    """
+    Decide how a failed request should be treated.
+
+    Args:
+        error (Exception): The exception raised by the request
+
+    Returns:
+        tuple: (retryable, outcome for the HostLimiter)
+    """
+    status = _error_status(error)
+    if status is not None:
+        return status in RETRY_STATUSES, THROTTLED if status in THROTTLE_STATUSES else FAILED
+    if isinstance(error, requests.exceptions.SSLError):
+        return False, FAILED
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return True, THROTTLED
+    if isinstance(error, (requests.exceptions.ChunkedEncodingError, TruncatedError)):
+        return True, FAILED
+    return False, FAILED
+
+
+class RetryPolicy:
+    """
+    How often and how long to wait before retrying a request.
+
+    Delays use "full jitter": a random wait between 0 and
+    ``backoff * 2 ** (attempt - 1)``, capped at ``MAX_BACKOFF``. A
+    ``Retry-After`` from the server is waited for in full, plus a little
+    jitter so throttled workers do not return at the same instant.
+    """
+
+    def __init__(self, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, max_backoff=MAX_BACKOFF,
+                 max_retry_after=MAX_RETRY_AFTER):
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+
+    def delay(self, error, attempt):
+        """
+        Return how long to wait before retrying, or None to give up.
+
+        Args:
+            error (Exception): The exception raised by the attempt
+            attempt (int): The attempt that failed, starting at 1
+
+        Returns:
+            float: Seconds to wait, or None
+        """
+        retryable, _ = classify(error)
+        if not retryable or attempt > self.retries:
+            return None
+        response = getattr(error, 'response', None)
+        retry_after = parse_retry_after(response.headers.get('Retry-After')) if response is not None else None
+        if retry_after is not None:
+            if retry_after > self.max_retry_after:
+                return None
+            return retry_after + random.uniform(0, self.backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+
+class HostLimiter:
+    """
+    AIMD concurrency limit for one host.
+
+    Starts at ``INITIAL_LIMIT`` and grows by one per success until the host
+    first throttles (slow start), then by one per window of ``limit``
+    successes. Each throttling signal halves the limit, at most once per
+    ``DECREASE_COOLDOWN``. A ``Retry-After`` pauses new requests to the host.
+    """
+
+    def __init__(self, maximum, minimum=1, initial=INITIAL_LIMIT, adaptive=True):
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.adaptive = adaptive
+        self.limit = float(min(self.maximum, max(self.minimum, initial)) if adaptive else self.maximum)
+        self.active = 0
+        self.throttles = 0
+        self._slow_start = True
+        self._last_decrease = 0.0
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Waits for a free slot under the current limit."""
+        with self._cond:
+            while True:
+                wait = self._paused_until - time.monotonic()
+                if wait <= 0 and self.active < int(self.limit):
+                    self.active += 1
+                    return
+                self._cond.wait(timeout=wait if wait > 0 else None)
+
+    def release(self, outcome=OK, pause=None):
+        """
+        Free a slot and adjust the limit.
+
+        Args:
+            outcome (str): ``OK``, ``THROTTLED`` or ``FAILED``
+            pause (float): Seconds to hold back new requests to the host
+        """
+        with self._cond:
+            self.active -= 1
+            if pause:
+                self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            if self.adaptive:
+                if outcome == OK:
+                    step = 1.0 if self._slow_start else 1.0 / self.limit
+                    self.limit = min(float(self.maximum), self.limit + step)
+                elif outcome == THROTTLED:
+                    self.throttles += 1
+                    now = time.monotonic()
+                    if now - self._last_decrease >= DECREASE_COOLDOWN:
+                        self._last_decrease = now
+                        self._slow_start = False
+                        self.limit = max(float(self.minimum), self.limit * DECREASE_FACTOR)
+            self._cond.notify_all()
+
+
+class HostLimits:
+    """
+    ``HostLimiter`` per host, created on first use.
+
+    Args:
+        maximum (int): Ceiling for every host's limit
+        adaptive (bool): Use AIMD; otherwise every host gets ``maximum``
+    """
+
+    def __init__(self, maximum, adaptive=True):
+        self.maximum = max(1, maximum)
+        self.adaptive = adaptive
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def for_url(self, url):
+        """Returns the limiter of the URL's host."""
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = HostLimiter(self.maximum, adaptive=self.adaptive)
+            return self._hosts[host]
+
+    def hosts(self):
+        """Returns a dict of host -> HostLimiter."""
+        with self._lock:
+            return dict(self._hosts)
+
+
+def call_with_retries(url, fetch, policy=None, limits=None, on_retry=None):
+    """
+    Run ``fetch()`` for a URL, retrying transient failures.
+
+    Each attempt holds a slot of the host's limiter (when ``limits`` is
+    given) and reports its outcome to it; the slot is released before
+    sleeping between attempts.
+
+    Args:
+        url (str): URL being fetched, used to pick the host limiter
+        fetch (callable): Performs one attempt and returns its result
+        policy (RetryPolicy): Retry settings (default: ``RetryPolicy()``)
+        limits (HostLimits): Optional per-host concurrency limits
+        on_retry (callable): Called as ``on_retry(attempt, error, delay)``
+            before waiting
+
+    Returns:
+        The result of the first successful attempt
+
+    Raises:
+        Exception: The last error once it is not retryable or retries ran out
+    """
+    policy = policy or RetryPolicy()
+    limiter = limits.for_url(url) if limits else None
+    attempt = 1
+    while True:
+        if limiter:
+            limiter.acquire()
+        try:
+            with net_metrics.retrying(attempt - 1):
+                result = fetch()
+        except Exception as e:
+            _, outcome = classify(e)
+            delay = policy.delay(e, attempt)
+            if limiter:
+                status = _error_status(e)
+                pause = None
+                if status in THROTTLE_STATUSES and delay is not None:
+                    pause = parse_retry_after(e.response.headers.get('Retry-After'))
+                limiter.release(outcome, pause=pause)
+            if delay is None:
+                raise
+            if on_retry:
+                on_retry(attempt, e, delay)
+        else:
+            if limiter:
+                limiter.release(OK)
+            return result
+        time.sleep(delay)
+        attempt += 1
@@ -0,0 +1,361 @@
+"""
+DocuMine - Shared Work Queue
+SQLite queue of download tasks that several worker processes share. A worker
+claims a task with a time-limited lease and keeps the lease alive with
+heartbeats while it downloads; a task whose lease runs out (its worker
+crashed or was killed) goes back to the queue for another worker. Each
+worker reports its results into the queue, which doubles as the manifest of
+the whole harvest.
+
+The database can be used by workers on several hosts only if it lives on a
+shared filesystem with working POSIX locks; many NFS setups don't have them.
+"""
+
+import contextlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+import crawler
+
+DEFAULT_LEASE_SECONDS = 120
+# A task whose lease ran out this many times is given up on, so a file that
+# crashes every worker that tries it can't stall the queue
+DEFAULT_MAX_ATTEMPTS = 3
+# How long to wait for another process's write lock
+BUSY_TIMEOUT = 30
+# How often an idle worker looks again while other workers hold leases
+POLL_SECONDS = 5
+# Links found by a scan are added in transactions of this many, so workers
+# can start on the first ones while a crawl goes on
+BATCH_SIZE = 50
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    href TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    text TEXT,
+    state TEXT NOT NULL,
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    added REAL NOT NULL,
+    finished REAL,
+    result TEXT,
+    path TEXT,
+    size INTEGER,
+    sha256 TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_state ON tasks(state, lease_until);
+CREATE INDEX IF NOT EXISTS tasks_filename ON tasks(filename);
+"""
+
+
+def default_worker_id():
+    """Returns 'host:pid', which tells the workers of a harvest apart."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    SQLite queue of download tasks with leases.
+
+    Tasks are keyed by canonical URL (``crawler.canonicalize_url``), so a
+    link enqueued again, by the same or another seed, is one task. Claims run
+    in ``BEGIN IMMEDIATE`` transactions, so two processes never lease the
+    same task.
+
+    Thread-safe. The database runs in WAL mode, so the queue can be read
+    while workers write to it.
+
+    Args:
+        path (str): The SQLite database file, created if missing
+        max_attempts (int): Leases a task may run out before it fails
+    """
+
+    def __init__(self, path, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Autocommit; multi-statement writes open their own transaction
+        self._db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Holds the thread lock and the database write lock; commits on success."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _unique_filename(self, filename):
+        """Returns a filename no other task has, appending a counter on collisions."""
+        name = filename
+        counter = 1
+        while self._db.execute("SELECT 1 FROM tasks WHERE filename = ?", (name,)).fetchone():
+            base, ext = os.path.splitext(filename)
+            name = f"{base}_{counter}{ext}"
+            counter += 1
+        return name
+
+    def enqueue(self, pdf_links):
+        """
+        Add links as pending tasks, in one transaction.
+
+        Each task gets a filename no other task in the queue has, so workers
+        sharing a download directory never write to the same file. A link
+        already in the queue is left as it is, unless it failed: it is then
+        retried.
+
+        Args:
+            pdf_links (iterable): Link dicts (``url``, ``filename``, ``text``)
+
+        Returns:
+            int: Number of tasks added or reset for a retry
+        """
+        added = 0
+        now = time.time()
+        with self._transaction() as db:
+            for pdf in pdf_links:
+                url = crawler.canonicalize_url(pdf['url'])
+                row = db.execute("SELECT state FROM tasks WHERE url = ?", (url,)).fetchone()
+                if row is None:
+                    db.execute("INSERT INTO tasks (url, href, filename, text, state, added) VALUES (?, ?, ?, ?, ?, ?)",
+                               (url, pdf['url'], self._unique_filename(pdf['filename']), pdf.get('text'),
+                                PENDING, now))
+                elif row['state'] == FAILED:
+                    db.execute("UPDATE tasks SET state = ?, attempts = 0, worker = NULL, lease_until = NULL, "
+                               "error = NULL WHERE url = ?", (PENDING, url))
+                else:
+                    continue
+                added += 1
+        return added
+
+    def claim(self, worker, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """
+        Lease the oldest task that is pending or whose lease ran out.
+
+        Args:
+            worker (str): The claiming worker's id
+            lease_seconds (float): How long the lease lasts without a heartbeat
+
+        Returns:
+            dict: The task as a link dict (``url``, ``filename``, ``text``
+                plus ``attempts``), or None if there is nothing to claim
+        """
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("UPDATE tasks SET state = ?, worker = NULL, finished = ?, "
+                       "error = 'Lease ran out ' || attempts || ' time(s)' "
+                       "WHERE state = ? AND lease_until < ? AND attempts >= ?",
+                       (FAILED, now, LEASED, now, self.max_attempts))
+            row = db.execute("SELECT * FROM tasks WHERE state = ? OR (state = ? AND lease_until < ?) "
+                             "ORDER BY id LIMIT 1", (PENDING, LEASED, now)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE tasks SET state = ?, worker = ?, lease_until = ?, attempts = attempts + 1 "
+                       "WHERE id = ?", (LEASED, worker, now + lease_seconds, row['id']))
+        return {'url': row['href'], 'filename': row['filename'], 'text': row['text'] or row['filename'],
+                'attempts': row['attempts'] + 1}
+
+    def heartbeat(self, worker, urls, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """
+        Extend the leases a worker still holds.
+
+        Args:
+            worker (str): The worker's id
+            urls (list): URLs of the tasks it is working on
+            lease_seconds (float): New lease length, from now
+
+        Returns:
+            list: The URLs whose lease was lost (it ran out and another
+                worker claimed the task, or the task was finished)
+        """
+        lost = []
+        until = time.time() + lease_seconds
+        with self._transaction() as db:
+            for url in urls:
+                cursor = db.execute("UPDATE tasks SET lease_until = ? WHERE url = ? AND state = ? AND worker = ?",
+                                    (until, crawler.canonicalize_url(url), LEASED, worker))
+                if not cursor.rowcount:
+                    lost.append(url)
+        return lost
+
+    def complete(self, url, worker, result, path=None, size=None, sha256=None):
+        """
+        Report a finished download.
+
+        The first report for a task wins; a worker whose lease ran out may
+        still finish the file, and its result is then kept if no one else
+        reported first.
+
+        Args:
+            url (str): The PDF URL
+            worker (str): The reporting worker's id
+            result (str): How it finished, e.g. 'success' or 'skipped'
+            path (str): Path of the file
+            size (int): Size in bytes
+            sha256 (str): SHA-256 hex digest of the file
+
+        Returns:
+            bool: True if the report was recorded
+        """
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE tasks SET state = ?, worker = ?, lease_until = NULL, finished = ?, result = ?, path = ?, "
+                "size = ?, sha256 = ?, error = NULL WHERE url = ? AND state IN (?, ?)",
+                (DONE, worker, time.time(), result, path, size, sha256, crawler.canonicalize_url(url),
+                 PENDING, LEASED))
+        return bool(cursor.rowcount)
+
+    def fail(self, url, worker, error):
+        """
+        Report a download that failed after the worker's own retries.
+
+        Returns:
+            bool: True if the report was recorded
+        """
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE tasks SET state = ?, worker = ?, lease_until = NULL, finished = ?, error = ? "
+                "WHERE url = ? AND state IN (?, ?)",
+                (FAILED, worker, time.time(), error, crawler.canonicalize_url(url), PENDING, LEASED))
+        return bool(cursor.rowcount)
+
+    def release(self, worker):
+        """
+        Put a worker's leased tasks back in the queue, e.g. when it is stopped.
+
+        Returns:
+            int: Number of tasks released
+        """
+        with self._transaction() as db:
+            cursor = db.execute("UPDATE tasks SET state = ?, worker = NULL, lease_until = NULL, "
+                                "attempts = MAX(attempts - 1, 0) WHERE state = ? AND worker = ?",
+                                (PENDING, LEASED, worker))
+        return cursor.rowcount
+
+    def unfinished(self):
+        """Returns the number of tasks that are pending or leased."""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM tasks WHERE state IN (?, ?)",
+                                    (PENDING, LEASED)).fetchone()[0]
+
+    def stats(self):
+        """
+        Summarize the queue.
+
+        Returns:
+            dict: Numbers of tasks per state, bytes downloaded and the
+                number of workers that reported results
+        """
+        with self._lock:
+            by_state = dict(self._db.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall())
+            size, workers = self._db.execute("SELECT COALESCE(SUM(size), 0), COUNT(DISTINCT worker) FROM tasks "
+                                             "WHERE state = ?", (DONE,)).fetchone()
+        totals = {state: by_state.get(state, 0) for state in (PENDING, LEASED, DONE, FAILED)}
+        totals.update(bytes=size, workers=workers)
+        return totals
+
+    def write_manifest(self, stream):
+        """
+        Write one JSON line per finished task, in queue order.
+
+        Each record has the ``url``, ``filename``, ``state``, ``result``,
+        ``worker``, ``attempts``, ``path``, ``size``, ``sha256``, ``error`` and
+        ``finished`` (a Unix time).
+
+        Returns:
+            int: Number of records written
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT href AS url, filename, state, result, worker, attempts, path, size, sha256, error, finished "
+                "FROM tasks WHERE state IN (?, ?) ORDER BY id", (DONE, FAILED)).fetchall()
+        for row in rows:
+            stream.write(json.dumps(dict(row), ensure_ascii=False) + '\n')
+        return len(rows)
+
+    def close(self):
+        """Closes the database."""
+        with self._lock:
+            self._db.close()
+
+
+class Heartbeat:
+    """
+    Background thread that keeps a worker's leases alive.
+
+    Renews every lease in ``held`` a few times per lease period and drops
+    the ones that were lost from it.
+
+    Args:
+        queue (WorkQueue): The queue
+        worker (str): The worker's id
+        lease_seconds (float): Lease length
+        on_lost (callable): Called with each URL whose lease was lost
+    """
+
+    def __init__(self, queue, worker, lease_seconds=DEFAULT_LEASE_SECONDS, on_lost=None):
+        self.queue = queue
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        self.on_lost = on_lost
+        self.held = set()
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='documine-heartbeat', daemon=True)
+        self._thread.start()
+
+    def add(self, url):
+        """Starts renewing a task's lease."""
+        with self.lock:
+            self.held.add(url)
+
+    def discard(self, url):
+        """Stops renewing a task's lease."""
+        with self.lock:
+            self.held.discard(url)
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            with self.lock:
+                urls = list(self.held)
+            if not urls:
+                continue
+            try:
+                lost = self.queue.heartbeat(self.worker, urls, self.lease_seconds)
+            except sqlite3.Error:
+                # Try again on the next beat; the lease outlasts a few misses
+                continue
+            for url in lost:
+                self.discard(url)
+                if self.on_lost:
+                    self.on_lost(url)
+
+    def stop(self):
+        """Stops the thread."""
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,244 @@
+"""
+DocuMine - Streaming ZIP Builder
+Builds a ZIP archive of downloaded PDFs without holding whole files, or the
+whole archive, in memory.
+"""
+
+import os
+import shutil
+import tempfile
+import zipfile
+import zlib
+
+import http_client
+import pdf_validation
+import profiling
+import throttle
+
+CHUNK_SIZE = 64 * 1024
+
+# Each file is spooled to disk once it grows past this size while it downloads
+ENTRY_SPOOL_SIZE = 8 * 1024 * 1024
+
+# The finished archive is spooled to disk once it grows past this size
+ARCHIVE_SPOOL_SIZE = 32 * 1024 * 1024
+
+# PDFs are mostly already compressed; only deflate when a sample of the file
+# shrinks below this fraction of its size.
+DEFLATE_RATIO = 0.9
+
+# Entries at or above this size need ZIP64 headers
+ZIP64_LIMIT = zipfile.ZIP64_LIMIT
+
+
+def choose_compression(sample):
+    """
+    Decide whether an entry is worth deflating from a sample of its bytes.
+
+    Args:
+        sample (bytes): The first bytes of the file
+
+    Returns:
+        int: ``zipfile.ZIP_DEFLATED`` or ``zipfile.ZIP_STORED``
+    """
+    if not sample:
+        return zipfile.ZIP_STORED
+    compressed = zlib.compress(sample, 1)
+    if len(compressed) < len(sample) * DEFLATE_RATIO:
+        return zipfile.ZIP_DEFLATED
+    return zipfile.ZIP_STORED
+
+
+def _unique_name(filename, used_names):
+    """Returns an archive name not used yet, appending a counter on collisions."""
+    name = filename
+    counter = 1
+    while name in used_names:
+        base, ext = os.path.splitext(filename)
+        name = f"{base}_{counter}{ext}"
+        counter += 1
+    used_names.add(name)
+    return name
+
+
+def _spool_response(response, progress=None, url=None):
+    """
+    Stream a response body into a spooled temporary file.
+
+    The body is validated as it arrives (see ``pdf_validation``), so a
+    non-PDF response is abandoned after its first bytes.
+
+    Args:
+        response (requests.Response): A response opened with ``stream=True``
+        progress (size_probe.ByteProgress): Optional byte progress to count
+            the body towards
+        url (str): The URL, which identifies the file to ``progress``
+
+    Returns:
+        tuple: (spooled file positioned at 0, size in bytes, first chunk)
+
+    Raises:
+        pdf_validation.NotPdfError: The response is not a PDF
+        throttle.TruncatedError: The body ended early
+    """
+    entry = tempfile.SpooledTemporaryFile(max_size=ENTRY_SPOOL_SIZE)
+    size = 0
+    sample = b''
+    chunks = pdf_validation.validated_chunks(response, CHUNK_SIZE)
+    if progress:
+        chunks = progress.counted(url, chunks)
+    try:
+        for chunk in chunks:
+            if not sample:
+                sample = chunk
+            entry.write(chunk)
+            size += len(chunk)
+    except Exception:
+        entry.close()
+        raise
+    entry.seek(0)
+    return entry, size, sample
+
+
+def add_file_to_zip(zip_file, arcname, source, size, sample):
+    """
+    Copy a file object into the archive chunk by chunk.
+
+    Args:
+        zip_file (zipfile.ZipFile): Archive opened for writing
+        arcname (str): Name of the entry in the archive
+        source (file): Readable file object positioned at the start
+        size (int): Size of the data in bytes
+        sample (bytes): First bytes of the data, used to pick the compression
+    """
+    info = zipfile.ZipInfo(arcname)
+    info.compress_type = choose_compression(sample)
+    with zip_file.open(info, 'w', force_zip64=size >= ZIP64_LIMIT) as dest:
+        shutil.copyfileobj(source, dest, CHUNK_SIZE)
+
+
+def _fetch_entry(session, url, cache=None, progress=None):
+    """
+    Download one file into a spooled temporary file.
+
+    Raises ``requests.HTTPError`` for error statuses so they can be retried.
+
+    Returns:
+        tuple: (spooled file or None for a non-200 success status, size,
+            first chunk, status code)
+    """
+    if cache:
+        resp = cache.get(session, url, timeout=http_client.DOWNLOAD_TIMEOUT, stream=True)
+    else:
+        resp = session.get(url, timeout=http_client.DOWNLOAD_TIMEOUT, stream=True)
+    with resp:
+        resp.raise_for_status()
+        if resp.status_code != 200:
+            return None, 0, b'', resp.status_code
+        entry, size, sample = _spool_response(resp, progress, url)
+    return entry, size, sample, resp.status_code
+
+
+def _open_local(local_file, pdf):
+    """Opens a local copy of a file; returns (file, size, first chunk), or None if there is none."""
+    path = local_file(pdf) if local_file else None
+    if not path:
+        return None
+    try:
+        source = open(path, 'rb')
+    except OSError:
+        # Evicted since it was looked up
+        return None
+    size = os.fstat(source.fileno()).st_size
+    sample = source.read(CHUNK_SIZE)
+    source.seek(0)
+    return source, size, sample
+
+
+@profiling.profiled('archive')
+def build_pdf_zip(pdf_list, session=None, archive=None, on_progress=None, on_warning=None,
+                  cache=None, retry=None, progress=None, local_file=None):
+    """
+    Download PDFs and write them into a disk-spooled ZIP archive.
+
+    Each file is streamed into its own spooled temporary file and only copied
+    into the archive once it has downloaded completely, so a failed download
+    never leaves a truncated entry behind. Responses that are not PDFs are
+    abandoned after their first bytes. PDFs are
+    stored without recompression unless a sample shows they shrink.
+
+    Transient failures (timeouts, connection errors, 408/429/5xx) are retried
+    as ``retry`` describes, waiting out any ``Retry-After``. Files that still
+    fail are reported through ``on_warning`` and left out.
+
+    With a ``progress`` (typically built from ``size_probe.probe_sizes``),
+    bytes are counted as they arrive, so a caller polling it sees large files
+    move while they download.
+
+    Files that ``local_file`` has a copy of (e.g. prefetched ones) are read
+    from disk and not downloaded.
+
+    Args:
+        pdf_list (list): List of dictionaries containing PDF information
+        session (requests.Session): Session to fetch with (default: shared session)
+        archive (file): Seekable binary file to write the archive to
+            (default: a new spooled temporary file)
+        on_progress (callable): Called as ``on_progress(done, total, pdf)``
+            before each file is fetched and with ``pdf=None`` at the end
+        on_warning (callable): Called with a message for each skipped file
+        cache (HttpCache): Optional cache used to revalidate each PDF
+        retry (throttle.RetryPolicy): Retry settings (default:
+            ``throttle.RetryPolicy()``)
+        progress (size_probe.ByteProgress): Optional byte progress
+        local_file (callable): Returns the path of a local copy of a link,
+            or None
+
+    Returns:
+        tuple: (archive file object positioned at 0, number of files added)
+    """
+    session = session or http_client.get_session()
+    on_progress = on_progress or (lambda done, total, pdf: None)
+    on_warning = on_warning or (lambda message: None)
+    retry = retry or throttle.RetryPolicy()
+
+    if archive is None:
+        archive = tempfile.SpooledTemporaryFile(max_size=ARCHIVE_SPOOL_SIZE)
+    total = len(pdf_list)
+    success_count = 0
+    used_names = set()
+
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_STORED, allowZip64=True) as zip_file:
+        for i, pdf in enumerate(pdf_list):
+            on_progress(i, total, pdf)
+            size = 0
+            try:
+                local = _open_local(local_file, pdf)
+                if local:
+                    entry, size, sample = local
+                else:
+                    entry, size, sample, status = throttle.call_with_retries(
+                        pdf['url'], lambda: _fetch_entry(session, pdf['url'], cache, progress), retry)
+                if entry is None:
+                    on_warning(f"Failed to download {pdf['filename']}: Status {status}")
+                    continue
+
+                with entry:
+                    arcname = _unique_name(pdf['filename'], used_names)
+                    add_file_to_zip(zip_file, arcname, entry, size, sample)
+                    success_count += 1
+
+            except pdf_validation.NotPdfError as e:
+                on_warning(f"Skipped {pdf['filename']}: {e}")
+            except Exception as e:
+                status = getattr(getattr(e, 'response', None), 'status_code', None)
+                reason = f"Status {status}" if status else str(e)
+                on_warning(f"Failed to download {pdf['filename']}: {reason}")
+                size = 0
+            finally:
+                if progress:
+                    progress.finish(pdf['url'], size, pdf.get('size'))
+
+        on_progress(total, total, None)
+
+    archive.seek(0)
+    return archive, success_count